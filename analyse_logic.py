@@ -1,7 +1,28 @@
+import cProfile
+import hashlib
+import io
+import json
+import pstats
+import sys
+import threading
+import time as chrono
+import warnings
+import numpy as np
 import pandas as pd
+import xlsxwriter
+from pandas.tseries.api import guess_datetime_format
 from datetime import time, timedelta, date
 from itertools import product
+from collections import namedtuple, OrderedDict
+from functools import lru_cache
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from cache_logic import CacheResultats
+try:
+    import resource
+except ImportError:  # Windows : pas de mesure mémoire.
+    resource = None
 
 CONFIG = {
     'BASE_JOURS_PAYES': 26, 'DUREE_JOURNEE_NORMALE_HEURES': 8.0, 'JOUR_DIMANCHE': 'Sunday',
@@ -11,7 +32,8 @@ CONFIG = {
     'HEURE_FIN_PAUSE_DEJ_LUN_JEU': time(14, 30), 'HEURE_FIN_PAUSE_DEJ_VENDREDI': time(15, 0),
     'TOLERANCE_RETARD_MIN': 40, 'HEURE_FIN_JOURNEE_NORMALE_STANDARD_THEORIQUE': time(18, 30),
     'HEURE_FIN_JOURNEE_NORMALE_VENDREDI_THEORIQUE': time(19, 0),
-    'JOURS_OUVRABLES_LUN_JEU': ['Monday', 'Tuesday', 'Wednesday', 'Thursday']
+    'JOURS_OUVRABLES_LUN_JEU': ['Monday', 'Tuesday', 'Wednesday', 'Thursday'],
+    'INTERVALLE_SECURITE_MIN': 10
 }
 REGLES_CONGES = {
     "CONGE_PAYE": {"mots_cles": ["annuel", "payé"], "duree_max": 18, "paye_par": "Employeur", "est_paye": True},
@@ -25,31 +47,68 @@ REGLES_CONGES = {
     "AUTRE": {"mots_cles": [], "duree_max": 999, "paye_par": "Inconnu", "est_paye": False}
 }
 
+def est_ligne_entete(row_values, columns_map):
+    """Une ligne est un en-tête si au moins deux cellules contiennent un mot-clé de `columns_map`."""
+    found_keywords = 0
+    for cell_value in (str(v).lower() for v in row_values):
+        for keywords in columns_map.values():
+            if any(keyword in cell_value for keyword in keywords):
+                found_keywords += 1
+                break
+    return found_keywords >= 2
+
+def correspondance_colonnes(col_names, columns_map):
+    """Associe chaque nom de colonne d'en-tête au premier nom standard encore libre dont un mot-clé apparaît."""
+    new_names = {}
+    used_standard_names = set()
+    for col_name in col_names:
+        if pd.isna(col_name): continue
+        col_name_str = str(col_name).lower()
+        for standard_name, keywords in columns_map.items():
+            if standard_name not in used_standard_names and any(keyword in col_name_str for keyword in keywords):
+                new_names[col_name] = standard_name
+                used_standard_names.add(standard_name)
+                break
+    return new_names
+
+POINTAGE_COLS_MAP = {'Matricule': ['matr', 'id'], 'Pointage': ['pointage', 'date']}
+CONGES_COLS_MAP = {'Matricule': ['matr', 'id'], 'Type_Congé': ['type', 'motif'], 'Date_Debut': ['debut', 'début', 'start'], 'Date_Fin': ['fin', 'end']}
+AFFECTATIONS_COLS_MAP = {
+    'Matricule': ['matr', 'id'], 'Date': ['date'],
+    'Affectation': ['affectation', 'tâche', 'tache', 'type'],
+    'Lieu_Chantier': ['lieu', 'chantier', 'ville'],
+    'Projet_Domicile': ['projet', 'domicile']
+}
+
+def detecter_entete(apercu, columns_map, nb_lignes=5):
+    """Cherche l'en-tête dans les `nb_lignes` premières lignes d'un aperçu lu avec header=None.
+
+    Renvoie (numéro de la ligne d'en-tête ou None, {position de colonne: nom standard}). Sans
+    en-tête reconnu, les premières colonnes reçoivent les noms standard dans l'ordre de `columns_map`.
+    """
+    for i in range(min(nb_lignes, len(apercu))):
+        try:
+            valeurs = apercu.iloc[i].tolist()
+            if est_ligne_entete(valeurs, columns_map):
+                noms = correspondance_colonnes(valeurs, columns_map)
+                return i, {position: noms[v] for position, v in enumerate(valeurs) if not pd.isna(v) and v in noms}
+        except:
+            continue
+    return None, dict(enumerate(list(columns_map)[:len(apercu.columns)]))
+
 def find_and_rename_header(df, columns_map):
-    df_copy = df.copy()
+    if 'Matricule' in df.columns:
+        # Déjà nommé (lecture limitée aux colonnes reconnues, voir import_logic.lire_excel_colonnes).
+        return df.copy(deep=False)
+    # Copie superficielle : les colonnes renommées ou remplacées par l'appelant ne touchent pas `df`.
+    df_copy = df.copy(deep=False)
     for i in range(min(5, len(df_copy))):
         try:
-            row_values = [str(v).lower() for v in df_copy.iloc[i].values]
-            found_keywords = 0
-            for cell_value in row_values:
-                for keywords in columns_map.values():
-                    if any(keyword in cell_value for keyword in keywords):
-                        found_keywords += 1
-                        break
-            if found_keywords >= 2:
+            if est_ligne_entete(df_copy.iloc[i].values, columns_map):
                 df_copy.columns = df_copy.iloc[i]
-                df_copy = df_copy.iloc[i+1:].reset_index(drop=True)
-                new_names = {}
-                used_standard_names = set()
-                for col_name in df_copy.columns:
-                    if pd.isna(col_name): continue
-                    col_name_str = str(col_name).lower()
-                    for standard_name, keywords in columns_map.items():
-                        if standard_name not in used_standard_names and any(keyword in col_name_str for keyword in keywords):
-                            new_names[col_name] = standard_name
-                            used_standard_names.add(standard_name)
-                            break
-                df_copy = df_copy.rename(columns=new_names)
+                df_copy = df_copy.iloc[i+1:].copy(deep=False)
+                df_copy.index = pd.RangeIndex(len(df_copy))
+                df_copy = df_copy.rename(columns=correspondance_colonnes(df_copy.columns, columns_map), copy=False)
                 return df_copy
         except:
             continue
@@ -57,16 +116,151 @@ def find_and_rename_header(df, columns_map):
     df_copy.columns = list(columns_map.keys())[:num_cols_to_assign]
     return df_copy
 
-def prepare_conges_df(df_conges_raw):
+ORIGINE_DATES_EXCEL = pd.Timestamp('1899-12-30')
+SERIE_EXCEL_MAX = 2958465  # 31/12/9999
+TAILLE_ECHANTILLON_FORMAT = 200
+TAILLE_MAX_CACHE_DATES = 100_000
+# Mémo texte -> date, LRU partagée entre les sessions (et threads) du processus : accès sous verrou.
+_CACHE_DATES = OrderedDict()
+_VERROU_CACHE_DATES = threading.Lock()
+
+def _ordres_jour_mois(format_textes):
+    """Le format et sa variante jour/mois inversés, le plus probable en tête : jour avant mois
+    (jj/mm/aaaa), sauf pour les formats commençant par l'année (aaaa-mm-jj)."""
+    if format_textes is None or '%d' not in format_textes or '%m' not in format_textes:
+        return [format_textes]
+    inverse = format_textes.replace('%d', '\0').replace('%m', '%d').replace('\0', '%m')
+    annee_en_tete = '%Y' in format_textes and format_textes.index('%Y') < min(format_textes.index('%d'), format_textes.index('%m'))
+    jour_en_tete = format_textes.index('%d') < format_textes.index('%m')
+    return [format_textes, inverse] if jour_en_tete != annee_en_tete else [inverse, format_textes]
+
+def _nb_lus(textes, format_textes):
+    return int(pd.to_datetime(textes, format=format_textes, errors='coerce').notna().sum())
+
+def format_dominant(textes, dayfirst=False, taille_echantillon=TAILLE_ECHANTILLON_FORMAT):
+    """Format strftime le plus fréquent parmi un échantillon de textes (None si aucun n'est reconnu).
+
+    Un format ambigu (jj/mm ou mm/jj) est tranché par l'ordre qui lit le plus de textes de
+    l'échantillon, le jour avant le mois à égalité.
+    """
+    echantillon = textes[:taille_echantillon] if len(textes) <= taille_echantillon else \
+        np.random.default_rng(0).choice(textes, taille_echantillon, replace=False)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        formats = pd.Series([guess_datetime_format(t, dayfirst=dayfirst) for t in echantillon], dtype=object).dropna()
+    if formats.empty:
+        return None
+    candidats = _ordres_jour_mois(formats.map(lambda f: _ordres_jour_mois(f)[0]).value_counts().index[0])
+    if len(candidats) == 1:
+        return candidats[0]
+    echantillon = np.asarray(echantillon, dtype=object)
+    return max(candidats, key=lambda f: _nb_lus(echantillon, f))  # max garde le premier à égalité.
+
+def _textes_en_dates(textes, format_textes, dayfirst):
+    """Convertit des textes uniques : un appel vectorisé au format dominant, puis l'analyse
+    au cas par cas (format='mixed') pour le seul reliquat qui n'y correspond pas. Un texte qui
+    ne se lit qu'avec le jour et le mois inversés reste NaT : le lire ainsi mélangerait deux
+    ordres dans la même colonne."""
+    resultat = np.full(len(textes), np.datetime64('NaT'), dtype='datetime64[ns]')
+    if not len(textes):
+        return resultat
+    restants = np.ones(len(textes), dtype=bool)
+    candidats = _ordres_jour_mois(format_textes)
+    if format_textes is not None:
+        resultat = pd.to_datetime(textes, format=format_textes, errors='coerce').to_numpy(dtype='datetime64[ns]')
+        restants = np.isnat(resultat)
+    if restants.any() and len(candidats) == 2:
+        inverse = candidats[1] if candidats[0] == format_textes else candidats[0]
+        restants &= pd.isna(pd.to_datetime(textes, format=inverse, errors='coerce'))
+        dayfirst = format_textes.index('%d') < format_textes.index('%m')
+    if restants.any():
+        resultat[restants] = pd.to_datetime(textes[restants], format='mixed', dayfirst=dayfirst, errors='coerce').to_numpy(dtype='datetime64[ns]')
+    return resultat
+
+def _series_excel_en_dates(nombres):
+    """Numéros de série Excel (jours depuis le 30/12/1899, fraction = heure), à la milliseconde."""
+    nombres = np.asarray(nombres, dtype=np.float64)
+    valides = (nombres >= 1) & (nombres <= SERIE_EXCEL_MAX)
+    resultat = np.full(len(nombres), np.datetime64('NaT'), dtype='datetime64[ns]')
+    millisecondes = np.round(nombres[valides] * 86_400_000).astype(np.int64)
+    resultat[valides] = ORIGINE_DATES_EXCEL.to_datetime64() + millisecondes.astype('timedelta64[ms]')
+    return resultat
+
+def convertir_dates(valeurs, dayfirst=False, memoriser=False, mesure=None):
+    """Conversion rapide d'une colonne de dates Excel en datetime64 (NaT si illisible).
+
+    Les cellules sont traitées par nature : dates natives en un appel, numéros de série Excel
+    par calcul direct, textes par format dominant détecté sur un échantillon (voir
+    `format_dominant` et `_textes_en_dates`), chaque texte distinct n'étant analysé qu'une fois. Avec
+    `memoriser=True` (dates de congés et d'affectations, très répétitives), les conversions
+    de textes sont conservées d'un appel à l'autre. Le nombre de valeurs non vides devenues
+    NaT est ajouté à `mesure['dates_invalides']`.
+    """
+    serie = valeurs if isinstance(valeurs, pd.Series) else pd.Series(valeurs)
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        return serie.astype('datetime64[ns]')
+    objets = serie.to_numpy(dtype=object)
+    resultat = np.full(len(objets), np.datetime64('NaT'), dtype='datetime64[ns]')
+    nature = pd.api.types.infer_dtype(objets, skipna=True)
+    if nature == 'string':
+        est_texte, est_nombre = serie.notna().to_numpy(), np.zeros(len(objets), dtype=bool)
+    elif nature in ('integer', 'floating', 'mixed-integer-float', 'decimal'):
+        est_texte, est_nombre = np.zeros(len(objets), dtype=bool), serie.notna().to_numpy()
+    elif nature in ('datetime', 'datetime64', 'date', 'empty'):
+        est_texte = est_nombre = np.zeros(len(objets), dtype=bool)
+    else:
+        est_texte = np.fromiter((isinstance(v, str) for v in objets), dtype=bool, count=len(objets))
+        est_nombre = np.fromiter((isinstance(v, (int, float, np.number)) and not isinstance(v, (bool, np.bool_)) for v in objets),
+                                 dtype=bool, count=len(objets))
+    autres = ~(est_texte | est_nombre)
+
+    if est_texte.any():
+        codes, textes = pd.factorize(objets[est_texte])
+        textes = np.asarray(textes, dtype=object)
+        format_textes = format_dominant(textes, dayfirst)
+        if memoriser:
+            # Clé avec le format retenu : le même texte ambigu peut se lire autrement dans une autre colonne.
+            cle = (format_textes, dayfirst)
+            with _VERROU_CACHE_DATES:
+                trouves = [_CACHE_DATES.get((cle, t)) for t in textes]
+                for t, date_connue in zip(textes, trouves):
+                    if date_connue is not None:
+                        _CACHE_DATES.move_to_end((cle, t))
+            connus = np.array([d is not None for d in trouves], dtype=bool)
+            dates_textes = np.full(len(textes), np.datetime64('NaT'), dtype='datetime64[ns]')
+            if connus.any():
+                dates_textes[connus] = [d for d in trouves if d is not None]
+            nouveaux = _textes_en_dates(textes[~connus], format_textes, dayfirst)
+            dates_textes[~connus] = nouveaux
+            with _VERROU_CACHE_DATES:
+                _CACHE_DATES.update(zip(((cle, t) for t in textes[~connus]), nouveaux))
+                while len(_CACHE_DATES) > TAILLE_MAX_CACHE_DATES:
+                    _CACHE_DATES.popitem(last=False)
+        else:
+            dates_textes = _textes_en_dates(textes, format_textes, dayfirst)
+        resultat[est_texte] = dates_textes[codes]
+    if est_nombre.any():
+        resultat[est_nombre] = _series_excel_en_dates(objets[est_nombre])
+    if autres.any():
+        resultat[autres] = pd.to_datetime(pd.Series(objets[autres], dtype=object), errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+    dates = pd.Series(resultat, index=serie.index, name=serie.name)
+    if mesure is not None:
+        invalides = int((serie.notna().to_numpy() & np.isnat(resultat)).sum())
+        mesure['dates_invalides'] = mesure.get('dates_invalides', 0) + invalides
+    return dates
+
+def prepare_conges_df(df_conges_raw, mesure=None):
     if df_conges_raw.empty:
         return pd.DataFrame(columns=['Matricule', 'Type_Congé', 'Date_Debut', 'Date_Fin', 'Type_Congé_Standard'])
-    conges_cols_map = {'Matricule': ['matr', 'id'], 'Type_Congé': ['type', 'motif'], 'Date_Debut': ['debut', 'début', 'start'], 'Date_Fin': ['fin', 'end']}
-    df_conges = find_and_rename_header(df_conges_raw.copy(), conges_cols_map)
+    if 'Type_Congé_Standard' in df_conges_raw.columns:
+        return df_conges_raw  # Déjà préparé (par exemple relu depuis le cache des imports).
+    df_conges = find_and_rename_header(df_conges_raw, CONGES_COLS_MAP)
     df_conges.drop_duplicates(inplace=True)
     if 'Date_Fin' not in df_conges.columns:
         df_conges['Date_Fin'] = pd.NaT
-    df_conges['Date_Debut'] = pd.to_datetime(df_conges['Date_Debut'], errors='coerce', dayfirst=True)
-    df_conges['Date_Fin'] = pd.to_datetime(df_conges['Date_Fin'], errors='coerce', dayfirst=True).fillna(df_conges['Date_Debut'])
+    df_conges['Date_Debut'] = convertir_dates(df_conges['Date_Debut'], dayfirst=True, memoriser=True, mesure=mesure)
+    df_conges['Date_Fin'] = convertir_dates(df_conges['Date_Fin'], dayfirst=True, memoriser=True, mesure=mesure).fillna(df_conges['Date_Debut'])
     df_conges.dropna(subset=['Matricule', 'Date_Debut', 'Date_Fin'], inplace=True)
     def find_type(text):
         text_lower = str(text).lower()
@@ -81,26 +275,184 @@ def prepare_conges_df(df_conges_raw):
 def prepare_affectations_df(df_affectations_raw):
     if df_affectations_raw.empty:
         return pd.DataFrame()
-    affectations_cols_map = {
-        'Matricule': ['matr', 'id'], 'Date': ['date'],
-        'Affectation': ['affectation', 'tâche', 'tache', 'type'],
-        'Lieu_Chantier': ['lieu', 'chantier', 'ville'],
-        'Projet_Domicile': ['projet', 'domicile']
-    }
-    df_affectations = find_and_rename_header(df_affectations_raw.copy(), affectations_cols_map)
+    if {'Matricule', 'Date', 'Affectation'}.issubset(df_affectations_raw.columns):
+        return df_affectations_raw  # Déjà préparé (par exemple relu depuis le cache des imports).
+    df_affectations = find_and_rename_header(df_affectations_raw, AFFECTATIONS_COLS_MAP)
     return df_affectations
 
+def dedoublonner_pointages(df_pointage, intervalle_securite):
+    """Supprime les re-badgeages : un pointage n'est conservé que s'il suit de plus de
+    `intervalle_securite` le dernier pointage *conservé* du même matricule.
+
+    `df_pointage` doit être trié par Matricule puis Pointage.
+    """
+    if df_pointage.empty:
+        return df_pointage.reset_index(drop=True)
+    horodatages = df_pointage['Pointage'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    matricules = df_pointage['Matricule'].to_numpy()
+    seuil = pd.Timedelta(intervalle_securite).value
+
+    debut_groupe = np.ones(len(horodatages), dtype=bool)
+    debut_groupe[1:] = matricules[1:] != matricules[:-1]
+    ecart = np.diff(horodatages, prepend=horodatages[0])
+    # Un pointage éloigné de plus du seuil du pointage précédent est forcément conservé :
+    # le dernier pointage conservé est au moins aussi ancien que le précédent.
+    a_garder = debut_groupe | (ecart > seuil)
+    dernier_ancre = np.maximum.accumulate(np.where(a_garder, np.arange(len(horodatages)), 0))
+
+    # Seuls les pointages rapprochés sont parcourus, en ordre croissant, pour les comparer
+    # au dernier pointage conservé (ancre ou pointage rapproché déjà retenu).
+    valeurs = horodatages.tolist()
+    ancres = dernier_ancre.tolist()
+    dernier_retenu = -1
+    for k in np.flatnonzero(~a_garder).tolist():
+        reference = max(ancres[k], dernier_retenu)
+        if valeurs[k] - valeurs[reference] > seuil:
+            a_garder[k] = True
+            dernier_retenu = k
+    return df_pointage[a_garder].reset_index(drop=True)
+
 def get_full_date_range(mois, annee):
     start_date = f'{annee}-{mois:02d}-01'
     end_date = pd.to_datetime(start_date) + pd.offsets.MonthEnd(1)
     return pd.date_range(start=start_date, end=end_date, freq='D')
 
+def _decalage_horaire(heure):
+    """Convertit une heure de CONFIG en décalage timedelta64 depuis minuit."""
+    return np.timedelta64(((heure.hour * 60 + heure.minute) * 60 + heure.second) * 1_000_000 + heure.microsecond, 'us').astype('timedelta64[ns]')
+
+class Calendrier:
+    """Faits journaliers d'une plage de dates contiguë, calculés une seule fois depuis CONFIG.
+
+    Tous les attributs sont des tableaux numpy alignés sur `jours` (un élément par jour) :
+    jour de la semaine, jour férié/ouvrable, blocs de présence, pause déjeuner, fenêtre de nuit,
+    limite de retard, etc. C'est la source unique des bornes utilisées par les calculs d'heures
+    et de présence. Les tableaux sont en lecture seule car le calendrier est mis en cache.
+    """
+
+    def __init__(self, jours, jours_feries=()):
+        jours = pd.DatetimeIndex(jours).normalize()
+        feries = pd.DatetimeIndex(pd.to_datetime(list(jours_feries))).normalize()
+        self.jours = jours.to_numpy(dtype='datetime64[ns]')
+        self.jours_semaine = np.array(jours.day_name(), dtype=object)
+        self.est_jour_ferie = jours.isin(feries)
+        self.est_jour_ouvrable = (self.jours_semaine != CONFIG['JOUR_DIMANCHE']) & ~self.est_jour_ferie
+        # Un congé n'est décompté que du lundi au samedi hors fériés (sauf maternité, voir analyser_pointages).
+        self.est_jour_decompte_conge = (jours.weekday < 6) & ~self.est_jour_ferie
+        est_vendredi = self.jours_semaine == CONFIG['JOUR_VENDREDI']
+        est_samedi = self.jours_semaine == CONFIG['JOUR_SAMEDI']
+
+        def a_heure(heure, heure_vendredi=None, heure_samedi=None):
+            decalage = np.full(len(self.jours), _decalage_horaire(heure))
+            if heure_vendredi is not None:
+                decalage[est_vendredi] = _decalage_horaire(heure_vendredi)
+            if heure_samedi is not None:
+                decalage[est_samedi] = _decalage_horaire(heure_samedi)
+            return self.jours + decalage
+
+        self.debut_journee = a_heure(CONFIG['HEURE_DEBUT_JOURNEE_NORMALE'])
+        self.limite_retard = self.debut_journee + np.timedelta64(CONFIG['TOLERANCE_RETARD_MIN'], 'm')
+        self.pause_debut = a_heure(CONFIG['HEURE_DEBUT_PAUSE_DEJ'])
+        self.pause_fin = a_heure(CONFIG['HEURE_FIN_PAUSE_DEJ_LUN_JEU'], CONFIG['HEURE_FIN_PAUSE_DEJ_VENDREDI'])
+        self.bloc_matin_debut = self.debut_journee
+        self.bloc_matin_fin = self.pause_debut
+        self.bloc_soir_debut = self.pause_fin
+        self.bloc_soir_fin = a_heure(CONFIG['HEURE_FIN_JOURNEE_NORMALE_STANDARD_THEORIQUE'], CONFIG['HEURE_FIN_JOURNEE_NORMALE_VENDREDI_THEORIQUE'])
+        self.nuit_debut = a_heure(CONFIG['HEURE_DEBUT_NUIT'])
+        self.nuit_fin = a_heure(CONFIG['HEURE_FIN_NUIT'])
+        self.limite_samedi = a_heure(CONFIG['HEURE_FIN_TRAVAIL_SAMEDI_MATIN'])
+        # Journée théorique d'une affectation chantier/domicile (le vendredi garde la fin standard).
+        self.fin_affectation = a_heure(CONFIG['HEURE_FIN_JOURNEE_NORMALE_STANDARD_THEORIQUE'], heure_samedi=CONFIG['HEURE_FIN_TRAVAIL_SAMEDI_MATIN'])
+        for valeur in vars(self).values():
+            valeur.flags.writeable = False
+
+    def __len__(self):
+        return len(self.jours)
+
+    def indices(self, dates):
+        """Position de chaque date (tableau datetime64) dans le calendrier."""
+        if len(self.jours) == 0:
+            return np.zeros(len(dates), dtype=np.int64)
+        jours = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]')
+        return (jours - self.jours[0].astype('datetime64[D]')).astype(np.int64)
+
+    def couvre(self, dates):
+        if len(dates) == 0:
+            return True
+        positions = self.indices(dates)
+        return len(self.jours) > 0 and positions.min() >= 0 and positions.max() < len(self.jours)
+
+    @classmethod
+    def couvrant(cls, dates):
+        """Calendrier minimal (sans jours fériés) couvrant les dates données."""
+        jours = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]')
+        if len(jours) == 0:
+            return cls([])
+        return cls(pd.date_range(jours.min(), jours.max(), freq='D'))
+
+@lru_cache(maxsize=32)
+def _calendrier_du_mois(mois, annee, jours_feries):
+    return Calendrier(get_full_date_range(mois, annee), jours_feries)
+
+def calendrier_du_mois(mois, annee, jours_feries=()):
+    """Calendrier mis en cache par (mois, année, jours fériés) d'une exécution à l'autre."""
+    feries = tuple(sorted({d.date() for d in pd.to_datetime(list(jours_feries))}))
+    return _calendrier_du_mois(mois, annee, feries)
+
+@lru_cache(maxsize=4096)
+def bornes_du_jour(jour):
+    """Bornes (pd.Timestamp) d'un jour, lues dans le calendrier du mois : pour les calculs scalaires."""
+    calendrier = calendrier_du_mois(jour.month, jour.year)
+    j = jour.day - 1
+    return {
+        nom: pd.Timestamp(getattr(calendrier, nom)[j])
+        for nom in ['debut_journee', 'limite_retard', 'pause_debut', 'pause_fin', 'bloc_matin_debut', 'bloc_matin_fin',
+                    'bloc_soir_debut', 'bloc_soir_fin', 'nuit_debut', 'nuit_fin', 'limite_samedi', 'fin_affectation']
+    }
+
+def resoudre_conges(df_conges, matricules, full_date_range):
+    """Projette les congés sur la grille (Matricule x Jour) en une seule passe.
+
+    Chaque congé est découpé en jours bornés au mois analysé, puis seul le premier congé
+    (ordre du fichier) est retenu pour chaque case, comme le faisait le filtre `iloc[0]`.
+    Renvoie un tableau (nb_matricules, nb_jours) contenant le Type_Congé_Standard ou ''.
+    """
+    types_conges = np.full((len(matricules), len(full_date_range)), '', dtype=object)
+    if df_conges.empty or len(full_date_range) == 0:
+        return types_conges
+
+    position_matricule = {m: i for i, m in enumerate(matricules)}
+    lignes = df_conges['Matricule'].astype(str).map(position_matricule).to_numpy()
+    # Un congé couvre le jour J si Date_Debut <= J et Date_Fin >= J (J à minuit).
+    premier_jour = df_conges['Date_Debut'].dt.ceil('D').to_numpy()
+    dernier_jour = df_conges['Date_Fin'].dt.floor('D').to_numpy()
+    debut_mois = full_date_range[0].to_datetime64()
+    un_jour = np.timedelta64(1, 'D')
+    col_debut = np.maximum((premier_jour - debut_mois) // un_jour, 0)
+    col_fin = np.minimum((dernier_jour - debut_mois) // un_jour, len(full_date_range) - 1)
+
+    valides = ~pd.isna(lignes)
+    nb_jours = np.where(valides, col_fin - col_debut + 1, 0).clip(min=0).astype(np.int64)
+    if nb_jours.sum() == 0:
+        return types_conges
+
+    # Expansion vectorisée des intervalles : une entrée par (congé, jour couvert).
+    rang_conge = np.repeat(np.arange(len(nb_jours)), nb_jours)
+    decalage = np.arange(nb_jours.sum()) - np.repeat(np.cumsum(nb_jours) - nb_jours, nb_jours)
+    cellules = lignes[rang_conge].astype(np.int64) * len(full_date_range) + col_debut[rang_conge] + decalage
+    # np.unique renvoie la première occurrence : le premier congé du fichier l'emporte.
+    cellules_uniques, premiere_occurrence = np.unique(cellules, return_index=True)
+    types_standard = df_conges['Type_Congé_Standard'].to_numpy()
+    types_conges.flat[cellules_uniques] = types_standard[rang_conge[premiere_occurrence]]
+    return types_conges
+
 def calculer_heures_supplementaires(debut, fin, jour_semaine, est_jour_ferie, heures_normales_deja_comptees):
     heures_normales, h_sup25, h_sup50, h_sup100 = 0.0, 0.0, 0.0, 0.0
+    bornes = bornes_du_jour(debut.date())
     if est_jour_ferie or jour_semaine == CONFIG['JOUR_DIMANCHE']:
         duree_totale = (fin - debut).total_seconds() / 3600
-        nuit_debut_soir = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_DEBUT_NUIT']}")
-        nuit_fin_matin = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_FIN_NUIT']}")
+        nuit_debut_soir = bornes['nuit_debut']
+        nuit_fin_matin = bornes['nuit_fin']
         heures_nuit = 0
         if max(debut, nuit_debut_soir) < fin: heures_nuit += (fin - max(debut, nuit_debut_soir)).total_seconds() / 3600
         if min(fin, nuit_fin_matin) > debut: heures_nuit += (min(fin, nuit_fin_matin) - debut).total_seconds() / 3600
@@ -108,24 +460,23 @@ def calculer_heures_supplementaires(debut, fin, jour_semaine, est_jour_ferie, he
         h_sup100 += heures_nuit
         h_sup50 += heures_jour
     elif jour_semaine == CONFIG['JOUR_SAMEDI']:
-        limite_samedi = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_FIN_TRAVAIL_SAMEDI_MATIN']}")
+        limite_samedi = bornes['limite_samedi']
         if fin <= limite_samedi: heures_normales = (fin - debut).total_seconds() / 3600
         elif debut < limite_samedi:
             heures_normales = (limite_samedi - debut).total_seconds() / 3600
             h_sup50 = (fin - limite_samedi).total_seconds() / 3600
         else: h_sup50 = (fin - debut).total_seconds() / 3600
     else:
-        pause_debut = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_DEBUT_PAUSE_DEJ']}")
-        pause_fin_heure = CONFIG['HEURE_FIN_PAUSE_DEJ_VENDREDI'] if jour_semaine == CONFIG['JOUR_VENDREDI'] else CONFIG['HEURE_FIN_PAUSE_DEJ_LUN_JEU']
-        pause_fin = pd.to_datetime(f"{debut.date()} {pause_fin_heure}")
+        pause_debut = bornes['pause_debut']
+        pause_fin = bornes['pause_fin']
         duree_avant_pause = max(0, (min(fin, pause_debut) - debut).total_seconds() / 3600)
         duree_apres_pause = max(0, (fin - max(debut, pause_fin)).total_seconds() / 3600)
         heures_travaillees_reelles = duree_avant_pause + duree_apres_pause
         heures_normales_a_ajouter = min(heures_travaillees_reelles, CONFIG['DUREE_JOURNEE_NORMALE_HEURES'] - heures_normales_deja_comptees)
         heures_normales += heures_normales_a_ajouter
         heures_sup_jour = heures_travaillees_reelles - heures_normales_a_ajouter
-        nuit_debut_soir = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_DEBUT_NUIT']}")
-        nuit_fin_matin = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_FIN_NUIT']}")
+        nuit_debut_soir = bornes['nuit_debut']
+        nuit_fin_matin = bornes['nuit_fin']
         heures_nuit = 0
         if max(debut, nuit_debut_soir) < fin: heures_nuit += (fin - max(debut, nuit_debut_soir)).total_seconds() / 3600
         if min(fin, nuit_fin_matin) > debut: heures_nuit += (min(fin, nuit_fin_matin) - debut).total_seconds() / 3600
@@ -134,280 +485,743 @@ def calculer_heures_supplementaires(debut, fin, jour_semaine, est_jour_ferie, he
         h_sup25 += max(0, heures_sup_jour - heures_nuit_valide)
     return heures_normales, h_sup25, h_sup50, h_sup100
 
+def _en_heures(duree):
+    """Équivalent vectoriel de `duree.total_seconds() / 3600`."""
+    return duree.astype('timedelta64[ns]').astype(np.int64) / 1e9 / 3600
+
+def _heures_nuit_lot(debuts, fins, nuit_debut_soir, nuit_fin_matin):
+    debut_soir = np.maximum(debuts, nuit_debut_soir)
+    fin_matin = np.minimum(fins, nuit_fin_matin)
+    nuit_soir = np.where(debut_soir < fins, _en_heures(fins - debut_soir), 0.0)
+    nuit_matin = np.where(fin_matin > debuts, _en_heures(fin_matin - debuts), 0.0)
+    return nuit_soir + nuit_matin
+
+def calculer_heures_supplementaires_lot(debuts, fins, jours_semaine, est_jours_feries, heures_normales_deja_comptees, calendrier=None):
+    """Version vectorielle de `calculer_heures_supplementaires` pour un lot d'intervalles.
+
+    Chaque argument est un tableau aligné (un élément par intervalle). Les bornes de la journée
+    sont lues dans le `calendrier` (construit à la volée s'il ne couvre pas les dates), sans
+    analyse de chaîne, et les opérations flottantes suivent le même ordre que la version scalaire.
+    Renvoie les tableaux (heures_normales, h_sup25, h_sup50, h_sup100).
+    """
+    debuts = np.asarray(debuts, dtype='datetime64[ns]')
+    fins = np.asarray(fins, dtype='datetime64[ns]')
+    jours_semaine = np.asarray(jours_semaine, dtype=object)
+    est_jours_feries = np.asarray(est_jours_feries, dtype=bool)
+    deja_comptees = np.asarray(heures_normales_deja_comptees, dtype=np.float64)
+    if calendrier is None or not calendrier.couvre(debuts):
+        calendrier = Calendrier.couvrant(debuts)
+    j = calendrier.indices(debuts)
+    duree = _en_heures(fins - debuts)
+    heures_nuit = _heures_nuit_lot(debuts, fins, calendrier.nuit_debut[j], calendrier.nuit_fin[j])
+
+    est_repos = est_jours_feries | (jours_semaine == CONFIG['JOUR_DIMANCHE'])
+    est_samedi = ~est_repos & (jours_semaine == CONFIG['JOUR_SAMEDI'])
+    est_semaine = ~est_repos & ~est_samedi
+
+    # Dimanche et jours fériés : nuit à 100 %, le reste à 50 %.
+    h_sup100 = np.where(est_repos, 0.0 + heures_nuit, 0.0)
+    h_sup50 = np.where(est_repos, 0.0 + (duree - heures_nuit), 0.0)
+
+    # Samedi : heures normales jusqu'à la fin de matinée, 50 % au-delà.
+    limite_samedi = calendrier.limite_samedi[j]
+    avant_limite = fins <= limite_samedi
+    a_cheval = ~avant_limite & (debuts < limite_samedi)
+    heures_normales = np.where(est_samedi & avant_limite, duree, 0.0)
+    heures_normales = np.where(est_samedi & a_cheval, _en_heures(limite_samedi - debuts), heures_normales)
+    h_sup50 = np.where(est_samedi & a_cheval, _en_heures(fins - limite_samedi), h_sup50)
+    h_sup50 = np.where(est_samedi & ~avant_limite & ~a_cheval, duree, h_sup50)
+
+    # Autres jours : pause déjeuner déduite, plafond journalier, nuit à 50 % et reste à 25 %.
+    pause_debut = calendrier.pause_debut[j]
+    pause_fin = calendrier.pause_fin[j]
+    duree_avant_pause = np.maximum(0, _en_heures(np.minimum(fins, pause_debut) - debuts))
+    duree_apres_pause = np.maximum(0, _en_heures(fins - np.maximum(debuts, pause_fin)))
+    heures_travaillees_reelles = duree_avant_pause + duree_apres_pause
+    heures_normales_a_ajouter = np.minimum(heures_travaillees_reelles, CONFIG['DUREE_JOURNEE_NORMALE_HEURES'] - deja_comptees)
+    heures_sup_jour = heures_travaillees_reelles - heures_normales_a_ajouter
+    heures_nuit_valide = np.minimum(heures_sup_jour, heures_nuit)
+    heures_normales = np.where(est_semaine, 0.0 + heures_normales_a_ajouter, heures_normales)
+    h_sup50 = np.where(est_semaine, 0.0 + heures_nuit_valide, h_sup50)
+    h_sup25 = np.where(est_semaine, 0.0 + np.maximum(0, heures_sup_jour - heures_nuit_valide), 0.0)
+    return heures_normales, h_sup25, h_sup50, h_sup100
+
+
+class IndexPointages:
+    """Pointages regroupés une seule fois par (Matricule, Jour).
+
+    Les horodatages sont stockés triés dans un seul tableau datetime64 ; `bornes[g]:bornes[g+1]`
+    délimite le groupe g et `groupes` associe chaque clé (matricule, jour) à son numéro de groupe.
+    """
+
+    def __init__(self, df_pointage):
+        self.groupes = {}
+        self.horodatages = np.array([], dtype='datetime64[ns]')
+        self.bornes = np.zeros(1, dtype=np.int64)
+        # Clé de chaque groupe sous forme de tableaux alignés (utilisés par `grille`).
+        self.matricules_groupes = np.array([], dtype=object)
+        self.jours_groupes = np.array([], dtype='datetime64[ns]')
+        if df_pointage.empty:
+            return
+        cles = pd.MultiIndex.from_arrays([df_pointage['Matricule'].astype(str), df_pointage['Date']])
+        codes, cles_uniques = pd.factorize(cles)
+        horodatages = df_pointage['Pointage'].to_numpy()
+        ordre = np.lexsort((horodatages, codes))
+        self.horodatages = horodatages[ordre]
+        self.bornes = np.searchsorted(codes[ordre], np.arange(len(cles_uniques) + 1))
+        self.groupes = {cle: g for g, cle in enumerate(cles_uniques)}
+        self.matricules_groupes = cles_uniques.get_level_values(0).to_numpy(dtype=object)
+        self.jours_groupes = cles_uniques.get_level_values(1).to_numpy(dtype='datetime64[ns]')
+
+    def sous_index(self, matricules):
+        """Index restreint à quelques matricules, avec des tableaux compacts (envoi vers un processus)."""
+        matricules = set(matricules)
+        sous_index = IndexPointages(pd.DataFrame())
+        cles = [(cle, g) for cle, g in self.groupes.items() if cle[0] in matricules]
+        if not cles:
+            return sous_index
+        groupes = np.array([g for _, g in cles])
+        tailles = self.bornes[groupes + 1] - self.bornes[groupes]
+        sous_index.bornes = np.concatenate([[0], np.cumsum(tailles)])
+        positions = np.repeat(self.bornes[groupes] - sous_index.bornes[:-1], tailles) + np.arange(tailles.sum())
+        sous_index.horodatages = self.horodatages[positions]
+        sous_index.groupes = {cle: g for g, (cle, _) in enumerate(cles)}
+        sous_index.matricules_groupes = self.matricules_groupes[groupes]
+        sous_index.jours_groupes = self.jours_groupes[groupes]
+        return sous_index
+
+    def __getstate__(self):
+        # Les clés sont transmises sous forme de tableaux plutôt qu'en dict de tuples (Timestamp).
+        return {
+            'horodatages': self.horodatages, 'bornes': self.bornes,
+            'matricules': self.matricules_groupes, 'jours': self.jours_groupes,
+        }
+
+    def __setstate__(self, etat):
+        self.horodatages, self.bornes = etat['horodatages'], etat['bornes']
+        self.matricules_groupes, self.jours_groupes = etat['matricules'], etat['jours']
+        self.groupes = {cle: g for g, cle in enumerate(zip(etat['matricules'], pd.DatetimeIndex(etat['jours'])))}
+
+    def grille(self, matricules, calendrier):
+        """Numéro de groupe de chaque (matricule, jour du calendrier) en tableau M×D, -1 sans pointage."""
+        grille = np.full((len(matricules), len(calendrier)), -1, dtype=np.int64)
+        if len(self.matricules_groupes) == 0 or len(calendrier) == 0:
+            return grille
+        lignes = pd.Index(matricules).get_indexer(self.matricules_groupes)
+        colonnes = calendrier.indices(self.jours_groupes)
+        valides = (lignes >= 0) & (colonnes >= 0) & (colonnes < len(calendrier))
+        grille[lignes[valides], colonnes[valides]] = np.flatnonzero(valides)
+        return grille
+
+    def groupe(self, matricule, jour):
+        return self.groupes.get((matricule, jour))
+
+    def pointages_du_jour(self, matricule, jour):
+        g = self.groupe(matricule, jour)
+        if g is None:
+            return self.horodatages[:0]
+        return self.horodatages[self.bornes[g]:self.bornes[g + 1]]
+
+
+AffectationJour = namedtuple('AffectationJour', ['affectation', 'lieu_chantier', 'projet_domicile', 'est_chantier', 'est_domicile'])
+
+class IndexAffectations:
+    """Affectations du mois indexées par (Matricule, Jour), construites une seule fois.
+
+    Le DataFrame reçu doit déjà être dédoublonné (une ligne par matricule et par jour) ; le type
+    chantier/domicile est classé ici une fois pour toutes au lieu d'être recherché chaque jour.
+    """
+
+    def __init__(self, df_affectations):
+        self.affectations = {}
+        if df_affectations.empty:
+            return
+        texte = df_affectations['Affectation'].astype(str).str.lower()
+        vide = pd.Series('', index=df_affectations.index)
+        enregistrements = zip(
+            df_affectations['Affectation'],
+            df_affectations.get('Lieu_Chantier', vide),
+            df_affectations.get('Projet_Domicile', vide),
+            texte.str.contains('chantier', regex=False),
+            texte.str.contains('domicile', regex=False),
+        )
+        cles = zip(df_affectations['Matricule'].astype(str), df_affectations['Date'])
+        self.affectations = {cle: AffectationJour(*valeurs) for cle, valeurs in zip(cles, enregistrements)}
+
+    def sous_index(self, matricules):
+        matricules = set(matricules)
+        sous_index = IndexAffectations(pd.DataFrame())
+        sous_index.affectations = {cle: valeurs for cle, valeurs in self.affectations.items() if cle[0] in matricules}
+        return sous_index
+
+    def affectation_du_jour(self, matricule, jour):
+        return self.affectations.get((matricule, jour))
+
+    def grille(self, matricules, calendrier):
+        """(positions M×D, liste d'AffectationJour) : position de l'affectation de chaque (matricule, jour), -1 sinon."""
+        grille = np.full((len(matricules), len(calendrier)), -1, dtype=np.int64)
+        if not self.affectations or len(calendrier) == 0:
+            return grille, []
+        cles = list(self.affectations)
+        lignes = pd.Index(matricules).get_indexer([m for m, _ in cles])
+        colonnes = calendrier.indices(np.array([j for _, j in cles], dtype='datetime64[ns]'))
+        valides = (lignes >= 0) & (colonnes >= 0) & (colonnes < len(calendrier))
+        grille[lignes[valides], colonnes[valides]] = np.arange(valides.sum())
+        return grille, [self.affectations[cles[k]] for k in np.flatnonzero(valides)]
+
+
+def calculer_presence_lot(horodatages, debuts_groupes, fins_groupes, jours, jours_semaine, calendrier=None):
+    """Score de présence par demi-journée pour un lot de jours en une seule passe.
+
+    Le jour k regroupe les pointages triés `horodatages[debuts_groupes[k]:fins_groupes[k]]`
+    (groupe vide = aucun pointage). Les paires (entrée, sortie) sont testées contre les blocs
+    matin/soir du calendrier, le dernier pointage d'un nombre impair est traité comme isolé,
+    et le samedi ne compte que le bloc du matin (journée entière).
+    Renvoie (Jours_Presence_Travail, Type_Absence_Jour) sous forme de tableaux.
+    """
+    debuts_groupes = np.asarray(debuts_groupes, dtype=np.int64)
+    fins_groupes = np.asarray(fins_groupes, dtype=np.int64)
+    jours = np.asarray(jours, dtype='datetime64[ns]')
+    est_samedi = np.asarray(jours_semaine, dtype=object) == CONFIG['JOUR_SAMEDI']
+    if calendrier is None or not calendrier.couvre(jours):
+        calendrier = Calendrier.couvrant(jours)
+    j = calendrier.indices(jours)
+    bloc_matin_debut, bloc_matin_fin = calendrier.bloc_matin_debut[j], calendrier.bloc_matin_fin[j]
+    bloc_soir_debut, bloc_soir_fin = calendrier.bloc_soir_debut[j], calendrier.bloc_soir_fin[j]
+
+    nb_pointages = fins_groupes - debuts_groupes
+    nb_paires = nb_pointages // 2
+    # Toutes les paires à plat, chacune rattachée à son jour.
+    jour_paire = np.repeat(np.arange(len(nb_paires)), nb_paires)
+    rang_paire = np.arange(nb_paires.sum()) - np.repeat(np.cumsum(nb_paires) - nb_paires, nb_paires)
+    entrees = horodatages[debuts_groupes[jour_paire] + 2 * rang_paire]
+    sorties = horodatages[debuts_groupes[jour_paire] + 2 * rang_paire + 1]
+    matin_paire = (entrees < bloc_matin_fin[jour_paire]) & (sorties > bloc_matin_debut[jour_paire])
+    soir_paire = (entrees < bloc_soir_fin[jour_paire]) & (sorties > bloc_soir_debut[jour_paire])
+    presence_matin = np.bincount(jour_paire, weights=matin_paire, minlength=len(nb_paires)) > 0
+    presence_soir = np.bincount(jour_paire, weights=soir_paire, minlength=len(nb_paires)) > 0
+
+    k = np.flatnonzero(nb_pointages % 2 == 1)
+    pointage_isole = horodatages[fins_groupes[k] - 1]
+    presence_matin[k] |= (bloc_matin_debut[k] <= pointage_isole) & (pointage_isole < bloc_matin_fin[k])
+    # Un pointage isolé compte pour le soir dès qu'il est postérieur au début du bloc soir
+    # (et non plus seulement s'il tombe dans le bloc).
+    presence_soir[k] |= pointage_isole >= bloc_soir_debut[k]
+    presence_soir &= ~est_samedi
+
+    scores = np.where(est_samedi, np.where(presence_matin, 1.0, 0.0), 0.5 * presence_matin + 0.5 * presence_soir)
+    types_absence = np.select(
+        [est_samedi & ~presence_matin, ~est_samedi & (scores == 0.0), ~est_samedi & (scores == 0.5) & presence_matin, ~est_samedi & (scores == 0.5)],
+        ["Journée complète (Samedi)", "Journée complète", "Soir", "Matin"],
+        default=""
+    ).astype(object)
+    return scores, types_absence
 
 def calculer_presence_par_blocs(pointages_du_jour, jour_dt, jour_semaine):
-    if pointages_du_jour.empty:
-        type_absence = "Journée complète (Samedi)" if jour_semaine == CONFIG['JOUR_SAMEDI'] else "Journée complète"
-        return 0.0, type_absence
+    pointages = np.sort(np.asarray(pointages_du_jour, dtype='datetime64[ns]'))
+    jour = pd.Timestamp(jour_dt).normalize()
+    scores, types_absence = calculer_presence_lot(pointages, [0], [len(pointages)], [jour], [jour_semaine], calendrier_du_mois(jour.month, jour.year))
+    return float(scores[0]), types_absence[0]
 
-    periodes_travail = []
-    pointages = sorted(pointages_du_jour['Pointage'].tolist())
-    
-    pointage_isole = None
-    if len(pointages) % 2 != 0:
-        pointage_isole = pointages.pop()
-
-    for i in range(0, len(pointages), 2):
-        debut_travail = pointages[i]
-        fin_travail = pointages[i+1]
-        if pd.notna(debut_travail) and pd.notna(fin_travail):
-            periodes_travail.append((debut_travail, fin_travail))
-
-    if not periodes_travail and not pointage_isole:
-        type_absence = "Journée complète (Samedi)" if jour_semaine == CONFIG['JOUR_SAMEDI'] else "Journée complète"
-        return 0.0, type_absence
-
-    date_jour = jour_dt.date()
-    bloc_matin_debut = pd.to_datetime(f"{date_jour} {CONFIG['HEURE_DEBUT_JOURNEE_NORMALE']}")
-    bloc_matin_fin = pd.to_datetime(f"{date_jour} {CONFIG['HEURE_DEBUT_PAUSE_DEJ']}")
-    
-    if jour_semaine == CONFIG['JOUR_VENDREDI']:
-        bloc_soir_debut = pd.to_datetime(f"{date_jour} {CONFIG['HEURE_FIN_PAUSE_DEJ_VENDREDI']}")
-        bloc_soir_fin = pd.to_datetime(f"{date_jour} {CONFIG['HEURE_FIN_JOURNEE_NORMALE_VENDREDI_THEORIQUE']}")
-    else:
-        bloc_soir_debut = pd.to_datetime(f"{date_jour} {CONFIG['HEURE_FIN_PAUSE_DEJ_LUN_JEU']}")
-        bloc_soir_fin = pd.to_datetime(f"{date_jour} {CONFIG['HEURE_FIN_JOURNEE_NORMALE_STANDARD_THEORIQUE']}")
-
-    presence_matin = False
-    for debut, fin in periodes_travail:
-        if debut < bloc_matin_fin and fin > bloc_matin_debut:
-            presence_matin = True
-            break
-
-    presence_soir = False
-    if jour_semaine != CONFIG['JOUR_SAMEDI']:
-        for debut, fin in periodes_travail:
-            if debut < bloc_soir_fin and fin > bloc_soir_debut:
-                presence_soir = True
-                break
-    
-    if pointage_isole:
-        if not presence_matin and (bloc_matin_debut <= pointage_isole < bloc_matin_fin):
-            presence_matin = True
-            
-        # --- DÉBUT DE LA MODIFICATION ---
-        # Ancienne condition : if not presence_soir and (bloc_soir_debut <= pointage_isole < bloc_soir_fin):
-        # Nouvelle condition : On vérifie juste si le pointage est après le début du bloc soir.
-        if not presence_soir and (pointage_isole >= bloc_soir_debut):
-            presence_soir = True
-        # --- FIN DE LA MODIFICATION ---
-
-    if jour_semaine == CONFIG['JOUR_SAMEDI']:
-        return (1.0, "") if presence_matin else (0.0, "Journée complète (Samedi)")
-    else:
-        score = 0.0
-        if presence_matin: score += 0.5
-        if presence_soir: score += 0.5
-        
-        type_absence = ""
-        if score == 0.0:
-            type_absence = "Journée complète"
-        elif score == 0.5:
-            type_absence = "Soir" if presence_matin else "Matin"
-        
-        return score, type_absence
-
-def calculer_indicateurs_jour_travaille(jour_pointages):
-    heures_normales, h_sup25, h_sup50, h_sup100, heures_pause_dej = 0.0, 0.0, 0.0, 0.0, 0.0
-    date_jour = jour_pointages.iloc[0]['Date']
-    jour_semaine = pd.to_datetime(date_jour).day_name()
-    est_jour_ferie = jour_pointages.iloc[0]['Est_JourFerie']
-    pointages_du_jour = jour_pointages.sort_values('Pointage')
-    heures_normales_deja_comptees = 0.0
-    num_pointages = len(pointages_du_jour)
-    if num_pointages % 2 != 0: num_pointages -= 1
-    for i in range(0, num_pointages, 2):
-        debut = pointages_du_jour.iloc[i]['Pointage']
-        fin = pointages_du_jour.iloc[i+1]['Pointage']
-        if pd.isna(fin) or pd.isna(debut): continue
-        pause_debut = pd.to_datetime(f"{date_jour} {CONFIG['HEURE_DEBUT_PAUSE_DEJ']}")
-        pause_fin_heure = CONFIG['HEURE_FIN_PAUSE_DEJ_VENDREDI'] if jour_semaine == CONFIG['JOUR_VENDREDI'] else CONFIG['HEURE_FIN_PAUSE_DEJ_LUN_JEU']
-        pause_fin = pd.to_datetime(f"{date_jour} {pause_fin_heure}")
-        overlap_debut_pause = max(debut, pause_debut)
-        overlap_fin_pause = min(fin, pause_fin)
-        if overlap_fin_pause > overlap_debut_pause:
-            heures_pause_dej += (overlap_fin_pause - overlap_debut_pause).total_seconds() / 3600
-        hn, h25, h50, h100 = calculer_heures_supplementaires(debut, fin, jour_semaine, est_jour_ferie, heures_normales_deja_comptees)
-        heures_normales += hn
-        heures_normales_deja_comptees += hn
-        h_sup25 += h25
-        h_sup50 += h50
-        h_sup100 += h100
-    return {
-        'Heures_Bureau': round(heures_normales, 2), 'HS_Bureau_25': round(h_sup25, 2),
-        'HS_Bureau_50': round(h_sup50, 2), 'HS_Bureau_100': round(h_sup100, 2),
-        'Heures_Pause_Dej': round(heures_pause_dej, 2)
+def calculer_indicateurs_jours_travailles(horodatages, debuts_groupes, fins_groupes, jours, jours_semaine, est_jours_feries, calendrier=None):
+    """Calcule les heures de bureau de plusieurs jours travaillés en un seul lot.
+
+    Le jour k regroupe les pointages triés `horodatages[debuts_groupes[k]:fins_groupes[k]]`.
+    Les paires (entrée, sortie) sont traitées rang par rang : le plafond d'heures normales
+    dépend des paires précédentes du même jour, et les cumuls suivent l'ordre de la boucle scalaire.
+    """
+    debuts_groupes = np.asarray(debuts_groupes, dtype=np.int64)
+    nb_paires = (np.asarray(fins_groupes, dtype=np.int64) - debuts_groupes) // 2
+    jours = np.asarray(jours, dtype='datetime64[ns]')
+    jours_semaine = np.asarray(jours_semaine, dtype=object)
+    est_jours_feries = np.asarray(est_jours_feries, dtype=bool)
+    cumuls = {cle: np.zeros(len(debuts_groupes)) for cle in ['Heures_Bureau', 'HS_Bureau_25', 'HS_Bureau_50', 'HS_Bureau_100', 'Heures_Pause_Dej']}
+
+    if calendrier is None or not calendrier.couvre(jours):
+        calendrier = Calendrier.couvrant(jours)
+    j = calendrier.indices(jours)
+    pause_debut, pause_fin = calendrier.pause_debut[j], calendrier.pause_fin[j]
+    for rang in range(int(nb_paires.max()) if len(nb_paires) else 0):
+        k = np.flatnonzero(nb_paires > rang)
+        debut = horodatages[debuts_groupes[k] + 2 * rang]
+        fin = horodatages[debuts_groupes[k] + 2 * rang + 1]
+        overlap_debut_pause = np.maximum(debut, pause_debut[k])
+        overlap_fin_pause = np.minimum(fin, pause_fin[k])
+        chevauchement = overlap_fin_pause > overlap_debut_pause
+        cumuls['Heures_Pause_Dej'][k[chevauchement]] += _en_heures(overlap_fin_pause - overlap_debut_pause)[chevauchement]
+        hn, h25, h50, h100 = calculer_heures_supplementaires_lot(debut, fin, jours_semaine[k], est_jours_feries[k], cumuls['Heures_Bureau'][k], calendrier)
+        cumuls['Heures_Bureau'][k] += hn
+        cumuls['HS_Bureau_25'][k] += h25
+        cumuls['HS_Bureau_50'][k] += h50
+        cumuls['HS_Bureau_100'][k] += h100
+    # round() de Python (et non np.round) pour garder exactement l'arrondi de la version scalaire.
+    return {cle: [round(v, 2) for v in valeurs.tolist()] for cle, valeurs in cumuls.items()}
+
+def calculer_indicateurs_jour_travaille(pointages_du_jour, date_jour, est_jour_ferie):
+    pointages = np.sort(np.asarray(pointages_du_jour, dtype='datetime64[ns]'))
+    date_jour = pd.Timestamp(date_jour).normalize()
+    resultats = calculer_indicateurs_jours_travailles(pointages, [0], [len(pointages)], [date_jour], [date_jour.day_name()], [est_jour_ferie], calendrier_du_mois(date_jour.month, date_jour.year))
+    return {cle: valeurs[0] for cle, valeurs in resultats.items()}
+
+def _colonne_categorielle(taille, positions, valeurs, defaut=''):
+    """Colonne catégorielle de `taille` lignes valant `defaut`, sauf aux `positions` (`valeurs`, NaN admis)."""
+    codes_valeurs, categories = pd.factorize(pd.Series(valeurs, dtype=object))
+    categories = pd.Index(categories, dtype=object)
+    if defaut not in categories:
+        categories = categories.append(pd.Index([defaut], dtype=object))
+    codes = np.full(taille, categories.get_loc(defaut), dtype=np.int32)
+    codes[positions] = codes_valeurs
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def _moteur_journalier(matricules, types_conges, calendrier, index_affectations, index_pointages):
+    """Construit le détail journalier (une ligne par matricule et par jour du calendrier).
+
+    `types_conges` est la grille de `resoudre_conges` pour ces matricules, dans le même ordre.
+    Les colonnes sont préallouées (M×D lignes, ordre matricule puis jour) et remplies par masques,
+    dans l'ordre de priorité : congé décompté, jour non ouvrable, affectation, pointages.
+    """
+    nb_matricules, nb_jours = len(matricules), len(calendrier)
+    taille = nb_matricules * nb_jours
+    matricules = np.asarray(matricules, dtype=object).astype(str)
+
+    # 1. Congé décompté (la maternité court aussi les dimanches et jours fériés).
+    en_conge = (types_conges != '') & (calendrier.est_jour_decompte_conge[None, :] | (types_conges == 'CONGE_MATERNITE'))
+    # 2. Jours non ouvrables : ligne par défaut. 3. Affectation du jour. 4. Sinon, pointages.
+    restants = ~en_conge & calendrier.est_jour_ouvrable[None, :]
+    grille_affectations, affectations = index_affectations.grille(matricules, calendrier)
+    avec_affectation = restants & (grille_affectations >= 0)
+    sur_pointages = restants & ~avec_affectation
+
+    positions_conge = np.flatnonzero(en_conge)
+    positions_affectation = np.flatnonzero(avec_affectation)
+    positions_pointage = np.flatnonzero(sur_pointages)
+    jours_affectation = positions_affectation % nb_jours
+    jours_pointage = positions_pointage % nb_jours
+    affectations_du_jour = [affectations[k] for k in grille_affectations.ravel()[positions_affectation]]
+
+    presence = np.zeros(taille, dtype=np.float32)
+    en_retard = np.zeros(taille, dtype=bool)
+    heures = {nom: np.zeros(taille, dtype=np.float32) for nom in COLONNES_HEURES}
+    presence[positions_affectation] = 1.0
+
+    # Heures théoriques d'une journée d'affectation chantier/domicile, calculées une fois par jour du mois.
+    heures_affectation = calculer_heures_supplementaires_lot(
+        calendrier.debut_journee, calendrier.fin_affectation, calendrier.jours_semaine,
+        calendrier.est_jour_ferie, np.zeros(nb_jours), calendrier
+    )
+    for lieu, attribut in (('Chantier', 'est_chantier'), ('Domicile', 'est_domicile')):
+        concernes = np.array([getattr(a, attribut) for a in affectations_du_jour], dtype=bool)
+        for nom, valeurs in zip((f'Heures_{lieu}', f'HS_{lieu}_25', f'HS_{lieu}_50', f'HS_{lieu}_100'), heures_affectation):
+            heures[nom][positions_affectation[concernes]] = valeurs[jours_affectation[concernes]]
+
+    # Présence, retard et heures des jours sur pointages, calculés en un seul lot.
+    groupes = index_pointages.grille(matricules, calendrier).ravel()[positions_pointage]
+    a_pointages = groupes >= 0
+    debuts_groupes = np.zeros(len(groupes), dtype=np.int64)
+    fins_groupes = np.zeros(len(groupes), dtype=np.int64)
+    debuts_groupes[a_pointages] = index_pointages.bornes[groupes[a_pointages]]
+    fins_groupes[a_pointages] = index_pointages.bornes[groupes[a_pointages] + 1]
+    jours_semaine = calendrier.jours_semaine[jours_pointage]
+    scores, types_absence = calculer_presence_lot(
+        index_pointages.horodatages, debuts_groupes, fins_groupes, calendrier.jours[jours_pointage], jours_semaine, calendrier
+    )
+    presents = scores > 0
+    presence[positions_pointage] = scores
+    en_retard[positions_pointage[presents]] = index_pointages.horodatages[debuts_groupes[presents]] > calendrier.limite_retard[jours_pointage[presents]]
+    heures_calculees = calculer_indicateurs_jours_travailles(
+        index_pointages.horodatages, debuts_groupes[presents], fins_groupes[presents],
+        calendrier.jours[jours_pointage[presents]], jours_semaine[presents],
+        calendrier.est_jour_ferie[jours_pointage[presents]], calendrier
+    )
+    heures_pause = heures_calculees.pop('Heures_Pause_Dej')
+    for nom, valeurs in heures_calculees.items():
+        heures[nom][positions_pointage[presents]] = valeurs
+
+    statut_pointage = np.where(presents, 'Bureau', 'Absence Injustifiée').astype(object)
+    codes_jours_semaine, noms_jours_semaine = pd.factorize(calendrier.jours_semaine)
+    categories_matricules = np.unique(matricules)  # triées, comme l'ordre du résumé
+    codes_matricules = np.searchsorted(categories_matricules, matricules)
+    colonnes = {
+        'Matricule': pd.Categorical.from_codes(np.repeat(codes_matricules, nb_jours), categories=categories_matricules),
+        'Date': np.tile(calendrier.jours, nb_matricules),
+        'Jour_Semaine': pd.Categorical.from_codes(np.tile(codes_jours_semaine, nb_matricules), categories=noms_jours_semaine),
+        'Est_JourFerie': np.tile(calendrier.est_jour_ferie, nb_matricules),
+        'Est_Jour_Ouvrable': np.tile(calendrier.est_jour_ouvrable, nb_matricules),
+        'Type_Congé': _colonne_categorielle(taille, positions_conge, types_conges.ravel()[positions_conge]),
+        'Affectation': _colonne_categorielle(taille, positions_affectation, [a.affectation for a in affectations_du_jour]),
+        'Lieu_Chantier': _colonne_categorielle(taille, positions_affectation, [a.lieu_chantier for a in affectations_du_jour]),
+        'Projet_Domicile': _colonne_categorielle(taille, positions_affectation, [a.projet_domicile for a in affectations_du_jour]),
+        'Jours_Presence_Travail': presence,
+        'Type_Absence_Jour': _colonne_categorielle(taille, positions_pointage, types_absence),
+        'Statut_Jour': _colonne_categorielle(
+            taille, np.concatenate([positions_conge, positions_affectation, positions_pointage]),
+            ['En Congé'] * len(positions_conge) + [a.affectation for a in affectations_du_jour] + list(statut_pointage),
+            defaut='Non Travaillé'),
+        'Est_En_Retard': en_retard,
+        **heures,
     }
+    if presents.any():
+        # Comme les autres heures calculées, la pause déjeuner n'existe que pour les jours présents.
+        pause = np.full(taille, np.nan, dtype=np.float32)
+        pause[positions_pointage[presents]] = heures_pause
+        colonnes['Heures_Pause_Dej'] = pause
+    return pd.DataFrame(colonnes)
 
-def analyser_pointages(df_pointage_raw, df_conges_raw, df_affectations_file_raw, df_affectations_manuel, mois, annee, jours_feries):
-    pointage_cols_map = {'Matricule': ['matr', 'id'], 'Pointage': ['pointage', 'date']}
-    df_pointage = find_and_rename_header(df_pointage_raw.copy(), pointage_cols_map)
-    if not df_pointage.empty:
-        df_pointage['Pointage'] = pd.to_datetime(df_pointage['Pointage'], errors='coerce')
-        df_pointage.dropna(subset=['Pointage'], inplace=True)
-        df_pointage.sort_values(['Matricule', 'Pointage'], inplace=True)
-        
-        indices_a_garder = []
-        last_matricule = None
-        last_time_kept = pd.NaT
-        intervalle_securite = timedelta(minutes=10)
-
-        for index, row in df_pointage.iterrows():
-            if row['Matricule'] != last_matricule:
-                last_matricule = row['Matricule']
-                last_time_kept = pd.NaT
-            
-            if pd.isna(last_time_kept) or (row['Pointage'] - last_time_kept > intervalle_securite):
-                indices_a_garder.append(index)
-                last_time_kept = row['Pointage']
-        
-        df_pointage = df_pointage.loc[indices_a_garder].reset_index(drop=True)
-        df_pointage['Date'] = pd.to_datetime(df_pointage['Pointage'].dt.date)
-
-    df_conges = prepare_conges_df(df_conges_raw)
-    df_affectations_file = prepare_affectations_df(df_affectations_file_raw)
-    df_affectations = pd.concat([df_affectations_file, df_affectations_manuel], ignore_index=True)
-    if not df_affectations.empty:
-        if 'Date' in df_affectations.columns:
-            df_affectations['Date'] = pd.to_datetime(df_affectations['Date'], errors='coerce', dayfirst=True)
-            df_affectations.dropna(subset=['Matricule', 'Date', 'Affectation'], inplace=True)
-            df_affectations.drop_duplicates(subset=['Matricule', 'Date'], keep='last', inplace=True)
-            df_affectations['Date'] = df_affectations['Date'].dt.normalize()
+def _moteur_journalier_tranche(tranche):
+    return _moteur_journalier(*tranche)
+
+def _executer_moteur_journalier(all_matricules, types_conges, calendrier, index_affectations, index_pointages, nb_processus):
+    """Exécute le moteur journalier, en série ou réparti par matricule sur `nb_processus` processus.
+
+    Chaque tranche ne reçoit que ses lignes de congés, ses affectations et ses pointages (tableaux
+    numpy), et les résultats sont concaténés dans l'ordre des matricules : le résultat est
+    identique à l'exécution en série.
+    """
+    if nb_processus <= 1 or len(all_matricules) < 2:
+        return _moteur_journalier(all_matricules, types_conges, calendrier, index_affectations, index_pointages)
+    # Quelques tranches par processus pour équilibrer la charge.
+    decoupage = np.array_split(np.arange(len(all_matricules)), min(len(all_matricules), nb_processus * 4))
+    tranches = []
+    for positions in decoupage:
+        matricules = all_matricules[positions[0]:positions[-1] + 1]
+        tranches.append((
+            matricules, types_conges[positions[0]:positions[-1] + 1], calendrier,
+            index_affectations.sous_index(matricules), index_pointages.sous_index(matricules),
+        ))
+    with ProcessPoolExecutor(max_workers=nb_processus) as executor:
+        resultats = list(executor.map(_moteur_journalier_tranche, tranches))
+    return pd.concat(resultats, ignore_index=True)
+
+def _pic_memoire_mo():
+    """Pic de mémoire résidente du processus (Mo), ou None si la plateforme ne le fournit pas."""
+    if resource is None:
+        return None
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pic / 2**20 if sys.platform == 'darwin' else pic / 2**10  # octets sous macOS, Ko ailleurs
+
+class RapportPerformance:
+    """Temps, nombre de lignes, hausse du pic mémoire et dates illisibles (`dates_invalides`,
+    valeurs non vides devenues NaT) de chaque étape de l'analyse.
+
+    Passé en paramètre `rapport` aux fonctions d'analyse et à `exporter_excel` ; une étape
+    exécutée plusieurs fois (un passage par mois) est cumulée. Avec `profiler=True`, les étapes
+    sont aussi exécutées sous cProfile (voir `profil_texte`).
+    """
+    def __init__(self, profiler=False):
+        self.etapes = OrderedDict()
+        self.profil = cProfile.Profile() if profiler else None
+
+    @contextmanager
+    def etape(self, nom):
+        mesure = {'nb_lignes': None}
+        memoire_avant = _pic_memoire_mo()
+        if self.profil is not None: self.profil.enable()
+        depart = chrono.perf_counter()
+        try:
+            yield mesure
+        finally:
+            duree = chrono.perf_counter() - depart
+            if self.profil is not None: self.profil.disable()
+            memoire_apres = _pic_memoire_mo()
+            cumul = self.etapes.setdefault(nom, {'secondes': 0.0, 'nb_lignes': None, 'delta_memoire_mo': None, 'appels': 0})
+            cumul['secondes'] += duree
+            cumul['appels'] += 1
+            if mesure['nb_lignes'] is not None:
+                cumul['nb_lignes'] = (cumul['nb_lignes'] or 0) + int(mesure['nb_lignes'])
+            if mesure.get('dates_invalides') is not None:
+                cumul['dates_invalides'] = cumul.get('dates_invalides', 0) + int(mesure['dates_invalides'])
+            if mesure.get('memoire_df_mo') is not None:
+                cumul['memoire_df_mo'] = round(cumul.get('memoire_df_mo', 0.0) + mesure['memoire_df_mo'], 2)
+            if memoire_avant is not None:
+                cumul['delta_memoire_mo'] = round((cumul['delta_memoire_mo'] or 0.0) + memoire_apres - memoire_avant, 1)
+
+    @property
+    def total_secondes(self):
+        return sum(e['secondes'] for e in self.etapes.values())
+
+    def en_dataframe(self):
+        df = pd.DataFrame.from_dict(self.etapes, orient='index').rename_axis('Étape').reset_index()
+        return df.round({'secondes': 3, 'delta_memoire_mo': 1}) if not df.empty else df
+
+    def en_json(self):
+        """Une ligne JSON (journal) : étapes et durée totale."""
+        etapes = {nom: {**e, 'secondes': round(e['secondes'], 4)} for nom, e in self.etapes.items()}
+        return json.dumps({'evenement': 'analyse_performance', 'total_secondes': round(self.total_secondes, 4), 'etapes': etapes}, ensure_ascii=False)
+
+    def profil_texte(self, nb_lignes=30, tri='cumulative'):
+        if self.profil is None:
+            return ''
+        sortie = io.StringIO()
+        pstats.Stats(self.profil, stream=sortie).sort_stats(tri).print_stats(nb_lignes)
+        return sortie.getvalue()
+
+def _etape(rapport, nom):
+    return rapport.etape(nom) if rapport is not None else nullcontext({})
+
+DonneesPreparees = namedtuple('DonneesPreparees', ['df_pointage', 'df_conges', 'df_affectations', 'matricules'])
+
+def preparer_donnees(df_pointage_raw, df_conges_raw, df_affectations_file_raw, df_affectations_manuel, intervalle_securite_min=None, rapport=None):
+    """Normalise les trois fichiers (et les affectations manuelles) une seule fois, quel que soit le mois analysé."""
+    with _etape(rapport, 'detection_entete') as mesure:
+        if {'Matricule', 'Pointage'}.issubset(df_pointage_raw.columns):
+            # Pointages déjà normalisés (lecture en flux, voir import_logic.lire_pointages_flux).
+            df_pointage = df_pointage_raw[['Matricule', 'Pointage']]
         else:
-            df_affectations = pd.DataFrame()
+            df_pointage = find_and_rename_header(df_pointage_raw, POINTAGE_COLS_MAP)
+        mesure['nb_lignes'] = len(df_pointage)
+    if not df_pointage.empty:
+        with _etape(rapport, 'conversion_dates') as mesure:
+            df_pointage['Pointage'] = convertir_dates(df_pointage['Pointage'], mesure=mesure)
+            mesure['dates_invalides'] = mesure.get('dates_invalides', 0) + df_pointage_raw.attrs.get('dates_invalides', 0)
+            df_pointage.dropna(subset=['Pointage'], inplace=True)
+            df_pointage.sort_values(['Matricule', 'Pointage'], inplace=True)
+            mesure['nb_lignes'] = len(df_pointage)
+
+        with _etape(rapport, 'dedoublonnage') as mesure:
+            if intervalle_securite_min is None:
+                intervalle_securite_min = CONFIG['INTERVALLE_SECURITE_MIN']
+            df_pointage = dedoublonner_pointages(df_pointage, timedelta(minutes=intervalle_securite_min))
+            df_pointage['Date'] = df_pointage['Pointage'].dt.normalize()
+            mesure['nb_lignes'] = len(df_pointage)
+
+    with _etape(rapport, 'conges_affectations') as mesure:
+        df_conges = prepare_conges_df(df_conges_raw, mesure=mesure)
+        mesure['dates_invalides'] = mesure.get('dates_invalides', 0) + df_conges_raw.attrs.get('dates_invalides', 0) \
+            + df_affectations_file_raw.attrs.get('dates_invalides', 0)
+        df_affectations_file = prepare_affectations_df(df_affectations_file_raw)
+        df_affectations = pd.concat([df_affectations_file, df_affectations_manuel], ignore_index=True)
+        if not df_affectations.empty:
+            if 'Date' in df_affectations.columns:
+                df_affectations['Date'] = convertir_dates(df_affectations['Date'], dayfirst=True, memoriser=True, mesure=mesure)
+                df_affectations.dropna(subset=['Matricule', 'Date', 'Affectation'], inplace=True)
+                # Clé normalisée avant dédoublonnage : l'entrée manuelle (ajoutée en dernier) l'emporte
+                # même si le fichier stocke le matricule en nombre et la saisie manuelle en texte.
+                df_affectations['Matricule'] = df_affectations['Matricule'].astype(str)
+                df_affectations['Date'] = df_affectations['Date'].dt.normalize()
+                df_affectations.drop_duplicates(subset=['Matricule', 'Date'], keep='last', inplace=True)
+            else:
+                df_affectations = pd.DataFrame()
+        mesure['nb_lignes'] = len(df_conges) + len(df_affectations)
 
     matricules_pointage = pd.Series(df_pointage['Matricule'].astype(str).unique()) if not df_pointage.empty else pd.Series([], dtype=str)
     matricules_conges = pd.Series(df_conges['Matricule'].astype(str).unique()) if not df_conges.empty else pd.Series([], dtype=str)
     matricules_affectations = pd.Series(df_affectations['Matricule'].astype(str).unique()) if not df_affectations.empty else pd.Series([], dtype=str)
     all_matricules = pd.concat([matricules_pointage, matricules_conges, matricules_affectations]).unique()
+    return DonneesPreparees(df_pointage, df_conges, df_affectations, all_matricules)
 
-    if len(all_matricules) == 0: return pd.DataFrame()
-    
-    jours_feries_dates = {d.date() for d in pd.to_datetime(jours_feries)}
-    full_date_range = get_full_date_range(mois, annee)
-    
-    resultats_journaliers = []
-    for matricule in all_matricules:
-        for jour in full_date_range:
-            jour_dt = pd.to_datetime(jour)
-            jour_semaine = jour_dt.day_name()
-            est_jour_ferie = jour_dt.date() in jours_feries_dates
-            est_jour_ouvrable = (jour_semaine != CONFIG['JOUR_DIMANCHE']) and not est_jour_ferie
-
-            jour_actuel = {
-                'Matricule': matricule, 'Date': jour_dt.date(), 'Jour_Semaine': jour_semaine, 
-                'Est_JourFerie': est_jour_ferie, 'Est_Jour_Ouvrable': est_jour_ouvrable,
-                'Type_Congé': '', 'Affectation': '', 'Lieu_Chantier': '', 'Projet_Domicile': '',
-                'Jours_Presence_Travail': 0.0, 'Type_Absence_Jour': '', 'Statut_Jour': 'Non Travaillé',
-                'Est_En_Retard': False, 'Heures_Bureau': 0, 'HS_Bureau_25': 0, 'HS_Bureau_50': 0,
-                'HS_Bureau_100': 0, 'Heures_Chantier': 0, 'HS_Chantier_25': 0, 'HS_Chantier_50': 0,
-                'HS_Chantier_100': 0, 'Heures_Domicile': 0, 'HS_Domicile_25': 0, 'HS_Domicile_50': 0,
-                'HS_Domicile_100': 0,
-            }
-
-            conge_du_jour = df_conges[(df_conges['Matricule'].astype(str) == str(matricule)) & (df_conges['Date_Debut'] <= jour_dt) & (df_conges['Date_Fin'] >= jour_dt)]
-            if not conge_du_jour.empty:
-                type_conge = conge_du_jour.iloc[0]['Type_Congé_Standard']
-                jour_est_decompte = (jour_dt.weekday() < 6 and not est_jour_ferie) or type_conge == "CONGE_MATERNITE"
-                if jour_est_decompte:
-                    jour_actuel['Type_Congé'] = type_conge
-                    jour_actuel['Statut_Jour'] = 'En Congé'
-                    resultats_journaliers.append(jour_actuel)
-                    continue
-            
-            if not est_jour_ouvrable:
-                resultats_journaliers.append(jour_actuel)
-                continue
-
-            affectation_du_jour = df_affectations[(df_affectations['Matricule'].astype(str) == str(matricule)) & (df_affectations['Date'].dt.date == jour_dt.date())] if not df_affectations.empty else pd.DataFrame()
-            if not affectation_du_jour.empty:
-                affectation_info = affectation_du_jour.iloc[0]
-                jour_actuel.update({'Affectation': affectation_info.get('Affectation', ''), 'Lieu_Chantier': affectation_info.get('Lieu_Chantier', ''), 'Projet_Domicile': affectation_info.get('Projet_Domicile', '')})
-                jour_actuel['Jours_Presence_Travail'] = 1.0
-                jour_actuel['Statut_Jour'] = affectation_info.get('Affectation', 'Affectation')
-                
-                affectation_type = str(affectation_info.get('Affectation', '')).lower()
-                if 'chantier' in affectation_type or 'domicile' in affectation_type:
-                    debut_virtuel = pd.to_datetime(f"{jour.isoformat()} {CONFIG['HEURE_DEBUT_JOURNEE_NORMALE']}")
-                    heure_fin_theorique = CONFIG['HEURE_FIN_TRAVAIL_SAMEDI_MATIN'] if jour_semaine == CONFIG['JOUR_SAMEDI'] else CONFIG['HEURE_FIN_JOURNEE_NORMALE_STANDARD_THEORIQUE']
-                    fin_virtuel = pd.to_datetime(f"{jour.isoformat()} {heure_fin_theorique}")
-                    hn, h25, h50, h100 = calculer_heures_supplementaires(debut_virtuel, fin_virtuel, jour_semaine, est_jour_ferie, 0)
-                    
-                    if 'chantier' in affectation_type: jour_actuel.update({'Heures_Chantier': hn, 'HS_Chantier_25': h25, 'HS_Chantier_50': h50, 'HS_Chantier_100': h100})
-                    if 'domicile' in affectation_type: jour_actuel.update({'Heures_Domicile': hn, 'HS_Domicile_25': h25, 'HS_Domicile_50': h50, 'HS_Domicile_100': h100})
-                resultats_journaliers.append(jour_actuel)
-                continue
-
-            pointages_du_jour = df_pointage[(df_pointage['Matricule'].astype(str) == str(matricule)) & (df_pointage['Date'] == jour_dt)] if not df_pointage.empty else pd.DataFrame()
-            
-            score_presence, type_absence = calculer_presence_par_blocs(pointages_du_jour, jour_dt, jour_semaine)
-            
-            jour_actuel['Jours_Presence_Travail'] = score_presence
-            jour_actuel['Type_Absence_Jour'] = type_absence
-
-            if score_presence > 0:
-                jour_actuel['Statut_Jour'] = 'Bureau'
-                pointages_du_jour_copy = pointages_du_jour.copy()
-                pointages_du_jour_copy['Est_JourFerie'] = est_jour_ferie
-                heures_calculees = calculer_indicateurs_jour_travaille(pointages_du_jour_copy)
-                jour_actuel.update(heures_calculees)
-                
-                premier_pointage = pointages_du_jour.iloc[0]['Pointage']
-                heure_debut_theorique = CONFIG['HEURE_DEBUT_JOURNEE_NORMALE']
-                heure_debut_dt = pd.to_datetime(f"{jour_dt.date()} {heure_debut_theorique}")
-                limite_retard = heure_debut_dt + timedelta(minutes=CONFIG['TOLERANCE_RETARD_MIN'])
-                if premier_pointage > limite_retard: jour_actuel['Est_En_Retard'] = True
-            
-            elif est_jour_ouvrable:
-                jour_actuel['Statut_Jour'] = 'Absence Injustifiée'
-                
-            resultats_journaliers.append(jour_actuel)
-
-    if not resultats_journaliers: return pd.DataFrame()
-    df_analyse = pd.DataFrame(resultats_journaliers)
-
-    agg_dict = {
-        'Heures_Bureau': ('Heures_Bureau', 'sum'), 'HS_Bureau_25': ('HS_Bureau_25', 'sum'),
-        'HS_Bureau_50': ('HS_Bureau_50', 'sum'), 'HS_Bureau_100': ('HS_Bureau_100', 'sum'),
-        'Heures_Chantier': ('Heures_Chantier', 'sum'), 'HS_Chantier_25': ('HS_Chantier_25', 'sum'),
-        'HS_Chantier_50': ('HS_Chantier_50', 'sum'), 'HS_Chantier_100': ('HS_Chantier_100', 'sum'),
-        'Heures_Domicile': ('Heures_Domicile', 'sum'), 'HS_Domicile_25': ('HS_Domicile_25', 'sum'),
-        'HS_Domicile_50': ('HS_Domicile_50', 'sum'), 'HS_Domicile_100': ('HS_Domicile_100', 'sum'),
-        'Lieu_Chantier': ('Lieu_Chantier', lambda x: ', '.join(x.dropna().astype(str).unique())),
-        'Projet_Domicile': ('Projet_Domicile', lambda x: ', '.join(x.dropna().astype(str).unique())),
-        'Nb Jours Chantier': ('Statut_Jour', lambda x: x.str.contains('Chantier').sum()),
-        'Nb Jours Domicile': ('Statut_Jour', lambda x: x.str.contains('Domicile').sum()),
-        'Nb_Retards': ('Est_En_Retard', 'sum')
+COLONNES_HEURES = [nom for lieu in ('Bureau', 'Chantier', 'Domicile') for nom in (f'Heures_{lieu}', f'HS_{lieu}_25', f'HS_{lieu}_50', f'HS_{lieu}_100')]
+COLONNES_CATEGORIELLES = ['Jour_Semaine', 'Type_Congé', 'Affectation', 'Lieu_Chantier', 'Projet_Domicile', 'Type_Absence_Jour', 'Statut_Jour']
+COLONNES_BOOLEENNES = ['Est_JourFerie', 'Est_Jour_Ouvrable', 'Est_En_Retard']
+
+def compacter_analyse(df_analyse):
+    """Types compacts pour le détail journalier : catégories pour les textes répétés (et le
+    Matricule, catégories triées), float32 pour les heures et la présence, booléens pour les
+    indicateurs, datetime64 pour la date. Les heures sont arrondies au centième : le float32 les
+    conserve sans perte une fois ré-arrondi (voir `_agreger_resume_mensuel`).
+    """
+    if df_analyse.empty:
+        return df_analyse
+    colonnes_float32 = [c for c in COLONNES_HEURES + ['Jours_Presence_Travail', 'Heures_Pause_Dej'] if c in df_analyse.columns]
+    types = {c: 'float32' for c in colonnes_float32}
+    types.update({c: 'category' for c in COLONNES_CATEGORIELLES if c in df_analyse.columns})
+    types.update({c: bool for c in COLONNES_BOOLEENNES if c in df_analyse.columns})
+    df_analyse = df_analyse.astype(types)
+    if not isinstance(df_analyse['Matricule'].dtype, pd.CategoricalDtype):
+        df_analyse['Matricule'] = pd.Categorical(df_analyse['Matricule'].astype(str))
+    df_analyse['Date'] = pd.to_datetime(df_analyse['Date'])
+    return df_analyse
+
+def memoire_mo(df):
+    """Empreinte mémoire d'un DataFrame (Mo, chaînes comprises)."""
+    return df.memory_usage(deep=True).sum() / 2**20
+
+def analyser_jours_du_mois(donnees, mois, annee, jours_feries, nb_processus=1, rapport=None):
+    """Détail journalier (df_analyse) d'un mois à partir des données préparées."""
+    if len(donnees.matricules) == 0: return pd.DataFrame()
+    with _etape(rapport, 'resolution_conges_affectations') as mesure:
+        calendrier = calendrier_du_mois(mois, annee, jours_feries)
+        full_date_range = pd.DatetimeIndex(calendrier.jours)
+        types_conges = resoudre_conges(donnees.df_conges, donnees.matricules, full_date_range)
+        index_affectations = IndexAffectations(donnees.df_affectations)
+        mesure['nb_lignes'] = types_conges.size
+    with _etape(rapport, 'boucle_journaliere') as mesure:
+        index_pointages = IndexPointages(donnees.df_pointage)
+        df_analyse = compacter_analyse(_executer_moteur_journalier(donnees.matricules, types_conges, calendrier, index_affectations, index_pointages, nb_processus))
+        mesure['nb_lignes'] = len(df_analyse)
+        mesure['memoire_df_mo'] = memoire_mo(df_analyse)
+    return df_analyse
+
+def analyser_pointages(df_pointage_raw, df_conges_raw, df_affectations_file_raw, df_affectations_manuel, mois, annee, jours_feries, intervalle_securite_min=None, nb_processus=1, retourner_details=False, rapport=None):
+    """Résumé mensuel par matricule ; avec `retourner_details`, renvoie (resume, df_analyse).
+
+    `rapport` (RapportPerformance, optionnel) reçoit les mesures de chaque étape.
+    """
+    donnees = preparer_donnees(df_pointage_raw, df_conges_raw, df_affectations_file_raw, df_affectations_manuel, intervalle_securite_min, rapport)
+    df_analyse = analyser_jours_du_mois(donnees, mois, annee, jours_feries, nb_processus, rapport)
+    resume = pd.DataFrame() if df_analyse.empty else agreger_resume_mensuel(df_analyse, rapport=rapport)
+    return (resume, df_analyse) if retourner_details else resume
+
+# Détails journaliers déjà calculés, par empreinte des données du mois (partagé entre les exécutions).
+TAILLE_CACHE_DETAILS_MENSUELS = 48
+DUREE_VIE_DETAILS_MENSUELS_S = 24 * 3600
+_CACHE_DETAILS_MENSUELS = CacheResultats(taille_max=TAILLE_CACHE_DETAILS_MENSUELS, duree_vie_s=DUREE_VIE_DETAILS_MENSUELS_S)
+
+def mois_de_la_periode(mois_debut, annee_debut, mois_fin, annee_fin):
+    """Liste des (mois, annee) de la période, bornes incluses."""
+    periodes = pd.period_range(pd.Period(year=annee_debut, month=mois_debut, freq='M'), pd.Period(year=annee_fin, month=mois_fin, freq='M'), freq='M')
+    return [(p.month, p.year) for p in periodes]
+
+def _restreindre_au_mois(donnees, mois, annee):
+    """Ne garde que les pointages, congés et affectations qui peuvent influencer le mois."""
+    debut = pd.Timestamp(annee, mois, 1)
+    fin = debut + pd.offsets.MonthEnd(1)
+    df_pointage, df_conges, df_affectations = donnees.df_pointage, donnees.df_conges, donnees.df_affectations
+    if not df_pointage.empty:
+        df_pointage = df_pointage[(df_pointage['Date'] >= debut) & (df_pointage['Date'] <= fin)]
+    if not df_conges.empty:
+        df_conges = df_conges[(df_conges['Date_Debut'] <= fin) & (df_conges['Date_Fin'] >= debut)]
+    if not df_affectations.empty:
+        df_affectations = df_affectations[(df_affectations['Date'] >= debut) & (df_affectations['Date'] <= fin)]
+    return DonneesPreparees(df_pointage, df_conges, df_affectations, donnees.matricules)
+
+def _empreinte(*elements):
+    """SHA-256 du contenu des DataFrames (valeurs et colonnes) et de la représentation des autres éléments."""
+    empreinte = hashlib.sha256()
+    for element in elements:
+        if isinstance(element, pd.DataFrame):
+            empreinte.update(repr(list(element.columns)).encode())
+            empreinte.update(pd.util.hash_pandas_object(element, index=False).to_numpy().tobytes())
+        else:
+            empreinte.update(repr(element).encode())
+    return empreinte.hexdigest()
+
+def analyser_periode(df_pointage_raw, df_conges_raw, df_affectations_file_raw, df_affectations_manuel, mois_debut, annee_debut, mois_fin, annee_fin, jours_feries, intervalle_securite_min=None, nb_processus=1, cache=None, retourner_details=False, rapport=None):
+    """Analyse plusieurs mois consécutifs en ne recalculant que les mois dont les données ont changé.
+
+    Le détail journalier de chaque mois est mis en cache sous l'empreinte des pointages, congés et
+    affectations de ce mois (plus matricules, jours fériés et CONFIG). Renvoie
+    (resume_global, resumes_par_mois, mois_recalcules) ; resumes_par_mois est indexé par (annee, mois).
+    Avec `retourner_details`, le détail journalier de toute la période est ajouté en quatrième élément.
+    `cache` est un `CacheResultats` (par défaut celui du processus, partagé entre les sessions).
+    """
+    if cache is None:
+        cache = _CACHE_DETAILS_MENSUELS
+    donnees = preparer_donnees(df_pointage_raw, df_conges_raw, df_affectations_file_raw, df_affectations_manuel, intervalle_securite_min, rapport)
+    feries = pd.to_datetime(list(jours_feries))
+    details, resumes_par_mois, mois_recalcules = [], {}, []
+    for mois, annee in mois_de_la_periode(mois_debut, annee_debut, mois_fin, annee_fin):
+        donnees_mois = _restreindre_au_mois(donnees, mois, annee)
+        feries_mois = sorted({d.date() for d in feries if d.month == mois and d.year == annee})
+        cle = _empreinte(mois, annee, feries_mois, list(donnees.matricules), CONFIG, *donnees_mois[:3])
+        df_analyse = cache.obtenir(cle)
+        if df_analyse is None:
+            df_analyse = analyser_jours_du_mois(donnees_mois, mois, annee, feries_mois, nb_processus, rapport)
+            cache.enregistrer(cle, df_analyse)
+            mois_recalcules.append((annee, mois))
+        if not df_analyse.empty:
+            details.append(df_analyse)
+            resumes_par_mois[(annee, mois)] = agreger_resume_mensuel(df_analyse, rapport=rapport)
+    # Les catégories diffèrent d'un mois à l'autre : le détail concaténé est recompacté.
+    df_details = compacter_analyse(pd.concat(details, ignore_index=True)) if details else pd.DataFrame()
+    resume_global = agreger_resume_mensuel(df_details, nb_mois=len(details), rapport=rapport) if details else pd.DataFrame()
+    if retourner_details:
+        return resume_global, resumes_par_mois, mois_recalcules, df_details
+    return resume_global, resumes_par_mois, mois_recalcules
+
+def agreger_resume_mensuel(df_analyse, nb_mois=1, rapport=None):
+    """Résumé par matricule du détail journalier (sans modifier `df_analyse`, qui peut être en cache).
+
+    `nb_mois` multiplie la base de jours payés lorsque le détail couvre plusieurs mois.
+    """
+    with _etape(rapport, 'agregation') as mesure:
+        resume_mensuel = _agreger_resume_mensuel(df_analyse, nb_mois)
+        mesure['nb_lignes'] = len(resume_mensuel)
+    return resume_mensuel
+
+def _par_valeur(serie, fonction, dtype):
+    """Applique `fonction` une seule fois par valeur distincte de `serie` (NaN compris) et renvoie le tableau aligné."""
+    codes, valeurs = pd.factorize(serie, use_na_sentinel=False)
+    return np.array([fonction(v) for v in valeurs], dtype=dtype)[codes]
+
+def _texte_dates(dates):
+    """Dates au format JJ/MM/AAAA, formatées une fois par date distincte."""
+    return _par_valeur(dates, lambda d: d.strftime('%d/%m/%Y'), object)
+
+def _joindre_par_matricule(matricules, textes, index):
+    """', '.join des textes de chaque matricule (dans l'ordre des lignes), réindexé sur `index`."""
+    jointures = pd.Series(textes, dtype=object).groupby(np.asarray(matricules), sort=True).agg(', '.join)
+    return jointures.reindex(index)
+
+def _drapeaux_conge(type_conge):
+    """(payé employeur, non payé, payé CNSS) d'un jour de congé selon REGLES_CONGES."""
+    if not type_conge:
+        return (0, 0, 0)
+    regle = REGLES_CONGES.get(type_conge, {})
+    return (int(regle.get('paye_par') == 'Employeur'), int(not regle.get('est_paye')), int(regle.get('paye_par') == 'CNSS'))
+
+def _agreger_resume_mensuel(df_analyse, nb_mois):
+    # Heures en float64 ré-arrondies au centième : valeurs identiques à celles du moteur avant
+    # leur stockage en float32. Les colonnes texte (catégorielles ou non) sont lues une fois par
+    # valeur distincte (`_par_valeur`) ; les seules boucles Python restantes sont une jointure de
+    # texte par matricule.
+    colonnes_float = [c for c in COLONNES_HEURES + ['Jours_Presence_Travail'] if c in df_analyse.columns]
+    heures = df_analyse[colonnes_float].astype('float64').round(2)
+    matricules = df_analyse['Matricule'].astype(str).to_numpy()
+
+    resume_mensuel = heures[COLONNES_HEURES].groupby(matricules, sort=True).sum().rename_axis('Matricule')
+    # Comme le moteur d'origine : les heures d'un lieu jamais renseigné (aucun jour de présence au
+    # bureau, aucune affectation chantier ou domicile) restent des entiers (0), pas des flottants (0.0).
+    affectations = _par_valeur(df_analyse['Affectation'], lambda v: str(v).lower(), object)
+    lieux_renseignes = {
+        'Bureau': (df_analyse['Statut_Jour'] == 'Bureau').to_numpy().any(),
+        'Chantier': any('chantier' in a for a in set(affectations)),
+        'Domicile': any('domicile' in a for a in set(affectations)),
     }
-    resume_mensuel = df_analyse.groupby('Matricule').agg(**agg_dict).reset_index()
-
-    def aggregate_conges(series):
-        types = [REGLES_CONGES.get(t, {}) for t in series if t and t != ""]
-        paye_employeur = sum(1 for t in types if t.get('paye_par') == 'Employeur')
-        non_paye = sum(1 for t in types if not t.get('est_paye'))
-        paye_cnss = sum(1 for t in types if t.get('paye_par') == 'CNSS')
-        details_types = ", ".join(sorted(list(set(s for s in series if s and s != ""))))
-        return paye_employeur, non_paye, paye_cnss, details_types
-    agg_conges = df_analyse.groupby('Matricule')['Type_Congé'].apply(aggregate_conges).apply(pd.Series)
+    for lieu, renseigne in lieux_renseignes.items():
+        if not renseigne:
+            colonnes_lieu = [f'Heures_{lieu}', f'HS_{lieu}_25', f'HS_{lieu}_50', f'HS_{lieu}_100']
+            resume_mensuel[colonnes_lieu] = resume_mensuel[colonnes_lieu].astype(np.int64)
+    for colonne in ['Lieu_Chantier', 'Projet_Domicile']:
+        # Valeurs distinctes (en texte, ordre d'apparition), comme x.dropna().astype(str).unique().
+        valeurs = pd.DataFrame({'Matricule': matricules, 'valeur': df_analyse[colonne].to_numpy()}).dropna()
+        valeurs['valeur'] = valeurs['valeur'].astype(str)
+        valeurs = valeurs.drop_duplicates()
+        resume_mensuel[colonne] = _joindre_par_matricule(valeurs['Matricule'], valeurs['valeur'], resume_mensuel.index).fillna('')
+    for nom, motif in [('Nb Jours Chantier', 'Chantier'), ('Nb Jours Domicile', 'Domicile')]:
+        contient = _par_valeur(df_analyse['Statut_Jour'], lambda v: isinstance(v, str) and motif in v, bool)
+        resume_mensuel[nom] = pd.Series(contient).groupby(matricules, sort=True).sum()
+    resume_mensuel['Nb_Retards'] = pd.Series(df_analyse['Est_En_Retard'].to_numpy(dtype=bool)).groupby(matricules, sort=True).sum()
+    resume_mensuel = resume_mensuel.reset_index()
+
+    # Congés : table de drapeaux par type (REGLES_CONGES), sommée par matricule.
+    types_conges = df_analyse['Type_Congé']
+    codes_conges, valeurs_conges = pd.factorize(types_conges, use_na_sentinel=False)
+    table_drapeaux = np.array([_drapeaux_conge(v) for v in valeurs_conges], dtype=np.int64).reshape(-1, 3)
+    drapeaux = pd.DataFrame(table_drapeaux[codes_conges],
+                            columns=['Nb Jours Congé Payé par Employeur', 'Nb Jours Congé Non Payé', 'Nb Jours Payé par CNSS'])
+    agg_conges = drapeaux.groupby(matricules, sort=True).sum()
+    types_distincts = pd.DataFrame({'Matricule': matricules, 'type': types_conges.to_numpy()})
+    types_distincts = types_distincts[_par_valeur(types_conges, bool, bool)].drop_duplicates().sort_values(['Matricule', 'type'])
+    agg_conges['Détail des Types de Congé'] = _joindre_par_matricule(types_distincts['Matricule'], types_distincts['type'], agg_conges.index).fillna('')
     if not agg_conges.empty:
-        agg_conges.columns = ['Nb Jours Congé Payé par Employeur', 'Nb Jours Congé Non Payé', 'Nb Jours Payé par CNSS', 'Détail des Types de Congé']
-        resume_mensuel = pd.merge(resume_mensuel, agg_conges, on='Matricule', how='left')
+        resume_mensuel = pd.merge(resume_mensuel, agg_conges.rename_axis('Matricule'), on='Matricule', how='left')
     
     resume_mensuel.fillna(0, inplace=True)
 
-    df_analyse['Absence_Fraction'] = df_analyse.apply(
-        lambda row: 1.0 - row['Jours_Presence_Travail']
-        if row['Est_Jour_Ouvrable'] and not row['Type_Congé'] and not row['Affectation'] else 0.0,
-        axis=1
-    )
-    total_absences = df_analyse.groupby('Matricule')['Absence_Fraction'].sum().reset_index(name='Nb Jours Absence Injustifiée')
+    # Absence injustifiée : 1 - présence les jours ouvrables sans congé ni affectation.
+    sans_conge_ni_affectation = ~_par_valeur(types_conges, bool, bool) & ~_par_valeur(df_analyse['Affectation'], bool, bool)
+    absence_fraction = pd.Series(np.where(
+        df_analyse['Est_Jour_Ouvrable'].to_numpy(dtype=bool) & sans_conge_ni_affectation,
+        1.0 - heures['Jours_Presence_Travail'].to_numpy(), 0.0
+    ))
+    total_absences = absence_fraction.groupby(matricules, sort=True).sum().rename_axis('Matricule').reset_index(name='Nb Jours Absence Injustifiée')
     resume_mensuel = pd.merge(resume_mensuel, total_absences, on='Matricule', how='left')
     resume_mensuel['Nb Jours Absence Injustifiée'] = resume_mensuel['Nb Jours Absence Injustifiée'].fillna(0).round(2)
     
     # --- DÉBUT DE LA MODIFICATION ---
     # Retour à l'ancienne méthode de calcul des Jours Payés
     resume_mensuel['Jours Payés (par Employeur)'] = (
-        CONFIG['BASE_JOURS_PAYES'] -
+        CONFIG['BASE_JOURS_PAYES'] * nb_mois -
         resume_mensuel['Nb Jours Absence Injustifiée'] -
         resume_mensuel.get('Nb Jours Congé Non Payé', 0) -
         resume_mensuel.get('Nb Jours Payé par CNSS', 0)
@@ -415,16 +1229,19 @@ def analyser_pointages(df_pointage_raw, df_conges_raw, df_affectations_file_raw,
     resume_mensuel['Jours Payés (par Employeur)'] = resume_mensuel['Jours Payés (par Employeur)'].clip(lower=0).round(2)
     # --- FIN DE LA MODIFICATION ---
     
-    def format_absence_detail(df_group):
-        details = []
-        for _, row in df_group.iterrows():
-            if row['Type_Absence_Jour']:
-                details.append(f"{row['Date'].strftime('%d/%m/%Y')} ({row['Type_Absence_Jour']})")
-        return ', '.join(details)
-    absence_details = df_analyse.groupby('Matricule').apply(format_absence_detail).reset_index(name='Détail des Absences')
+    # Détails textuels : une jointure par matricule, sur les seules lignes concernées.
+    avec_absence = _par_valeur(df_analyse['Type_Absence_Jour'], bool, bool)
+    dates_absence = _texte_dates(df_analyse['Date'][avec_absence])
+    types_absence = df_analyse['Type_Absence_Jour'][avec_absence].astype(str).to_numpy(dtype=object)
+    absence_details = _joindre_par_matricule(
+        matricules[avec_absence], dates_absence + ' (' + types_absence + ')', pd.Index(np.unique(matricules), name='Matricule')
+    ).reset_index(name='Détail des Absences')
     resume_mensuel = pd.merge(resume_mensuel, absence_details, on='Matricule', how='left')
 
-    jours_conge_detail = df_analyse[df_analyse['Type_Congé'] != ""].groupby('Matricule')['Date'].apply(lambda x: ', '.join(sorted([d.strftime('%d/%m/%Y') for d in x]))).reset_index(name='Détail Jours de Congé')
+    en_conge = (df_analyse['Type_Congé'] != "").to_numpy()
+    dates_conge = pd.DataFrame({'Matricule': matricules[en_conge], 'date': _texte_dates(df_analyse['Date'][en_conge])})
+    dates_conge = dates_conge.sort_values(['Matricule', 'date'])  # tri du texte JJ/MM/AAAA, comme sorted()
+    jours_conge_detail = dates_conge.groupby('Matricule', sort=True)['date'].agg(', '.join).reset_index(name='Détail Jours de Congé')
     if not jours_conge_detail.empty:
         resume_mensuel = pd.merge(resume_mensuel, jours_conge_detail, on='Matricule', how='left')
 
@@ -437,7 +1254,8 @@ def analyser_pointages(df_pointage_raw, df_conges_raw, df_affectations_file_raw,
     resume_mensuel['Majoration 100% (Val)'] = (resume_mensuel['Total HS 100%'] * 1.00).round(2)
     resume_mensuel['Total Majorations'] = (resume_mensuel['Majoration 25% (Val)'] + resume_mensuel['Majoration 50% (Val)'] + resume_mensuel['Majoration 100% (Val)']).round(2)
 
-    jours_ouvrables = df_analyse[df_analyse['Est_Jour_Ouvrable']].groupby('Matricule').size().reset_index(name='Jours_Ouvrables')
+    ouvrables = df_analyse['Est_Jour_Ouvrable'].to_numpy(dtype=bool)
+    jours_ouvrables = pd.Series(matricules[ouvrables]).groupby(matricules[ouvrables], sort=True).size().rename_axis('Matricule').reset_index(name='Jours_Ouvrables')
     resume_mensuel = pd.merge(resume_mensuel, jours_ouvrables, on='Matricule', how='left')
     resume_mensuel['Jours_Ouvrables'] = resume_mensuel['Jours_Ouvrables'].fillna(0)
     resume_mensuel['Conges_Autorises'] = resume_mensuel.get('Nb Jours Congé Payé par Employeur', 0) + resume_mensuel.get('Nb Jours Congé Non Payé', 0) + resume_mensuel.get('Nb Jours Payé par CNSS', 0)
@@ -465,31 +1283,79 @@ def analyser_pointages(df_pointage_raw, df_conges_raw, df_affectations_file_raw,
     
     return resume_mensuel
 
-def exporter_excel(df_resultats, nom_fichier, colonnes_choisies, return_df=False):
-    output = BytesIO()
-    df_export = df_resultats.copy()
-    
+TAILLE_BLOC_EXPORT = 10_000
+LARGEUR_COLONNE_MAX = 255
+LARGEUR_DATE = len('dd/mm/yyyy')
+FEUILLE_DETAIL = 'Détail journalier'
+
+def colonnes_export(df_resultats, colonnes_choisies):
+    """Colonnes du rapport dans l'ordre choisi, Matricule en tête s'il est demandé."""
     if 'Matricule' in colonnes_choisies:
-        colonnes_a_exporter = ['Matricule'] + [col for col in colonnes_choisies if col in df_export.columns and col != 'Matricule']
-    else:
-        colonnes_a_exporter = [col for col in colonnes_choisies if col in df_export.columns]
-        
-    df_final_export = df_export.reindex(columns=colonnes_a_exporter)
-    
-    if return_df: 
+        return ['Matricule'] + [col for col in colonnes_choisies if col in df_resultats.columns and col != 'Matricule']
+    return [col for col in colonnes_choisies if col in df_resultats.columns]
+
+def preparer_export(df_resultats, colonnes_choisies):
+    """Tableau du rapport tel qu'exporté ; un tableau déjà préparé est repris sans copie."""
+    colonnes = colonnes_export(df_resultats, colonnes_choisies)
+    if list(df_resultats.columns) == colonnes:
+        return df_resultats
+    return df_resultats.reindex(columns=colonnes)
+
+_longueur_texte = np.frompyfunc(lambda valeur: len(str(valeur)), 1, 1)
+
+def _ecrire_feuille(classeur, nom_feuille, df, format_entete):
+    """Écrit `df` ligne à ligne (ordre imposé par le mode constant_memory), par blocs de
+    `TAILLE_BLOC_EXPORT` lignes convertis en objets Python ; les cellules vides restent vides.
+
+    La largeur de chaque colonne (plus long texte, en-tête compris) est mesurée sur ces mêmes
+    blocs, en un appel vectorisé par bloc, et fixée une fois toutes les lignes écrites.
+    """
+    feuille = classeur.add_worksheet(nom_feuille)
+    entetes = [str(colonne) for colonne in df.columns]
+    feuille.write_row(0, 0, entetes, format_entete)
+    longueurs = np.array([len(entete) for entete in entetes], dtype=np.int64)
+    # Heures du détail journalier en float32 : ré-arrondies au centième (voir compacter_analyse).
+    colonnes_float32 = {c: 'float64' for c in df.columns if df[c].dtype == np.float32}
+    colonnes_dates = [position for position, c in enumerate(df.columns) if pd.api.types.is_datetime64_any_dtype(df[c].dtype)]
+    ligne = 1
+    for debut in range(0, len(df), TAILLE_BLOC_EXPORT):
+        bloc = df.iloc[debut:debut + TAILLE_BLOC_EXPORT]
+        if colonnes_float32:
+            bloc = bloc.astype(colonnes_float32).round({c: 2 for c in colonnes_float32})
+        valeurs = bloc.astype(object).to_numpy()
+        longueurs = np.maximum(longueurs, _longueur_texte(valeurs).max(axis=0).astype(np.int64))
+        valeurs[pd.isna(valeurs)] = None
+        for valeurs_ligne in valeurs:
+            feuille.write_row(ligne, 0, valeurs_ligne)
+            ligne += 1
+    longueurs[colonnes_dates] = np.maximum(LARGEUR_DATE, [len(entetes[p]) for p in colonnes_dates])
+    for position, longueur in enumerate(longueurs):
+        feuille.set_column(position, position, min(int(longueur) + 2, LARGEUR_COLONNE_MAX))
+    return feuille
+
+def exporter_excel(df_resultats, nom_fichier, colonnes_choisies, return_df=False, rapport=None, df_details=None):
+    """Rapport Excel (feuille « Rapport ») en octets, ou le tableau exporté si `return_df`.
+
+    Le classeur est écrit par xlsxwriter en mode constant_memory : la mémoire reste bornée quelle
+    que soit la taille du rapport. Avec `df_details` (détail journalier de `analyser_pointages`
+    ou `analyser_periode`), une feuille « Détail journalier » triée par matricule puis date est
+    ajoutée. Le tableau renvoyé par `return_df=True` peut être repassé tel quel pour l'export.
+    """
+    with _etape(rapport, 'export_excel') as mesure:
+        resultat = _exporter_excel(df_resultats, nom_fichier, colonnes_choisies, return_df, df_details)
+        mesure['nb_lignes'] = len(df_resultats) + (len(df_details) if df_details is not None and not return_df else 0)
+    return resultat
+
+def _exporter_excel(df_resultats, nom_fichier, colonnes_choisies, return_df, df_details=None):
+    df_final_export = preparer_export(df_resultats, colonnes_choisies)
+    if return_df:
         return df_final_export
 
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df_final_export.to_excel(writer, index=False, sheet_name='Rapport')
-        worksheet = writer.sheets['Rapport']
-        
-        for idx, col in enumerate(df_final_export):
-            series = df_final_export[col]
-            try:
-                max_len = max((series.astype(str).map(len).max(), len(str(series.name)))) + 2
-            except (ValueError, TypeError):
-                max_len = len(str(col)) + 2
-            worksheet.set_column(idx, idx, max_len)
-            
-    processed_data = output.getvalue()
-    return processed_data
\ No newline at end of file
+    output = BytesIO()
+    classeur = xlsxwriter.Workbook(output, {'constant_memory': True, 'default_date_format': 'dd/mm/yyyy'})
+    format_entete = classeur.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    _ecrire_feuille(classeur, 'Rapport', df_final_export, format_entete)
+    if df_details is not None and not df_details.empty:
+        _ecrire_feuille(classeur, FEUILLE_DETAIL, df_details.sort_values(['Matricule', 'Date'], kind='stable'), format_entete)
+    classeur.close()
+    return output.getvalue()
\ No newline at end of file
@@ -1,7 +1,12 @@
+import os
 import streamlit as st
 import pandas as pd
 from datetime import date
-from analyse_logic import analyser_pointages, exporter_excel
+from contextlib import nullcontext
+from analyse_logic import analyser_pointages, analyser_periode, mois_de_la_periode, exporter_excel, RapportPerformance
+from import_logic import charger_fichier
+from export_logic import REGROUPEMENTS, exporter_csv, exporter_parquet, exporter_zip
+from cache_logic import CacheResultats, empreinte_octets
 import db_logic as db
 import email_logic as mail
 
@@ -14,6 +19,32 @@ st.set_page_config(
 
 # Initialise la base de données au démarrage
 db.init_db()
+# Envoi des e-mails en file d'attente (thread d'arrière-plan unique par processus).
+mail.demarrer_envoyeur()
+
+@st.cache_resource
+def get_cache_resultats():
+    # Une seule instance par processus serveur, partagée par toutes les sessions.
+    return CacheResultats(taille_max=8, duree_vie_s=3600)
+
+cache_resultats = get_cache_resultats()
+
+def cle_analyse(fichiers, multi_mois, mois, annee, mois_fin, annee_fin, jours_feries, affectations_manuelles):
+    """Clé de mémorisation d'une analyse : contenu des fichiers importés + tous les paramètres."""
+    empreintes = [empreinte_octets(f.getvalue()) if f is not None else None for f in fichiers]
+    periode = (mois, annee, mois_fin, annee_fin) if multi_mois else (mois, annee)
+    affectations = [sorted(a.items()) for a in affectations_manuelles]
+    return empreinte_octets(repr((empreintes, periode, sorted(jours_feries), affectations)).encode())
+
+def export_memorise(cle_exports, nom, fabriquer):
+    """Octets d'un export, construits une seule fois par (analyse, colonnes, détail) et gardés dans la session :
+    les relances du script (clic, onglet, téléchargement) ne régénèrent pas les classeurs."""
+    exports = st.session_state.get('exports')
+    if exports is None or exports['cle'] != cle_exports:
+        exports = st.session_state['exports'] = {'cle': cle_exports, 'fichiers': {}}
+    if nom not in exports['fichiers']:
+        exports['fichiers'][nom] = fabriquer()
+    return exports['fichiers'][nom]
 
 def set_professional_styles():
     st.markdown("""
@@ -123,13 +154,14 @@ def show_login_page():
                     if st.form_submit_button("Envoyer le lien de réinitialisation"):
                         token = db.set_reset_token(email_to_reset)
                         if token:
-                            # Votre logique pour construire l'URL et envoyer l'email
                             app_url = st.get_option("server.baseUrlPath")
                             if not app_url.startswith("http"):
                                app_url = "http://localhost:8501" 
-                            
-                            # NOTE : Assurez-vous que les fonctions db.set_reset_token et mail.send_reset_email fonctionnent
-                            st.success("Un e-mail de réinitialisation a été envoyé (si le service d'e-mail est configuré).")
+                            # Mise en file d'attente seulement : l'envoi SMTP se fait en arrière-plan.
+                            if mail.send_reset_email(email_to_reset, token, app_url):
+                                st.success("Un e-mail de réinitialisation va vous être envoyé dans quelques instants.")
+                            else:
+                                st.error("L'e-mail de réinitialisation n'a pas pu être préparé. Réessayez plus tard.")
                         else:
                             st.error("Aucun compte trouvé pour cet utilisateur.")
 
@@ -184,6 +216,12 @@ def show_main_app():
                 else:
                     st.sidebar.error("Les nouveaux mots de passe ne correspondent pas.")
 
+    # --- Panneau de Performances (rempli après l'analyse) ---
+    panneau_performances = st.sidebar.expander("⏱️ Performances de l'analyse")
+    with panneau_performances:
+        suivre_performances = st.checkbox("Mesurer chaque étape", key="suivre_performances")
+        profiler_analyse = st.checkbox("Profilage détaillé (cProfile)", key="profiler_analyse", disabled=not suivre_performances)
+
     # --- Application Principale (Corps) ---
     st.title("Système d'Analyse de Pointage et de Congés")
 
@@ -194,7 +232,7 @@ def show_main_app():
     st.subheader("Étape 1 : Charger les fichiers")
     col1, col2, col3 = st.columns(3)
     with col1:
-        pointage_file = st.file_uploader("Fichier de Pointage (Obligatoire)", type=["xlsx", "xls"])
+        pointage_file = st.file_uploader("Fichier de Pointage (Obligatoire)", type=["xlsx", "xls", "csv"])
     with col2:
         conges_file = st.file_uploader("Fichier des Congés (Optionnel)", type=["xlsx", "xls"])
     with col3:
@@ -250,19 +288,39 @@ def show_main_app():
         # --- ÉTAPE 2 : Définir les paramètres d'analyse ---
         st.subheader("Étape 2 : Définir les paramètres d'analyse")
         
+        type_analyse = st.radio("Période d'analyse", ["Un mois", "Plusieurs mois"], horizontal=True)
+        analyse_multi_mois = type_analyse == "Plusieurs mois"
         param_col1, param_col2 = st.columns(2)
         with param_col1:
             current_year = date.today().year
-            annee = st.selectbox("Année", range(2023, current_year + 15), index=0)
+            annee = st.selectbox("Année de début" if analyse_multi_mois else "Année", range(2023, current_year + 15), index=0)
         with param_col2:
             current_month = date.today().month
-            mois = st.selectbox("Mois", range(1, 13), index=current_month - 1)
-        dates_du_mois = [date(annee, mois, jour) for jour in range(1, pd.Timestamp(annee, mois, 1).days_in_month + 1)]
+            mois = st.selectbox("Mois de début" if analyse_multi_mois else "Mois", range(1, 13), index=current_month - 1)
+        annee_fin, mois_fin = annee, mois
+        if analyse_multi_mois:
+            param_col3, param_col4 = st.columns(2)
+            with param_col3:
+                annee_fin = st.selectbox("Année de fin", range(annee, current_year + 15), index=0)
+            with param_col4:
+                mois_fin = st.selectbox("Mois de fin", range(1, 13), index=mois - 1)
+        periode = mois_de_la_periode(mois, annee, mois_fin, annee_fin)
+        if not periode:
+            st.error("Le mois de fin doit être postérieur ou égal au mois de début.")
+        dates_de_la_periode = [
+            date(a, m, jour) for m, a in periode
+            for jour in range(1, pd.Timestamp(a, m, 1).days_in_month + 1)
+        ]
         jours_feries_selectionnes = st.multiselect(
-            "Confirmez les jours fériés pour ce mois :",
-            options=dates_du_mois,
+            "Confirmez les jours fériés pour cette période :" if analyse_multi_mois else "Confirmez les jours fériés pour ce mois :",
+            options=dates_de_la_periode,
             format_func=lambda d: d.strftime('%A %d %B %Y')
         )
+        with st.expander("Options avancées"):
+            nb_processus = st.number_input(
+                "Nombre de processus de calcul (1 = exécution en série)",
+                min_value=1, max_value=os.cpu_count() or 1, value=1
+            )
 
         # --- ÉTAPE 3 : Choisir les colonnes pour le rapport final ---
         st.subheader("Étape 3 : Choisir les colonnes pour le rapport final")
@@ -290,50 +348,175 @@ def show_main_app():
             options=toutes_les_colonnes_possibles,
             default=selection_par_defaut
         )
+        inclure_detail = st.checkbox("Ajouter au fichier Excel une feuille « Détail journalier » (un jour par ligne et par employé)")
 
         st.divider()
-        if st.button("Lancer l'analyse et préparer le rapport", type="primary"):
+        cle = cle_analyse(
+            [pointage_file, conges_file, affectations_file],
+            analyse_multi_mois, mois, annee, mois_fin, annee_fin,
+            jours_feries_selectionnes, st.session_state.affectations_manuelles
+        )
+        rapport = None
+        if st.button("Lancer l'analyse et préparer le rapport", type="primary", disabled=not periode):
             try:
-                df_pointage = pd.read_excel(pointage_file, header=None)
-                df_conges = pd.read_excel(conges_file, header=None) if conges_file else pd.DataFrame()
-                
-                df_affectations_fichier = pd.read_excel(affectations_file, header=None) if affectations_file else pd.DataFrame()
-                df_affectations_manuel = pd.DataFrame(st.session_state.affectations_manuelles)
-                if not df_affectations_manuel.empty:
-                    df_affectations_manuel['Date'] = pd.to_datetime(df_affectations_manuel['Date'])
-
-                with st.spinner("Analyse en cours... Cette opération peut prendre un moment."):
-                    result_df = analyser_pointages(
-                        df_pointage, df_conges,
-                        df_affectations_fichier,
-                        df_affectations_manuel,
-                        mois, annee, jours_feries_selectionnes
-                    )
-
-                if result_df.empty:
-                    st.warning("Aucun résultat généré. Vérifiez les fichiers d'entrée.")
-                else:
-                    st.success("Analyse terminée !")
-                    st.subheader("Aperçu du rapport final")
-                    
-                    df_pour_apercu = exporter_excel(result_df.copy(), "apercu", toutes_les_colonnes_possibles, return_df=True)
-                    
-                    colonnes_a_afficher = [col for col in colonnes_choisies if col in df_pour_apercu.columns]
-                    st.dataframe(df_pour_apercu[colonnes_a_afficher])
-                    
-                    output_file_name = f"rapport_final_{mois}_{annee}.xlsx"
-                    output_data = exporter_excel(result_df, output_file_name, colonnes_choisies)
-                    
-                    st.download_button(
-                        label="⬇️ Télécharger le rapport complet",
-                        data=output_data,
-                        file_name=output_file_name,
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+                resultat = cache_resultats.obtenir(cle)
+                st.session_state.analyse_depuis_cache = resultat is not None
+                if resultat is None:
+                    rapport = RapportPerformance(profiler=profiler_analyse) if suivre_performances else None
+                    # Lecture via le cache partagé : un fichier déjà importé (même contenu) n'est pas relu.
+                    # Détection d'en-tête et conversion des dates se font ici : l'étape 'lecture' en porte le coût.
+                    with (rapport.etape('lecture') if rapport is not None else nullcontext({})) as mesure:
+                        df_pointage = charger_fichier(pointage_file, 'pointages')
+                        df_conges = charger_fichier(conges_file, 'conges') if conges_file else pd.DataFrame()
+                        df_affectations_fichier = charger_fichier(affectations_file, 'affectations') if affectations_file else pd.DataFrame()
+                        mesure['nb_lignes'] = len(df_pointage) + len(df_conges) + len(df_affectations_fichier)
+                        dates_invalides = sum(df.attrs.get('dates_invalides', 0) for df in (df_pointage, df_conges, df_affectations_fichier))
+                        mesure['dates_invalides'] = dates_invalides
+                    if dates_invalides:
+                        st.warning(f"{dates_invalides} date(s) illisible(s) ignorée(s) dans les fichiers importés.")
+                    df_affectations_manuel = pd.DataFrame(st.session_state.affectations_manuelles)
+                    if not df_affectations_manuel.empty:
+                        df_affectations_manuel['Date'] = pd.to_datetime(df_affectations_manuel['Date'])
+
+                    with st.spinner("Analyse en cours... Cette opération peut prendre un moment."):
+                        resumes_par_mois, mois_recalcules = {}, []
+                        if analyse_multi_mois:
+                            result_df, resumes_par_mois, mois_recalcules, df_details = analyser_periode(
+                                df_pointage, df_conges,
+                                df_affectations_fichier,
+                                df_affectations_manuel,
+                                mois, annee, mois_fin, annee_fin, jours_feries_selectionnes,
+                                nb_processus=nb_processus, retourner_details=True, rapport=rapport
+                            )
+                        else:
+                            result_df, df_details = analyser_pointages(
+                                df_pointage, df_conges,
+                                df_affectations_fichier,
+                                df_affectations_manuel,
+                                mois, annee, jours_feries_selectionnes,
+                                nb_processus=nb_processus, retourner_details=True, rapport=rapport
+                            )
+                    # Le détail journalier est conservé dans data.db pour les consultations ultérieures.
+                    try:
+                        db.enregistrer_faits_journaliers(df_details)
+                    except Exception as e:
+                        st.warning(f"Le détail journalier n'a pas pu être enregistré : {e}")
+                    resultat = (result_df, resumes_par_mois, mois_recalcules, df_details)
+                    cache_resultats.enregistrer(cle, resultat)
+                st.session_state.cle_analyse_affichee = cle
             except Exception as e:
                 st.error(f"Une erreur est survenue lors de l'analyse : {e}")
                 st.error("Veuillez vérifier le format de vos fichiers et les données saisies.")
 
+        # Les résultats restent affichés tant que les entrées ne changent pas : cocher d'autres
+        # colonnes relance le script Streamlit mais réutilise le résumé mémorisé.
+        resultat = cache_resultats.obtenir(cle, compter=False) if st.session_state.get('cle_analyse_affichee') == cle else None
+        if resultat is not None:
+            result_df, resumes_par_mois, mois_recalcules, df_details = resultat
+            if result_df.empty:
+                st.warning("Aucun résultat généré. Vérifiez les fichiers d'entrée.")
+            else:
+                st.success("Analyse terminée !")
+                if st.session_state.get('analyse_depuis_cache'):
+                    st.caption(f"⚡ Résultat repris du cache (entrées identiques à une analyse précédente) — "
+                               f"{cache_resultats.succes} succès / {cache_resultats.echecs} échec(s) depuis le démarrage.")
+                else:
+                    st.caption(f"Résultat calculé pour ces entrées — cache : {cache_resultats.succes} succès / "
+                               f"{cache_resultats.echecs} échec(s) depuis le démarrage.")
+                if analyse_multi_mois:
+                    st.caption(f"{len(mois_recalcules)} mois recalculé(s), {len(periode) - len(mois_recalcules)} repris du cache.")
+                st.subheader("Aperçu du rapport final" + (" (période complète)" if analyse_multi_mois else ""))
+
+                if analyse_multi_mois:
+                    output_file_name = f"rapport_final_{mois}_{annee}_au_{mois_fin}_{annee_fin}.xlsx"
+                else:
+                    output_file_name = f"rapport_final_{mois}_{annee}.xlsx"
+                # Un seul tableau réindexé sert à l'aperçu et au fichier.
+                df_export = exporter_excel(result_df, output_file_name, colonnes_choisies, return_df=True)
+                st.dataframe(df_export)
+                # Un seul jeu d'exports par session : changer d'analyse, de colonnes ou de détail le remplace.
+                cle_exports = (cle, tuple(colonnes_choisies), inclure_detail)
+                output_data = export_memorise(cle_exports, 'excel', lambda: exporter_excel(
+                    df_export, output_file_name, colonnes_choisies, rapport=rapport, df_details=df_details if inclure_detail else None))
+                
+                st.download_button(
+                    label="⬇️ Télécharger le rapport complet",
+                    data=output_data,
+                    file_name=output_file_name,
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+                with st.expander("Autres formats d'export"):
+                    nom_base = output_file_name[:-len('.xlsx')]
+                    col_csv, col_parquet = st.columns(2)
+                    col_csv.download_button("⬇️ Résumé en CSV", data=export_memorise(cle_exports, 'csv', lambda: exporter_csv(df_export, colonnes_choisies)),
+                                            file_name=f"{nom_base}.csv", mime="text/csv")
+                    col_parquet.download_button("⬇️ Résumé en Parquet", data=export_memorise(cle_exports, 'parquet', lambda: exporter_parquet(df_export, colonnes_choisies)),
+                                                file_name=f"{nom_base}.parquet", mime="application/octet-stream")
+                    regroupement = st.radio("Classeurs individuels (rapport + détail journalier)", list(REGROUPEMENTS),
+                                            format_func=REGROUPEMENTS.get, horizontal=True)
+                    if st.button("Préparer l'archive ZIP"):
+                        with st.spinner("Génération des classeurs..."):
+                            archive = exporter_zip(df_export, df_details, colonnes_choisies, regroupement, nb_processus=nb_processus, rapport=rapport)
+                        st.download_button("⬇️ Télécharger l'archive ZIP", data=archive,
+                                           file_name=f"{nom_base}_{regroupement.lower()}.zip", mime="application/zip")
+
+                if resumes_par_mois:
+                    st.subheader("Rapports par mois")
+                    onglets = st.tabs([f"{m:02d}/{a}" for a, m in resumes_par_mois])
+                    for onglet, ((a, m), resume_mois) in zip(onglets, resumes_par_mois.items()):
+                        with onglet:
+                            nom_fichier_mois = f"rapport_final_{m}_{a}.xlsx"
+                            df_mois = exporter_excel(resume_mois, nom_fichier_mois, colonnes_choisies, return_df=True)
+                            st.dataframe(df_mois)
+                            def classeur_mois(df_mois=df_mois, nom_fichier_mois=nom_fichier_mois, a=a, m=m):
+                                details_mois = None
+                                if inclure_detail and df_details is not None and not df_details.empty:
+                                    dates = df_details['Date']
+                                    details_mois = df_details[(dates.dt.year == a) & (dates.dt.month == m)]
+                                return exporter_excel(df_mois, nom_fichier_mois, colonnes_choisies, df_details=details_mois)
+                            st.download_button(
+                                label=f"⬇️ Télécharger le rapport {m:02d}/{a}",
+                                data=export_memorise(cle_exports, ('mois', a, m), classeur_mois),
+                                file_name=nom_fichier_mois,
+                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                key=f"telecharger_{a}_{m}"
+                            )
+        elif st.session_state.get('cle_analyse_affichee') == cle:
+            st.info("Le résultat mémorisé a expiré : relancez l'analyse.")
+
+        if rapport is not None:
+            print(rapport.en_json())  # Une ligne JSON par analyse, dans le journal du serveur.
+            st.session_state.rapport_performance = rapport
+
+    rapport_affiche = st.session_state.get('rapport_performance')
+    if rapport_affiche is not None:
+        with panneau_performances:
+            st.caption(f"Dernière analyse calculée : {rapport_affiche.total_secondes:.2f} s")
+            st.dataframe(rapport_affiche.en_dataframe(), hide_index=True)
+            if rapport_affiche.profil is not None:
+                st.code(rapport_affiche.profil_texte(), language=None)
+
+    # --- HISTORIQUE : consultation des analyses déjà enregistrées, sans recharger les fichiers ---
+    st.divider()
+    with st.expander("🗂️ Consulter l'historique des analyses"):
+        hist_col1, hist_col2, hist_col3 = st.columns(3)
+        with hist_col1:
+            hist_annee = st.selectbox("Année", range(2023, date.today().year + 15), key="hist_annee")
+        with hist_col2:
+            hist_mois = st.selectbox("Mois", range(1, 13), index=date.today().month - 1, key="hist_mois")
+        with hist_col3:
+            hist_matricule = st.text_input("Matricule (vide = résumé de tous les employés)", key="hist_matricule")
+        hist_retards = st.checkbox("Uniquement les jours de retard", key="hist_retards", disabled=not hist_matricule)
+        if st.button("Afficher", key="hist_afficher"):
+            if hist_matricule:
+                df_hist = db.jours_du_matricule(hist_matricule.strip(), hist_mois, hist_annee, en_retard=True if hist_retards else None)
+            else:
+                df_hist = db.resume_depuis_faits(hist_mois, hist_annee)
+            if df_hist.empty:
+                st.info("Aucune analyse enregistrée pour cette sélection.")
+            else:
+                st.dataframe(df_hist)
+
 
 # Vérifie si un token de reset est dans l'URL
 query_params = st.query_params
@@ -0,0 +1,166 @@
+# Fichier : batch_logic.py
+# Analyse en ligne de commande (sans Streamlit ni base de données) d'un lot de fichiers de pointage.
+# Usage : python batch_logic.py --pointages "exports/*.xlsx" --conges conges.xlsx --mois 3 --annee 2024 \
+#             --feries 2024-03-11 --sortie rapports --processus 4
+# N'importe que les modules d'analyse, pour un démarrage rapide (tâches planifiées).
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+import pandas as pd
+from analyse_logic import analyser_pointages, analyser_periode, exporter_excel, RapportPerformance
+from import_logic import LECTEURS
+from export_logic import exporter_csv, exporter_parquet
+
+EXTENSIONS_ACCEPTEES = ('.xlsx', '.xls', '.csv', '.txt')
+FORMATS_SORTIE = {'xlsx': None, 'csv': exporter_csv, 'parquet': exporter_parquet}
+
+def trouver_fichiers(motifs):
+    """Fichiers désignés par des chemins, des dossiers (tous les exports qu'ils contiennent) ou des motifs glob."""
+    fichiers = []
+    for motif in motifs or []:
+        if os.path.isdir(motif):
+            candidats = sorted(os.path.join(motif, nom) for nom in os.listdir(motif))
+        else:
+            candidats = sorted(glob.glob(motif, recursive=True)) or [motif]
+        fichiers += [f for f in candidats if os.path.isfile(f) and f.lower().endswith(EXTENSIONS_ACCEPTEES)]
+    return list(dict.fromkeys(fichiers))
+
+def lire_fichiers(fichiers, nature):
+    """Lit et concatène des fichiers de congés ou d'affectations (DataFrame vide s'il n'y en a pas)."""
+    tables = [LECTEURS[nature](f) for f in fichiers]
+    tables = [t for t in tables if not t.empty]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+def _restreindre_aux_matricules(df, matricules):
+    if df.empty or 'Matricule' not in df.columns:
+        return df
+    return df[df['Matricule'].astype(str).isin(matricules)].reset_index(drop=True)
+
+def analyser_fichier(tache):
+    """Analyse un fichier de pointage et écrit ses rapports ; renvoie le bilan (temps, effectifs, sorties)."""
+    fichier, df_conges, df_affectations, options = tache
+    bilan = {'fichier': fichier, 'sorties': [], 'erreur': None}
+    depart = time.perf_counter()
+    rapport = RapportPerformance()
+    try:
+        with rapport.etape('lecture') as mesure:
+            df_pointage = LECTEURS['pointages'](fichier)
+            mesure['nb_lignes'] = len(df_pointage)
+        if options['restreindre']:
+            matricules = set(df_pointage['Matricule'].astype(str).unique())
+            df_conges = _restreindre_aux_matricules(df_conges, matricules)
+            df_affectations = _restreindre_aux_matricules(df_affectations, matricules)
+        if options['mois_fin'] is None:
+            resume, df_details = analyser_pointages(
+                df_pointage, df_conges, df_affectations, pd.DataFrame(), options['mois'], options['annee'],
+                options['jours_feries'], retourner_details=True, rapport=rapport)
+            periode = f"{options['mois']}_{options['annee']}"
+        else:
+            resume, _, _, df_details = analyser_periode(
+                df_pointage, df_conges, df_affectations, pd.DataFrame(), options['mois'], options['annee'],
+                options['mois_fin'], options['annee_fin'], options['jours_feries'], retourner_details=True, rapport=rapport)
+            periode = f"{options['mois']}_{options['annee']}_au_{options['mois_fin']}_{options['annee_fin']}"
+        bilan['nb_employes'] = len(resume)
+        if not resume.empty:
+            colonnes = options['colonnes'] or list(resume.columns)
+            nom_base = os.path.join(options['sortie'], f"rapport_{os.path.splitext(os.path.basename(fichier))[0]}_{periode}")
+            for format_sortie in options['formats']:
+                chemin = f"{nom_base}.{format_sortie}"
+                if format_sortie == 'xlsx':
+                    octets = exporter_excel(resume, chemin, colonnes, rapport=rapport,
+                                            df_details=df_details if options['detail'] else None)
+                else:
+                    octets = FORMATS_SORTIE[format_sortie](resume, colonnes)
+                with open(chemin, 'wb') as f:
+                    f.write(octets)
+                bilan['sorties'].append(chemin)
+    except Exception as e:
+        bilan['erreur'] = f"{type(e).__name__}: {e}"
+    bilan['secondes'] = round(time.perf_counter() - depart, 4)
+    bilan['etapes'] = {nom: round(e['secondes'], 4) for nom, e in rapport.etapes.items()}
+    return bilan
+
+def executer_lot(fichiers_pointage, fichiers_conges, fichiers_affectations, mois, annee, jours_feries, sortie,
+                 mois_fin=None, annee_fin=None, nb_processus=1, colonnes=None, formats=('xlsx',), detail=False):
+    """Analyse chaque fichier de pointage (en parallèle sur `nb_processus` processus) avec les congés et
+    affectations communs, lus une seule fois. Avec plusieurs fichiers de pointage (un par chantier),
+    les congés et affectations de chaque analyse sont limités aux matricules du fichier.
+    Renvoie le résumé JSON-sérialisable du lot (temps par fichier et par étape).
+    """
+    depart = time.perf_counter()
+    os.makedirs(sortie, exist_ok=True)
+    df_conges = lire_fichiers(fichiers_conges, 'conges')
+    df_affectations = lire_fichiers(fichiers_affectations, 'affectations')
+    options = {
+        'mois': mois, 'annee': annee, 'mois_fin': mois_fin, 'annee_fin': annee_fin, 'jours_feries': list(jours_feries),
+        'sortie': sortie, 'colonnes': colonnes, 'formats': list(formats), 'detail': detail,
+        'restreindre': len(fichiers_pointage) > 1,
+    }
+    lecture_communs = time.perf_counter() - depart
+    taches = [(fichier, df_conges, df_affectations, options) for fichier in fichiers_pointage]
+    if nb_processus <= 1 or len(taches) < 2:
+        bilans = []
+        for tache in taches:
+            bilans.append(analyser_fichier(tache))
+            _afficher_bilan(bilans[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=nb_processus) as executor:
+            bilans = []
+            for bilan in executor.map(analyser_fichier, taches):
+                bilans.append(bilan)
+                _afficher_bilan(bilan)
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'), 'mois': mois, 'annee': annee,
+        'mois_fin': mois_fin, 'annee_fin': annee_fin, 'nb_processus': nb_processus,
+        'lecture_conges_affectations_secondes': round(lecture_communs, 4),
+        'total_secondes': round(time.perf_counter() - depart, 4),
+        'nb_erreurs': sum(b['erreur'] is not None for b in bilans),
+        'fichiers': bilans,
+    }
+
+def _afficher_bilan(bilan):
+    if bilan['erreur']:
+        print(f"ÉCHEC {bilan['fichier']} : {bilan['erreur']}", file=sys.stderr)
+    else:
+        print(f"{bilan['fichier']} : {bilan.get('nb_employes', 0)} employés en {bilan['secondes']:.2f} s "
+              f"({', '.join(f'{nom} {s:.2f} s' for nom, s in bilan['etapes'].items())})")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Analyse par lot des fichiers de pointage, sans l'interface Streamlit.")
+    parser.add_argument('--pointages', nargs='+', required=True, help="Fichiers, dossiers ou motifs glob des exports de pointage (un rapport par fichier)")
+    parser.add_argument('--conges', nargs='*', default=[], help="Fichiers, dossiers ou motifs glob des congés (communs à tout le lot)")
+    parser.add_argument('--affectations', nargs='*', default=[], help="Fichiers, dossiers ou motifs glob des affectations (communes à tout le lot)")
+    parser.add_argument('--mois', type=int, required=True)
+    parser.add_argument('--annee', type=int, required=True)
+    parser.add_argument('--mois-fin', type=int, default=None, help="Dernier mois d'une analyse sur plusieurs mois")
+    parser.add_argument('--annee-fin', type=int, default=None)
+    parser.add_argument('--feries', nargs='*', default=[], type=date.fromisoformat, help="Jours fériés (AAAA-MM-JJ)")
+    parser.add_argument('--sortie', default='rapports', help="Dossier des rapports")
+    parser.add_argument('--processus', type=int, default=1, help="Nombre de fichiers analysés en parallèle")
+    parser.add_argument('--colonnes', nargs='*', default=None, help="Colonnes du rapport (toutes par défaut)")
+    parser.add_argument('--formats', nargs='+', default=['xlsx'], choices=list(FORMATS_SORTIE))
+    parser.add_argument('--detail', action='store_true', help="Ajoute la feuille « Détail journalier » aux rapports xlsx")
+    parser.add_argument('--resume', default=None, help="Fichier JSON du résumé des temps (dans le dossier de sortie par défaut)")
+    args = parser.parse_args()
+    if (args.mois_fin is None) != (args.annee_fin is None):
+        parser.error("--mois-fin et --annee-fin vont ensemble")
+
+    fichiers_pointage = trouver_fichiers(args.pointages)
+    if not fichiers_pointage:
+        parser.error("aucun fichier de pointage trouvé")
+    resume_lot = executer_lot(
+        fichiers_pointage, trouver_fichiers(args.conges), trouver_fichiers(args.affectations), args.mois, args.annee,
+        args.feries, args.sortie, mois_fin=args.mois_fin, annee_fin=args.annee_fin, nb_processus=args.processus,
+        colonnes=args.colonnes, formats=args.formats, detail=args.detail,
+    )
+    chemin_resume = args.resume or os.path.join(args.sortie, 'resume_lot.json')
+    with open(chemin_resume, 'w', encoding='utf-8') as f:
+        json.dump(resume_lot, f, indent=2, ensure_ascii=False)
+    print(f"{len(fichiers_pointage)} fichier(s) en {resume_lot['total_secondes']:.2f} s, "
+          f"{resume_lot['nb_erreurs']} échec(s). Résumé écrit dans {chemin_resume}")
+    sys.exit(1 if resume_lot['nb_erreurs'] else 0)
@@ -0,0 +1,160 @@
+# Fichier : benchmark_logic.py
+# Générateur de données synthétiques et mesure des performances de la chaîne d'analyse.
+# Usage : python benchmark_logic.py --tailles 100 1000 5000 --sortie resultats_benchmark.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from analyse_logic import (preparer_donnees, analyser_jours_du_mois, agreger_resume_mensuel,
+                           exporter_excel, mois_de_la_periode)
+
+TAILLES_PAR_DEFAUT = [100, 1000, 5000]
+TYPES_CONGES_SYNTHETIQUES = ['Congé annuel', 'Maladie', 'Maternité', 'Mariage', 'Naissance', 'Décès', 'Sans solde', 'Autre motif']
+AFFECTATIONS_SYNTHETIQUES = ['Chantier', 'Domicile', 'Chantier et Bureau']
+
+def generer_donnees(nb_employes=100, nb_jours=31, debut=None, pointages_par_jour=4, bruit_min=20,
+                    taux_doublons=0.1, taux_absence=0.1, taux_conges=0.3, taux_affectations=0.05, graine=0):
+    """Génère des fichiers bruts (en-tête compris, comme lus avec header=None) de pointages, congés et affectations.
+
+    Chaque jour travaillé reçoit jusqu'à `pointages_par_jour` badgeages autour de 08:30, 12:30,
+    14:30 et 18:30 (écart-type `bruit_min` minutes) ; une part `taux_doublons` est re-badgée quelques
+    minutes plus tard. Les dates sont tantôt du texte, tantôt des horodatages, comme dans les exports réels.
+    Renvoie (df_pointage_raw, df_conges_raw, df_affectations_raw).
+    """
+    rng = np.random.default_rng(graine)
+    debut = pd.Timestamp(debut) if debut is not None else pd.Timestamp(datetime.today().year, 1, 1)
+    matricules = np.arange(1000, 1000 + nb_employes)
+    jours = pd.date_range(debut, periods=nb_jours).to_numpy()
+    heures_types = np.array([8.5, 12.5, 14.5, 18.5])[:pointages_par_jour]
+
+    # Pointages : une ligne par (employé, jour travaillé, badgeage).
+    emp, jour = np.meshgrid(np.arange(nb_employes), np.arange(nb_jours), indexing='ij')
+    emp, jour = emp.ravel(), jour.ravel()
+    travailles = rng.random(emp.size) >= taux_absence
+    emp, jour = emp[travailles], jour[travailles]
+    emp = np.repeat(emp, len(heures_types))
+    jour = np.repeat(jour, len(heures_types))
+    heures = np.tile(heures_types, travailles.sum()) * 60 + rng.normal(0, bruit_min, emp.size)
+    horodatages = jours[jour] + (np.clip(heures, 0, 24 * 60 - 1) * 60).astype('timedelta64[s]')
+    doublons = rng.random(emp.size) < taux_doublons
+    emp = np.concatenate([emp, emp[doublons]])
+    horodatages = np.concatenate([horodatages, horodatages[doublons] + rng.integers(1, 10, doublons.sum()).astype('timedelta64[m]')])
+    ordre = rng.permutation(emp.size)
+    horodatages = pd.Series(horodatages[ordre]).dt.floor('min')
+    en_texte = rng.random(len(horodatages)) < 0.5
+    colonne_pointage = horodatages.astype(object)
+    colonne_pointage[en_texte] = horodatages[en_texte].dt.strftime('%Y-%m-%d %H:%M:%S')
+    lignes = pd.DataFrame({0: matricules[emp[ordre]], 1: 'Nom', 2: colonne_pointage.to_numpy()})
+    df_pointage_raw = pd.concat([pd.DataFrame([['Export badge', None, None], ['Matricule', 'Nom', 'Date pointage']]), lignes], ignore_index=True)
+
+    # Congés : au plus un intervalle de 0 à 7 jours par employé concerné.
+    avec_conge = matricules[rng.random(nb_employes) < taux_conges]
+    debuts_conges = jours[rng.integers(0, nb_jours, avec_conge.size)]
+    fins_conges = debuts_conges + rng.integers(0, 8, avec_conge.size).astype('timedelta64[D]')
+    df_conges_raw = pd.DataFrame([['Matricule', 'Type', 'Date début', 'Date fin']] + [
+        [m, TYPES_CONGES_SYNTHETIQUES[t], pd.Timestamp(d).strftime('%d/%m/%Y'), pd.Timestamp(f).strftime('%d/%m/%Y')]
+        for m, t, d, f in zip(avec_conge, rng.integers(0, len(TYPES_CONGES_SYNTHETIQUES), avec_conge.size), debuts_conges, fins_conges)
+    ])
+
+    # Affectations : une part `taux_affectations` des jours employé.
+    nb_affectations = int(nb_employes * nb_jours * taux_affectations)
+    df_affectations_raw = pd.DataFrame([['Matricule', 'Date', 'Affectation', 'Lieu', 'Projet']] + [
+        [matricules[e], pd.Timestamp(jours[j]).strftime('%d/%m/%Y'), AFFECTATIONS_SYNTHETIQUES[a],
+         'Casablanca' if a != 1 else None, 'P1' if a == 1 else None]
+        for e, j, a in zip(rng.integers(0, nb_employes, nb_affectations), rng.integers(0, nb_jours, nb_affectations),
+                           rng.integers(0, len(AFFECTATIONS_SYNTHETIQUES), nb_affectations))
+    ])
+    return df_pointage_raw, df_conges_raw, df_affectations_raw
+
+def _executer_etapes(donnees_brutes, periode, nb_processus):
+    """Exécute la chaîne étape par étape ; renvoie [(nom_etape, fonction)] dans l'ordre d'exécution."""
+    etat = {}
+    def preparation():
+        etat['donnees'] = preparer_donnees(*donnees_brutes, pd.DataFrame())
+    def moteur():
+        etat['details'] = [analyser_jours_du_mois(etat['donnees'], mois, annee, [], nb_processus) for mois, annee in periode]
+    def agregation():
+        etat['resume'] = agreger_resume_mensuel(pd.concat(etat['details'], ignore_index=True), nb_mois=len(periode))
+    def export():
+        exporter_excel(etat['resume'], 'benchmark.xlsx', list(etat['resume'].columns))
+    return [('preparation', preparation), ('moteur_journalier', moteur), ('agregation', agregation), ('export_excel', export)]
+
+def mesurer(nb_employes, nb_jours=31, debut=None, repetitions=1, nb_processus=1, graine=0, **options_generateur):
+    """Temps (meilleur de `repetitions`) et pic mémoire (tracemalloc, passe séparée) de chaque étape."""
+    debut = pd.Timestamp(debut) if debut is not None else pd.Timestamp(datetime.today().year, 1, 1)
+    donnees_brutes = generer_donnees(nb_employes, nb_jours, debut, graine=graine, **options_generateur)
+    fin = debut + pd.Timedelta(days=nb_jours - 1)
+    periode = mois_de_la_periode(debut.month, debut.year, fin.month, fin.year)
+
+    temps = {}
+    for _ in range(repetitions):
+        for nom, etape in _executer_etapes(donnees_brutes, periode, nb_processus):
+            depart = time.perf_counter()
+            etape()
+            temps[nom] = min(temps.get(nom, float('inf')), time.perf_counter() - depart)
+
+    # Passe séparée : tracemalloc ralentit les allocations et fausserait les temps.
+    pics = {}
+    tracemalloc.start()
+    try:
+        for nom, etape in _executer_etapes(donnees_brutes, periode, nb_processus):
+            tracemalloc.reset_peak()
+            etape()
+            pics[nom] = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'nb_employes': nb_employes, 'nb_jours': nb_jours, 'nb_pointages': len(donnees_brutes[0]) - 2,
+        'nb_processus': nb_processus,
+        'etapes': {nom: {'secondes': round(temps[nom], 4), 'pic_memoire_mo': round(pics[nom], 1)} for nom in temps},
+        'total_secondes': round(sum(temps.values()), 4),
+    }
+
+def _commit_courant():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def executer_benchmark(tailles=TAILLES_PAR_DEFAUT, **options):
+    """Mesure chaque taille et renvoie un rapport JSON-sérialisable (avec commit et versions)."""
+    resultats = []
+    for nb_employes in tailles:
+        resultat = mesurer(nb_employes, **options)
+        print(f"{nb_employes:>6} employés : {resultat['total_secondes']:.2f} s "
+              + ", ".join(f"{nom} {e['secondes']:.2f} s / {e['pic_memoire_mo']:.0f} Mo" for nom, e in resultat['etapes'].items()))
+        resultats.append(resultat)
+    return {
+        'commit': _commit_courant(), 'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+        'resultats': resultats,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mesure les performances de l'analyse des pointages sur des données synthétiques.")
+    parser.add_argument('--tailles', type=int, nargs='+', default=TAILLES_PAR_DEFAUT, help="Nombres d'employés à mesurer")
+    parser.add_argument('--jours', type=int, default=31, help="Nombre de jours générés")
+    parser.add_argument('--debut', default=None, help="Premier jour généré (AAAA-MM-JJ), 1er janvier de l'année par défaut")
+    parser.add_argument('--pointages-par-jour', type=int, default=4)
+    parser.add_argument('--bruit-min', type=float, default=20, help="Écart-type des heures de badgeage, en minutes")
+    parser.add_argument('--taux-doublons', type=float, default=0.1)
+    parser.add_argument('--repetitions', type=int, default=1)
+    parser.add_argument('--processus', type=int, default=1)
+    parser.add_argument('--graine', type=int, default=0)
+    parser.add_argument('--sortie', default='resultats_benchmark.json')
+    args = parser.parse_args()
+    rapport = executer_benchmark(
+        args.tailles, nb_jours=args.jours, debut=args.debut, repetitions=args.repetitions, nb_processus=args.processus,
+        graine=args.graine, pointages_par_jour=args.pointages_par_jour, bruit_min=args.bruit_min, taux_doublons=args.taux_doublons,
+    )
+    with open(args.sortie, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f"Résultats écrits dans {args.sortie}")
@@ -0,0 +1,110 @@
+# Fichier : cache_logic.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+
+# Cache disque partagé entre les sessions : un fichier Parquet par (nature, version du format, SHA-256 du fichier importé).
+REPERTOIRE_CACHE = os.environ.get('POINTAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache_imports'))
+TAILLE_MAX_CACHE_OCTETS = int(os.environ.get('POINTAGE_CACHE_TAILLE_MAX', 512 * 1024 * 1024))
+# Version du format des tables en cache, dans le nom des fichiers : à incrémenter à chaque changement
+# de la lecture ou de la normalisation des imports (import_logic, convertir_dates, prepare_conges_df...),
+# pour ne plus servir les tables produites par l'ancien code.
+VERSION_FORMAT = 3
+
+def empreinte_octets(octets):
+    return hashlib.sha256(octets).hexdigest()
+
+def charger_ou_preparer(octets, nature, preparer, repertoire=None, taille_max=None):
+    """Renvoie la table normalisée d'un fichier importé, depuis le cache si ces octets ont déjà été vus.
+
+    Sinon `preparer()` est appelé (lecture Excel/CSV) et son résultat est écrit en Parquet.
+    Le cache est une LRU sur disque : chaque lecture rafraîchit la date du fichier et les plus
+    anciens sont supprimés au-delà de `taille_max` octets. Une erreur d'écriture n'empêche pas l'analyse.
+    """
+    repertoire = repertoire or REPERTOIRE_CACHE
+    taille_max = TAILLE_MAX_CACHE_OCTETS if taille_max is None else taille_max
+    chemin = os.path.join(repertoire, f"{nature}-v{VERSION_FORMAT}-{empreinte_octets(octets)}.parquet")
+    if os.path.exists(chemin):
+        try:
+            df = pd.read_parquet(chemin, memory_map=True)
+            os.utime(chemin)
+            return df
+        except Exception as e:
+            print(f"Cache des imports illisible ({chemin}) : {e}")
+
+    df = preparer()
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(repertoire, exist_ok=True)
+        df.to_parquet(temporaire, index=False)
+        os.replace(temporaire, chemin)
+        evincer(repertoire, taille_max)
+    except Exception as e:
+        print(f"Cache des imports non mis à jour : {e}")
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+    return df
+
+def evincer(repertoire, taille_max):
+    """Supprime les fichiers d'une autre version du format, puis les moins récemment utilisés
+    jusqu'à repasser sous `taille_max` octets."""
+    fichiers = []
+    for nom in os.listdir(repertoire):
+        if nom.endswith('.parquet') and f"-v{VERSION_FORMAT}-" not in nom:
+            try:
+                os.remove(os.path.join(repertoire, nom))
+            except FileNotFoundError:
+                pass
+        elif nom.endswith('.parquet'):
+            infos = os.stat(os.path.join(repertoire, nom))
+            fichiers.append((infos.st_mtime, infos.st_size, nom))
+    total = sum(taille for _, taille, _ in fichiers)
+    for _, taille, nom in sorted(fichiers):
+        if total <= taille_max:
+            break
+        try:
+            os.remove(os.path.join(repertoire, nom))
+            total -= taille
+        except FileNotFoundError:
+            pass
+
+class CacheResultats:
+    """LRU bornée en mémoire, avec durée de vie, pour les résultats d'analyse déjà calculés.
+
+    Partagée entre les sessions du même processus ; les accès sont protégés par un verrou.
+    `succes` / `echecs` comptent les consultations faites avec `compter=True`.
+    """
+    def __init__(self, taille_max=8, duree_vie_s=3600):
+        self.taille_max = taille_max
+        self.duree_vie_s = duree_vie_s
+        self.succes = 0
+        self.echecs = 0
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cle, compter=True):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None and time.monotonic() - entree[0] > self.duree_vie_s:
+                del self._entrees[cle]
+                entree = None
+            if compter:
+                if entree is None: self.echecs += 1
+                else: self.succes += 1
+            if entree is None:
+                return None
+            self._entrees.move_to_end(cle)
+            return entree[1]
+
+    def enregistrer(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = (time.monotonic(), valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entrees)
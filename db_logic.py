@@ -1,12 +1,150 @@
 # Fichier : db_logic.py
+import hashlib
+import hmac
+import os
+import queue
 import sqlite3
+import threading
+import time
 import bcrypt
 import secrets
 import datetime
+from contextlib import contextmanager
+import pandas as pd
+from analyse_logic import agreger_resume_mensuel
+from cache_logic import CacheResultats
+# Colonnes du détail journalier (df_analyse) et leur équivalent dans la table faits_journaliers.
+COLONNES_FAITS = [
+    ('Matricule', 'matricule', 'TEXT NOT NULL'), ('Date', 'date', 'TEXT NOT NULL'),
+    ('Jour_Semaine', 'jour_semaine', 'TEXT'), ('Est_JourFerie', 'est_jour_ferie', 'INTEGER'),
+    ('Est_Jour_Ouvrable', 'est_jour_ouvrable', 'INTEGER'), ('Type_Congé', 'type_conge', 'TEXT'),
+    ('Affectation', 'affectation', 'TEXT'), ('Lieu_Chantier', 'lieu_chantier', 'TEXT'),
+    ('Projet_Domicile', 'projet_domicile', 'TEXT'), ('Jours_Presence_Travail', 'jours_presence_travail', 'REAL'),
+    ('Type_Absence_Jour', 'type_absence_jour', 'TEXT'), ('Statut_Jour', 'statut', 'TEXT'),
+    ('Est_En_Retard', 'est_en_retard', 'INTEGER'),
+] + [(nom, nom.lower(), 'REAL') for lieu in ('Bureau', 'Chantier', 'Domicile')
+     for nom in (f'Heures_{lieu}', f'HS_{lieu}_25', f'HS_{lieu}_50', f'HS_{lieu}_100')]
+COLONNES_BOOLEENNES_FAITS = ['Est_JourFerie', 'Est_Jour_Ouvrable', 'Est_En_Retard']
+
+
+CHEMIN_DB = os.environ.get('POINTAGE_DB', 'data.db')
+TAILLE_POOL_CONNEXIONS = 4
+DELAI_ATTENTE_S = 10.0  # Attente maximale sur un verrou SQLite ou sur une connexion libre.
+DUREE_SESSION_VERIFIEE_S = 300
+DELAI_RECLAMATION_EMAIL_S = 600  # Un e-mail réservé ('envoi') par un processus arrêté redevient envoyable après ce délai.
+
+class PoolConnexions:
+    """Connexions SQLite réutilisées entre les appels et les sessions Streamlit.
+
+    Chaque connexion est ouverte en mode WAL (les lectures ne bloquent plus les écritures), avec
+    synchronous=NORMAL et un délai d'attente sur verrou (`busy_timeout`) ; sqlite3 garde les requêtes
+    déjà préparées dans le cache de la connexion, réutilisé d'un appel à l'autre. Au plus
+    `taille_max` connexions sont ouvertes : au-delà, on attend qu'une se libère.
+    """
+    def __init__(self, chemin, taille_max=TAILLE_POOL_CONNEXIONS, delai_attente_s=DELAI_ATTENTE_S):
+        self.chemin = chemin
+        self.taille_max = taille_max
+        self.delai_attente_s = delai_attente_s
+        self._libres = queue.LifoQueue()
+        self._nb_ouvertes = 0
+        self._verrou = threading.Lock()
+
+    def _ouvrir(self):
+        conn = sqlite3.connect(self.chemin, timeout=self.delai_attente_s, check_same_thread=False, cached_statements=256)
+        conn.execute(f'PRAGMA busy_timeout = {int(self.delai_attente_s * 1000)}')
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    def _prendre(self):
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+        with self._verrou:
+            ouvrir = self._nb_ouvertes < self.taille_max
+            if ouvrir:
+                self._nb_ouvertes += 1
+        if ouvrir:
+            try:
+                return self._ouvrir()
+            except Exception:
+                with self._verrou:
+                    self._nb_ouvertes -= 1
+                raise
+        try:
+            return self._libres.get(timeout=self.delai_attente_s)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Base de données occupée : aucune connexion libre.")
+
+    def _rendre(self, conn, reutilisable=True):
+        if reutilisable:
+            self._libres.put(conn)
+            return
+        conn.close()
+        with self._verrou:
+            self._nb_ouvertes -= 1
+
+    @contextmanager
+    def connexion(self):
+        """Connexion du pool dans une transaction : validée en sortie, annulée sur exception."""
+        conn = self._prendre()
+        reutilisable = True
+        try:
+            with conn:
+                yield conn
+        except (sqlite3.ProgrammingError, sqlite3.InterfaceError):
+            reutilisable = False  # Connexion inutilisable (fermée, mal employée) : remplacée.
+            raise
+        finally:
+            self._rendre(conn, reutilisable)
+
+    def fermer(self):
+        while True:
+            try:
+                conn = self._libres.get_nowait()
+            except queue.Empty:
+                return
+            self._rendre(conn, reutilisable=False)
+
+_pools = {}
+_verrou_pools = threading.Lock()
+
+def _connexion():
+    """Connexion poolée vers CHEMIN_DB (un pool par chemin absolu, créé au premier usage)."""
+    chemin = os.path.abspath(CHEMIN_DB)
+    with _verrou_pools:
+        pool = _pools.get(chemin)
+        if pool is None:
+            pool = _pools[chemin] = PoolConnexions(chemin)
+    return pool.connexion()
+
+# Vérifications réussies récentes, indexées par un HMAC (clé propre au processus) de l'identifiant,
+# du mot de passe et du hash stocké : aucun mot de passe en clair en mémoire, et un changement de
+# mot de passe invalide d'office les entrées précédentes.
+_sessions_verifiees = CacheResultats(taille_max=1024, duree_vie_s=DUREE_SESSION_VERIFIEE_S)
+_cle_sessions = secrets.token_bytes(32)
+
+def hacher_mot_de_passe(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+
+def verifier_mot_de_passe(username, password, password_hash):
+    """bcrypt.checkpw, sauf si ce triplet a été vérifié il y a moins de DUREE_SESSION_VERIFIEE_S.
+
+    bcrypt libère le GIL : les vérifications de sessions simultanées s'exécutent en parallèle.
+    """
+    empreinte = hmac.new(_cle_sessions, b'\0'.join([username.encode('utf-8'), password.encode('utf-8'), bytes(password_hash)]),
+                         hashlib.sha256).digest()
+    if _sessions_verifiees.obtenir(empreinte, compter=False):
+        return True
+    valide = bcrypt.checkpw(password.encode('utf-8'), password_hash)
+    if valide:
+        _sessions_verifiees.enregistrer(empreinte, True)
+    return valide
 
 def init_db():
     """Initialise la DB et ajoute les colonnes pour le reset de mot de passe."""
-    with sqlite3.connect('data.db') as conn:
+    with _connexion() as conn:
         conn.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 username TEXT PRIMARY KEY,
@@ -15,39 +153,57 @@ def init_db():
                 token_expiry TIMESTAMP
             )
         ''')
+        colonnes = ', '.join(f'{colonne} {type_sql}' for _, colonne, type_sql in COLONNES_FAITS)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS faits_journaliers ({colonnes})')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_faits_matricule_date ON faits_journaliers (matricule, date)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_faits_date_statut ON faits_journaliers (date, statut)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS emails_en_attente (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                destinataire TEXT NOT NULL,
+                sujet TEXT NOT NULL,
+                corps TEXT NOT NULL,
+                statut TEXT NOT NULL DEFAULT 'en_attente',
+                tentatives INTEGER NOT NULL DEFAULT 0,
+                prochain_essai REAL NOT NULL,
+                derniere_erreur TEXT,
+                cree_le TIMESTAMP,
+                envoye_le TIMESTAMP
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_emails_statut_essai ON emails_en_attente (statut, prochain_essai)')
 
 def add_user(username, password):
     if not username or not password:
         return False, "Le nom d'utilisateur et le mot de passe ne peuvent pas être vides."
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    password_hash = hacher_mot_de_passe(password)
     try:
-        with sqlite3.connect('data.db') as conn:
+        with _connexion() as conn:
             conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password_hash))
         return True, "Compte créé avec succès !"
     except sqlite3.IntegrityError:
         return False, "Ce nom d'utilisateur existe déjà."
 
 def check_user(username, password):
-    with sqlite3.connect('data.db') as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT password FROM users WHERE username = ?", (username,))
-        user_data = cursor.fetchone()
-        if user_data:
-            return bcrypt.checkpw(password.encode('utf-8'), user_data[0])
+    with _connexion() as conn:
+        user_data = conn.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+    # La connexion est rendue au pool avant le calcul bcrypt.
+    if user_data:
+        return verifier_mot_de_passe(username, password, user_data[0])
     return False
 
 def update_password(username, old_password, new_password):
     if not new_password: return False, "Le nouveau mot de passe ne peut pas être vide."
     if check_user(username, old_password):
-        new_password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-        with sqlite3.connect('data.db') as conn:
+        new_password_hash = hacher_mot_de_passe(new_password)
+        with _connexion() as conn:
             conn.execute("UPDATE users SET password = ? WHERE username = ?", (new_password_hash, username))
         return True, "Mot de passe mis à jour avec succès !"
     return False, "L'ancien mot de passe est incorrect."
 
 def set_reset_token(username):
     """Génère et stocke un token de reset pour un utilisateur."""
-    with sqlite3.connect('data.db') as conn:
+    with _connexion() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
         if cursor.fetchone():
@@ -60,19 +216,155 @@ def set_reset_token(username):
 def reset_password_with_token(token, new_password):
     """Réinitialise le mot de passe si le token est valide."""
     if not new_password: return False, "Le mot de passe ne peut être vide."
-    with sqlite3.connect('data.db') as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT username, token_expiry FROM users WHERE reset_token = ?", (token,))
-        user_data = cursor.fetchone()
-        if user_data:
-            username, token_expiry_str = user_data
-            token_expiry = datetime.datetime.fromisoformat(token_expiry_str)
-            if token_expiry > datetime.datetime.now():
-                new_password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-                conn.execute("UPDATE users SET password = ?, reset_token = NULL, token_expiry = NULL WHERE username = ?", (new_password_hash, username))
+    with _connexion() as conn:
+        user_data = conn.execute("SELECT username, token_expiry FROM users WHERE reset_token = ?", (token,)).fetchone()
+    if user_data:
+        username, token_expiry_str = user_data
+        token_expiry = datetime.datetime.fromisoformat(token_expiry_str)
+        if token_expiry > datetime.datetime.now():
+            new_password_hash = hacher_mot_de_passe(new_password)
+            with _connexion() as conn:
+                # Le token est revérifié : il n'a pas pu servir entre-temps dans une autre session.
+                modifie = conn.execute("UPDATE users SET password = ?, reset_token = NULL, token_expiry = NULL WHERE username = ? AND reset_token = ?",
+                                       (new_password_hash, username, token)).rowcount
+            if modifie:
                 return True, "Votre mot de passe a été réinitialisé avec succès."
     return False, "Le lien de réinitialisation est invalide ou a expiré."
 
 def check_if_users_exist():
-    with sqlite3.connect('data.db') as conn:
-        return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] > 0
\ No newline at end of file
+    with _connexion() as conn:
+        return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] > 0
+
+# --- Faits journaliers : détail par employé et par jour des analyses déjà lancées ---
+
+def enregistrer_faits_journaliers(df_analyse):
+    """Enregistre le détail journalier en une seule transaction (executemany).
+
+    Les faits déjà stockés des mêmes matricules sur la période analysée sont supprimés avant
+    l'insertion : chaque employé garde, sur une période donnée, les jours d'une seule analyse
+    (une relance partielle ne laisse pas de jours d'une analyse précédente). Les autres
+    matricules (autre fichier de pointage du même mois) sont conservés.
+    Renvoie le nombre de lignes écrites.
+    """
+    if df_analyse is None or df_analyse.empty:
+        return 0
+    valeurs = []
+    for nom_df, _, _ in COLONNES_FAITS:
+        colonne = df_analyse[nom_df] if nom_df in df_analyse.columns else pd.Series(None, index=df_analyse.index)
+        if nom_df == 'Matricule':
+            colonne = colonne.astype(str)
+        elif nom_df == 'Date':
+            colonne = pd.to_datetime(colonne).dt.strftime('%Y-%m-%d')
+        elif nom_df in COLONNES_BOOLEENNES_FAITS:
+            colonne = colonne.astype(bool).astype(int)
+        elif colonne.dtype == 'float32':
+            colonne = colonne.astype('float64').round(2)  # Heures compactées en float32 dans df_analyse.
+        # tolist() donne des types Python natifs, que sqlite3 sait lier (contrairement à numpy).
+        valeurs.append(colonne.astype(object).where(colonne.notna(), None).tolist())
+    colonnes_sql = ', '.join(colonne for _, colonne, _ in COLONNES_FAITS)
+    marqueurs = ', '.join('?' * len(COLONNES_FAITS))
+    debut, fin = min(valeurs[1]), max(valeurs[1])
+    with _connexion() as conn:
+        conn.executemany('DELETE FROM faits_journaliers WHERE matricule = ? AND date BETWEEN ? AND ?',
+                         [(matricule, debut, fin) for matricule in dict.fromkeys(valeurs[0])])
+        conn.executemany(f'INSERT OR REPLACE INTO faits_journaliers ({colonnes_sql}) VALUES ({marqueurs})', zip(*valeurs))
+    return len(df_analyse)
+
+def lire_faits_journaliers(date_debut=None, date_fin=None, matricules=None, statut=None, en_retard=None):
+    """Relit le détail journalier stocké, avec les noms de colonnes de df_analyse.
+
+    Tous les filtres sont optionnels ; les dates sont incluses. `statut` filtre sur Statut_Jour.
+    """
+    conditions, parametres = [], []
+    if date_debut is not None:
+        conditions.append('date >= ?'); parametres.append(pd.Timestamp(date_debut).strftime('%Y-%m-%d'))
+    if date_fin is not None:
+        conditions.append('date <= ?'); parametres.append(pd.Timestamp(date_fin).strftime('%Y-%m-%d'))
+    if matricules is not None:
+        matricules = [str(m) for m in ([matricules] if isinstance(matricules, (str, int)) else matricules)]
+        conditions.append(f"matricule IN ({', '.join('?' * len(matricules))})"); parametres.extend(matricules)
+    if statut is not None:
+        conditions.append('statut = ?'); parametres.append(statut)
+    if en_retard is not None:
+        conditions.append('est_en_retard = ?'); parametres.append(int(en_retard))
+    requete = 'SELECT ' + ', '.join(colonne for _, colonne, _ in COLONNES_FAITS) + ' FROM faits_journaliers'
+    if conditions:
+        requete += ' WHERE ' + ' AND '.join(conditions)
+    requete += ' ORDER BY matricule, date'
+    with _connexion() as conn:
+        df = pd.read_sql_query(requete, conn, params=parametres)
+    df.columns = [nom_df for nom_df, _, _ in COLONNES_FAITS]
+    df['Date'] = pd.to_datetime(df['Date']).dt.date
+    for colonne in COLONNES_BOOLEENNES_FAITS:
+        df[colonne] = df[colonne].astype(bool)
+    return df
+
+def resume_depuis_faits(mois_debut, annee_debut, mois_fin=None, annee_fin=None):
+    """Reconstruit le résumé (un mois ou une période) à partir des faits stockés, sans relire les fichiers Excel."""
+    mois_fin, annee_fin = mois_fin or mois_debut, annee_fin or annee_debut
+    debut = pd.Timestamp(annee_debut, mois_debut, 1)
+    fin = pd.Timestamp(annee_fin, mois_fin, 1) + pd.offsets.MonthEnd(1)
+    df_analyse = lire_faits_journaliers(debut, fin)
+    if df_analyse.empty:
+        return pd.DataFrame()
+    # Comme analyser_periode : la base de jours payés compte les mois effectivement présents.
+    nb_mois = pd.to_datetime(df_analyse['Date']).dt.to_period('M').nunique()
+    return agreger_resume_mensuel(df_analyse, nb_mois=nb_mois)
+
+def jours_du_matricule(matricule, mois, annee, statut=None, en_retard=None):
+    """Détail jour par jour d'un employé sur un mois (ex. ses jours de retard : en_retard=True)."""
+    debut = pd.Timestamp(annee, mois, 1)
+    return lire_faits_journaliers(debut, debut + pd.offsets.MonthEnd(1), matricules=[matricule], statut=statut, en_retard=en_retard)
+
+# --- File d'attente des e-mails sortants (envoyés en arrière-plan par email_logic) ---
+
+def ajouter_email(destinataire, sujet, corps):
+    """Met un e-mail en file d'attente, envoyable immédiatement ; renvoie son identifiant."""
+    with _connexion() as conn:
+        return conn.execute(
+            "INSERT INTO emails_en_attente (destinataire, sujet, corps, prochain_essai, cree_le) VALUES (?, ?, ?, ?, ?)",
+            (destinataire, sujet, corps, time.time(), datetime.datetime.now())).lastrowid
+
+def emails_a_envoyer(limite=20):
+    """Réserve et renvoie les e-mails échus (en attente dont l'heure de (nouvel) essai est passée), les plus anciens d'abord.
+
+    Chaque ligne est réservée (statut 'envoi') par un UPDATE conditionnel : si plusieurs processus
+    font tourner un envoyeur, un seul obtient la ligne (rowcount 1) et l'e-mail n'est envoyé qu'une
+    fois. Une réservation non conclue (processus arrêté pendant l'envoi) expire après
+    DELAI_RECLAMATION_EMAIL_S.
+    """
+    maintenant = time.time()
+    reserves = []
+    with _connexion() as conn:
+        candidats = conn.execute(
+            "SELECT id, destinataire, sujet, corps, tentatives, statut, prochain_essai FROM emails_en_attente "
+            "WHERE statut IN ('en_attente', 'envoi') AND prochain_essai <= ? ORDER BY id LIMIT ?", (maintenant, limite)).fetchall()
+        for email_id, destinataire, sujet, corps, tentatives, statut, prochain_essai in candidats:
+            reserve = conn.execute(
+                "UPDATE emails_en_attente SET statut = 'envoi', prochain_essai = ? WHERE id = ? AND statut = ? AND prochain_essai = ?",
+                (maintenant + DELAI_RECLAMATION_EMAIL_S, email_id, statut, prochain_essai)).rowcount
+            if reserve:
+                reserves.append((email_id, destinataire, sujet, corps, tentatives))
+    return reserves
+
+def marquer_email_envoye(email_id):
+    """Passe l'e-mail à 'envoye' et efface son corps (un lien de réinitialisation ne reste pas en base)."""
+    with _connexion() as conn:
+        conn.execute("UPDATE emails_en_attente SET statut = 'envoye', corps = '', tentatives = tentatives + 1, derniere_erreur = NULL, envoye_le = ? WHERE id = ?",
+                     (datetime.datetime.now(), email_id))
+
+def reporter_email(email_id, erreur, prochain_essai=None):
+    """Enregistre un échec : nouvel essai à `prochain_essai` (horodatage time.time()), ou abandon définitif si None
+    (le corps est alors effacé, comme après un envoi)."""
+    with _connexion() as conn:
+        if prochain_essai is not None:
+            conn.execute("UPDATE emails_en_attente SET statut = 'en_attente', tentatives = tentatives + 1, derniere_erreur = ?, prochain_essai = ? WHERE id = ?",
+                         (str(erreur), prochain_essai, email_id))
+        else:
+            conn.execute("UPDATE emails_en_attente SET statut = 'echec', corps = '', tentatives = tentatives + 1, derniere_erreur = ?, prochain_essai = ? WHERE id = ?",
+                         (str(erreur), time.time(), email_id))
+
+def etat_file_emails():
+    """Nombre d'e-mails par statut (en_attente, envoi, envoye, echec)."""
+    with _connexion() as conn:
+        return dict(conn.execute("SELECT statut, COUNT(*) FROM emails_en_attente GROUP BY statut").fetchall())
\ No newline at end of file
@@ -1,16 +1,34 @@
-import streamlit as st
+import os
 import smtplib
+import threading
+import time
 from email.message import EmailMessage
+import streamlit as st
+import db_logic as db
 
-def send_reset_email(recipient_email, token, app_url): # CORRECTION : ajout de app_url ici
-    """Envoie l'e-mail de réinitialisation."""
-    sender_email = st.secrets["SENDER_EMAIL"]
-    sender_password = st.secrets["SENDER_PASSWORD"]
-    
-    reset_link = f"{app_url}?reset_token={token}"
+# Serveur SMTP : Gmail (SSL) par défaut ; un serveur local de test se règle par variables d'environnement,
+# par exemple POINTAGE_SMTP_HOTE=localhost POINTAGE_SMTP_PORT=1025 POINTAGE_SMTP_SSL=0.
+SMTP_HOTE = os.environ.get('POINTAGE_SMTP_HOTE', 'smtp.gmail.com')
+SMTP_PORT = int(os.environ.get('POINTAGE_SMTP_PORT', 465))
+SMTP_SSL = os.environ.get('POINTAGE_SMTP_SSL', '1') != '0'
+TAILLE_LOT = 20
+MAX_TENTATIVES = 5
+DELAI_REESSAI_S = 30        # Doublé à chaque échec : 30 s, 1 min, 2 min, 4 min...
+DELAI_REESSAI_MAX_S = 3600
+INTERVALLE_SCRUTATION_S = 5
+DUREE_INACTIVITE_MAX_S = 60  # Au-delà, la connexion SMTP inutilisée est fermée.
+ERREURS_DEFINITIVES = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPNotSupportedError)
+
+def _secret(nom):
+    """Secret Streamlit, ou variable d'environnement du même nom (hors Streamlit ou sans secrets.toml)."""
+    try:
+        return st.secrets[nom]
+    except Exception:
+        return os.environ.get(nom)
 
-    msg = EmailMessage()
-    msg.set_content(f"""Bonjour,
+def message_reinitialisation(token, app_url):
+    reset_link = f"{app_url}?reset_token={token}"
+    corps = f"""Bonjour,
 
 Vous avez demandé une réinitialisation de votre mot de passe pour l'application PerformCheck.
 
@@ -19,17 +37,133 @@ Veuillez cliquer sur le lien ci-dessous pour choisir un nouveau mot de passe. Ce
 {reset_link}
 
 Si vous n'avez pas demandé cette réinitialisation, vous pouvez ignorer cet e-mail.
-""")
-    msg['Subject'] = 'Réinitialisation de votre mot de passe - PerformCheck'
-    msg['From'] = sender_email
-    msg['To'] = recipient_email
+"""
+    return 'Réinitialisation de votre mot de passe - PerformCheck', corps
 
+def send_reset_email(recipient_email, token, app_url):
+    """Met l'e-mail de réinitialisation en file d'attente ; il est envoyé en arrière-plan (voir EnvoyeurEmails)."""
+    sujet, corps = message_reinitialisation(token, app_url)
     try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-            smtp.login(sender_email, sender_password)
-            smtp.send_message(msg)
+        mettre_en_file(recipient_email, sujet, corps)
         return True
     except Exception as e:
-        # En cas d'erreur, il est utile de voir le message dans la console du terminal
-        print(f"Erreur SMTP : {e}")
-        return False
\ No newline at end of file
+        print(f"Erreur de mise en file de l'e-mail : {e}")
+        return False
+
+def mettre_en_file(destinataire, sujet, corps):
+    email_id = db.ajouter_email(destinataire, sujet, corps)
+    demarrer_envoyeur().reveiller()
+    return email_id
+
+def delai_reessai(tentatives):
+    """Attente avant le prochain essai après `tentatives` échecs (backoff exponentiel borné)."""
+    return min(DELAI_REESSAI_S * 2 ** (tentatives - 1), DELAI_REESSAI_MAX_S)
+
+class EnvoyeurEmails:
+    """Envoie la file d'attente `emails_en_attente` (data.db) depuis un thread d'arrière-plan.
+
+    Une seule connexion SMTP authentifiée est gardée ouverte et réutilisée pour tous les e-mails
+    d'un lot, puis fermée après DUREE_INACTIVITE_MAX_S sans envoi. Un e-mail en échec est
+    réessayé avec un délai doublé à chaque fois (`delai_reessai`), et abandonné (statut 'echec')
+    après MAX_TENTATIVES essais ou sur un refus définitif du serveur.
+    """
+    def __init__(self, hote=None, port=None, ssl=None, expediteur=None, mot_de_passe=None):
+        self.hote = hote or SMTP_HOTE
+        self.port = port or SMTP_PORT
+        self.ssl = SMTP_SSL if ssl is None else ssl
+        self.expediteur = expediteur or _secret('SENDER_EMAIL') or 'performcheck@localhost'
+        self.mot_de_passe = mot_de_passe if mot_de_passe is not None else _secret('SENDER_PASSWORD')
+        self._smtp = None
+        self._dernier_envoi = 0.0
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._thread = None
+
+    def _connexion(self):
+        if self._smtp is None:
+            smtp = smtplib.SMTP_SSL(self.hote, self.port, timeout=30) if self.ssl else smtplib.SMTP(self.hote, self.port, timeout=30)
+            if self.mot_de_passe:
+                smtp.login(self.expediteur, self.mot_de_passe)
+            self._smtp = smtp
+        return self._smtp
+
+    def _fermer_connexion(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _envoyer(self, destinataire, sujet, corps):
+        msg = EmailMessage()
+        msg.set_content(corps)
+        msg['Subject'] = sujet
+        msg['From'] = self.expediteur
+        msg['To'] = destinataire
+        try:
+            self._connexion().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Connexion réutilisée fermée par le serveur entre deux lots : un seul nouvel essai, reconnecté.
+            self._smtp = None
+            self._connexion().send_message(msg)
+        self._dernier_envoi = time.monotonic()
+
+    def traiter_file(self, limite=TAILLE_LOT):
+        """Envoie un lot d'e-mails échus sur la connexion partagée ; renvoie le nombre d'e-mails envoyés."""
+        envoyes = 0
+        for email_id, destinataire, sujet, corps, tentatives in db.emails_a_envoyer(limite):
+            try:
+                self._envoyer(destinataire, sujet, corps)
+            except Exception as e:
+                if not isinstance(e, ERREURS_DEFINITIVES):
+                    self._fermer_connexion()
+                definitif = isinstance(e, ERREURS_DEFINITIVES) or tentatives + 1 >= MAX_TENTATIVES
+                db.reporter_email(email_id, e, None if definitif else time.time() + delai_reessai(tentatives + 1))
+                print(f"Erreur SMTP ({destinataire}) : {e}")
+                continue
+            db.marquer_email_envoye(email_id)
+            envoyes += 1
+        return envoyes
+
+    def _boucle(self):
+        while not self._arret.is_set():
+            self._reveil.clear()  # Avant la lecture de la file : un e-mail ajouté pendant le lot réveille le tour suivant.
+            try:
+                envoyes = self.traiter_file()
+            except Exception as e:  # Base indisponible, etc. : nouvel essai au prochain tour.
+                print(f"Erreur de la file d'e-mails : {e}")
+                envoyes = 0
+            if envoyes >= TAILLE_LOT:
+                continue  # Lot complet : il en reste probablement d'autres.
+            if self._smtp is not None and time.monotonic() - self._dernier_envoi > DUREE_INACTIVITE_MAX_S:
+                self._fermer_connexion()
+            self._reveil.wait(INTERVALLE_SCRUTATION_S)
+        self._fermer_connexion()
+
+    def reveiller(self):
+        self._reveil.set()
+
+    def demarrer(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._arret.clear()
+            self._thread = threading.Thread(target=self._boucle, name='envoi-emails', daemon=True)
+            self._thread.start()
+        return self
+
+    def arreter(self, delai_s=10):
+        self._arret.set()
+        self._reveil.set()
+        if self._thread is not None:
+            self._thread.join(delai_s)
+
+_envoyeur = None
+_verrou_envoyeur = threading.Lock()
+
+def demarrer_envoyeur():
+    """Envoyeur unique du processus, démarré au premier appel."""
+    global _envoyeur
+    with _verrou_envoyeur:
+        if _envoyeur is None:
+            _envoyeur = EnvoyeurEmails()
+        return _envoyeur.demarrer()
\ No newline at end of file
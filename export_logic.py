@@ -0,0 +1,92 @@
+# Fichier : export_logic.py
+# Exports dérivés du rapport : un classeur par employé ou par chantier réunis dans un ZIP,
+# et le résumé en CSV ou Parquet pour les logiciels de paie.
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from io import BytesIO
+import pandas as pd
+from analyse_logic import exporter_excel, preparer_export
+
+REGROUPEMENTS = {'Matricule': 'Un classeur par employé', 'Lieu_Chantier': 'Un classeur par chantier'}
+GROUPE_SANS_CHANTIER = 'Sans chantier'
+
+def exporter_csv(df_resultats, colonnes_choisies, separateur=';'):
+    """Résumé en CSV UTF-8 (avec BOM pour qu'Excel reconnaisse les accents), mêmes colonnes que le rapport."""
+    return preparer_export(df_resultats, colonnes_choisies).to_csv(index=False, sep=separateur).encode('utf-8-sig')
+
+def exporter_parquet(df_resultats, colonnes_choisies):
+    """Résumé en Parquet, mêmes colonnes que le rapport."""
+    sortie = BytesIO()
+    preparer_export(df_resultats, colonnes_choisies).to_parquet(sortie, index=False)
+    return sortie.getvalue()
+
+def nom_fichier_groupe(groupe):
+    return 'rapport_' + re.sub(r'[^\w.-]+', '_', str(groupe)).strip('_') + '.xlsx'
+
+def groupes_rapport(df_resultats, df_details, regroupement='Matricule'):
+    """Découpe le résumé et le détail journalier : liste de (groupe, résumé du groupe, détail du groupe).
+
+    Par matricule, chaque employé reçoit sa ligne de résumé et ses jours. Par chantier, un groupe
+    réunit les employés passés par ce `Lieu_Chantier` (résumé complet) et leurs jours sur ce
+    chantier ; les employés sans aucun jour de chantier forment le groupe « Sans chantier ».
+    """
+    if regroupement not in REGROUPEMENTS:
+        raise ValueError(f"Regroupement inconnu : {regroupement}")
+    if df_details is None or df_details.empty:
+        df_details = pd.DataFrame(columns=['Matricule', 'Date', 'Lieu_Chantier'])
+    # Matricules en texte : une tranche catégorielle emporterait toutes les catégories vers les processus.
+    df_details = df_details.assign(Matricule=df_details['Matricule'].astype(str))
+    positions_resume = df_resultats.groupby(df_resultats['Matricule'].astype(str), sort=False).indices
+    detail_vide = df_details.iloc[:0]
+
+    if regroupement == 'Matricule':
+        positions_details = df_details.groupby('Matricule', sort=False).indices
+        return [(matricule, df_resultats.iloc[positions],
+                 df_details.iloc[positions_details[matricule]] if matricule in positions_details else detail_vide)
+                for matricule, positions in positions_resume.items()]
+
+    lieux = df_details['Lieu_Chantier'].astype(object).where(lambda lieu: lieu.notna() & (lieu != ''))
+    groupes = []
+    for lieu, details_lieu in df_details[lieux.notna()].groupby(lieux[lieux.notna()], sort=True):
+        matricules = details_lieu['Matricule'].unique()
+        lignes = [p for m in matricules if m in positions_resume for p in positions_resume[m]]
+        groupes.append((lieu, df_resultats.iloc[sorted(lignes)], details_lieu))
+    sans_chantier = [m for m in positions_resume if m not in set(df_details.loc[lieux.notna(), 'Matricule'])]
+    if sans_chantier:
+        lignes = sorted(p for m in sans_chantier for p in positions_resume[m])
+        groupes.append((GROUPE_SANS_CHANTIER, df_resultats.iloc[lignes], df_details[df_details['Matricule'].isin(sans_chantier)]))
+    return groupes
+
+def _classeur_groupe(tache):
+    groupe, resume, details, colonnes_choisies = tache
+    nom = nom_fichier_groupe(groupe)
+    return nom, exporter_excel(resume, nom, colonnes_choisies, df_details=details)
+
+def exporter_zip(df_resultats, df_details, colonnes_choisies, regroupement='Matricule', nb_processus=1, rapport=None):
+    """ZIP d'un classeur (« Rapport » + « Détail journalier ») par employé ou par chantier.
+
+    Les classeurs sont générés en série ou sur `nb_processus` processus et ajoutés à l'archive au
+    fur et à mesure, dans l'ordre des groupes. Les xlsx étant déjà compressés, ils sont stockés
+    sans recompression.
+    """
+    with (rapport.etape('export_zip') if rapport is not None else nullcontext({})) as mesure:
+        taches = [(groupe, resume, details, colonnes_choisies)
+                  for groupe, resume, details in groupes_rapport(df_resultats, df_details, regroupement)]
+        sortie = BytesIO()
+        executor = ProcessPoolExecutor(max_workers=nb_processus) if nb_processus > 1 and len(taches) > 1 else None
+        with executor or nullcontext(), zipfile.ZipFile(sortie, 'w', compression=zipfile.ZIP_STORED) as archive:
+            if executor is None:
+                classeurs = map(_classeur_groupe, taches)
+            else:
+                classeurs = executor.map(_classeur_groupe, taches, chunksize=max(1, len(taches) // (nb_processus * 4)))
+            noms = set()
+            for nom, octets in classeurs:
+                base, suffixe = nom, 2
+                while nom in noms:  # Deux groupes réduits au même nom de fichier.
+                    nom, suffixe = base.replace('.xlsx', f'_{suffixe}.xlsx'), suffixe + 1
+                noms.add(nom)
+                archive.writestr(nom, octets)
+        mesure['nb_lignes'] = len(taches)
+    return sortie.getvalue()
@@ -0,0 +1,238 @@
+# Fichier : import_logic.py
+import csv
+import os
+from io import BytesIO
+import numpy as np
+import pandas as pd
+from analyse_logic import (POINTAGE_COLS_MAP, CONGES_COLS_MAP, AFFECTATIONS_COLS_MAP, est_ligne_entete,
+                           correspondance_colonnes, convertir_dates, detecter_entete, prepare_conges_df)
+from cache_logic import charger_ou_preparer
+
+TAILLE_BLOC_LECTURE = 50_000
+TAILLE_ECHANTILLON_CSV = 64 * 1024
+SEPARATEURS_CSV = ';,\t|'
+
+def _nom_fichier(fichier):
+    return getattr(fichier, 'name', fichier if isinstance(fichier, str) else '')
+
+def _blocs_xlsx(fichier, taille_bloc):
+    """Lit la première feuille ligne à ligne (mode read_only) et renvoie des blocs de `taille_bloc` lignes."""
+    from openpyxl import load_workbook  # Import local : inutile pour les csv, et coûteux au démarrage.
+    classeur = load_workbook(fichier, read_only=True, data_only=True)
+    try:
+        bloc = []
+        for ligne in classeur.worksheets[0].iter_rows(values_only=True):
+            bloc.append(ligne)
+            if len(bloc) >= taille_bloc:
+                yield pd.DataFrame(bloc)
+                bloc = []
+        if bloc:
+            yield pd.DataFrame(bloc)
+    finally:
+        classeur.close()
+
+def _echantillon_csv(fichier, taille=TAILLE_ECHANTILLON_CSV):
+    """Premières lignes complètes et non vides du fichier (sur `taille` octets), sans déplacer la lecture."""
+    if hasattr(fichier, 'read'):
+        fichier.seek(0)
+        octets = fichier.read(taille)
+        fichier.seek(0)
+    else:
+        with open(fichier, 'rb') as f:
+            octets = f.read(taille)
+    texte = octets.decode('utf-8-sig', errors='ignore')
+    if len(octets) >= taille:
+        texte = texte[:texte.rfind('\n') + 1]  # Dernière ligne peut-être tronquée.
+    return [ligne for ligne in texte.splitlines() if ligne.strip()]
+
+def detecter_separateur(lignes):
+    """Séparateur des lignes d'échantillon (csv.Sniffer), le point-virgule des exports français en
+    cas d'égalité : une virgule décimale (7,5) est alors une virgule, pas une colonne. Les lignes de
+    titre qui précèdent l'en-tête sont ignorées quand il y a assez de lignes."""
+    sniffer = csv.Sniffer()
+    sniffer.preferred = list(SEPARATEURS_CSV)
+    try:
+        return sniffer.sniff('\n'.join(lignes[5:] if len(lignes) > 10 else lignes), delimiters=SEPARATEURS_CSV).delimiter
+    except csv.Error:
+        comptes = {separateur: sum(ligne.count(separateur) for ligne in lignes) for separateur in SEPARATEURS_CSV}
+        meilleur = max(comptes, key=comptes.get)
+        return meilleur if comptes[meilleur] else ','
+
+def _blocs_csv(fichier, taille_bloc):
+    """Lit un csv par blocs avec le moteur C : le séparateur et le nombre de colonnes sont déterminés
+    une seule fois sur un échantillon du début du fichier."""
+    lignes = _echantillon_csv(fichier)
+    if not lignes:
+        return  # Fichier vide : aucun bloc.
+    separateur = detecter_separateur(lignes)
+    # Colonnes nommées d'avance : une ligne de titre plus courte en tête de fichier ne fixe pas leur nombre.
+    nb_colonnes = max((len(champs) for champs in csv.reader(lignes, delimiter=separateur)), default=1)
+    yield from pd.read_csv(fichier, header=None, names=range(nb_colonnes), chunksize=taille_bloc, dtype=str,
+                           sep=separateur, engine='c', skip_blank_lines=True)
+
+def normaliser_matricules(matricules):
+    """Matricules en texte : les cellules numériques entières (1042, ou 1042.0 lu en flottant)
+    redeviennent '1042' ; les cellules texte sont seulement débarrassées de leurs espaces
+    ('001004' reste '001004')."""
+    if pd.api.types.is_numeric_dtype(matricules.dtype) and not pd.api.types.is_bool_dtype(matricules.dtype):
+        est_nombre = matricules.notna().to_numpy()
+    else:
+        est_nombre = np.fromiter((isinstance(v, (int, float, np.number)) and not isinstance(v, (bool, np.bool_))
+                                  for v in matricules.to_numpy(dtype=object)), dtype=bool, count=len(matricules))
+    texte = matricules.astype(str).str.strip()
+    if est_nombre.any():
+        positions = np.flatnonzero(est_nombre)
+        numeriques = pd.to_numeric(matricules.iloc[positions], errors='coerce').to_numpy(dtype=np.float64)
+        entiers = ~np.isnan(numeriques) & (numeriques % 1 == 0)
+        valeurs = texte.to_numpy(dtype=object)
+        valeurs[positions[entiers]] = numeriques[entiers].astype(np.int64).astype(str)
+        texte = pd.Series(valeurs, index=matricules.index, name=matricules.name, dtype=object)
+    return texte
+
+def lire_pointages_flux(fichier, taille_bloc=TAILLE_BLOC_LECTURE):
+    """Lit un export de pointages (xlsx ou csv) par blocs, à mémoire bornée.
+
+    L'en-tête est détecté dans les cinq premières lignes comme dans `find_and_rename_header`.
+    Chaque bloc est réduit aux colonnes Matricule et Pointage, les horodatages sont convertis et
+    les lignes vides ou sans date sont écartées, puis le bloc est ajouté à un tampon compact
+    (codes de matricule int32 et horodatages int64). Renvoie un DataFrame normalisé
+    ['Matricule' (catégoriel), 'Pointage'] directement accepté par `analyser_pointages` ; le
+    nombre d'horodatages illisibles écartés est dans `attrs['dates_invalides']`.
+    """
+    extension = os.path.splitext(_nom_fichier(fichier))[1].lower()
+    blocs = _blocs_csv(fichier, taille_bloc) if extension in ('.csv', '.txt') else _blocs_xlsx(fichier, taille_bloc)
+
+    codes_matricules = {}
+    mesure = {'dates_invalides': 0}
+    tampon_codes, tampon_horodatages = [], []
+    positions = None
+    lignes_en_attente = None
+    for bloc in blocs:
+        if positions is None:
+            # L'en-tête peut se trouver dans l'une des cinq premières lignes du fichier.
+            bloc = bloc if lignes_en_attente is None else pd.concat([lignes_en_attente, bloc], ignore_index=True)
+            if len(bloc) < 5:
+                lignes_en_attente = bloc
+                continue
+            positions, bloc = _detecter_colonnes(bloc)
+            lignes_en_attente = None
+        _ajouter_bloc(bloc, positions, codes_matricules, tampon_codes, tampon_horodatages, mesure)
+    if positions is None and lignes_en_attente is not None:
+        positions, bloc = _detecter_colonnes(lignes_en_attente)
+        _ajouter_bloc(bloc, positions, codes_matricules, tampon_codes, tampon_horodatages, mesure)
+
+    codes = np.concatenate(tampon_codes) if tampon_codes else np.array([], dtype=np.int32)
+    horodatages = np.concatenate(tampon_horodatages) if tampon_horodatages else np.array([], dtype=np.int64)
+    df = pd.DataFrame({
+        'Matricule': pd.Categorical.from_codes(codes, categories=list(codes_matricules)),
+        'Pointage': horodatages.view('datetime64[ns]'),
+    })
+    df.attrs['dates_invalides'] = mesure['dates_invalides']
+    return df
+
+def _detecter_colonnes(bloc):
+    """Renvoie les positions des colonnes Matricule/Pointage et le bloc privé de ses lignes d'en-tête."""
+    for i in range(min(5, len(bloc))):
+        if est_ligne_entete(bloc.iloc[i].values, POINTAGE_COLS_MAP):
+            noms = correspondance_colonnes(bloc.iloc[i].tolist(), POINTAGE_COLS_MAP)
+            entete = bloc.iloc[i].tolist()
+            positions = {standard: entete.index(nom) for nom, standard in noms.items()}
+            if {'Matricule', 'Pointage'}.issubset(positions):
+                return positions, bloc.iloc[i + 1:]
+    # Pas d'en-tête reconnu : mêmes colonnes par défaut que find_and_rename_header.
+    return {'Matricule': 0, 'Pointage': 1}, bloc
+
+def _ajouter_bloc(bloc, positions, codes_matricules, tampon_codes, tampon_horodatages, mesure):
+    matricules = bloc.iloc[:, positions['Matricule']]
+    horodatages = convertir_dates(bloc.iloc[:, positions['Pointage']].where(matricules.notna()), mesure=mesure)
+    valides = matricules.notna().to_numpy() & horodatages.notna().to_numpy()
+    if not valides.any():
+        return
+    matricules = normaliser_matricules(matricules[valides])
+    for matricule in matricules.unique():
+        codes_matricules.setdefault(matricule, len(codes_matricules))
+    tampon_codes.append(matricules.map(codes_matricules).to_numpy(dtype=np.int32))
+    tampon_horodatages.append(horodatages[valides].to_numpy(dtype='datetime64[ns]').view(np.int64))
+
+def _colonnes_texte(df):
+    """Les colonnes objet (Excel mélange nombres et texte) sont passées en texte pour l'écriture Parquet."""
+    for colonne in df.columns:
+        if df[colonne].dtype == object:
+            df[colonne] = df[colonne].where(df[colonne].isna(), df[colonne].astype(str))
+    return df
+
+def lire_excel_colonnes(fichier, columns_map, nb_lignes_apercu=5):
+    """Lit la première feuille en deux temps : l'en-tête est détecté sur un aperçu de quelques
+    lignes (`detecter_entete`), puis le corps est lu une seule fois, limité aux colonnes reconnues
+    (skiprows/usecols) et en dtype objet (pas d'inférence ni de conversion des matricules).
+    Renvoie un DataFrame aux noms standard de `columns_map`.
+    """
+    apercu = pd.read_excel(fichier, header=None, nrows=nb_lignes_apercu)
+    if apercu.empty:
+        return pd.DataFrame()
+    ligne_entete, colonnes = detecter_entete(apercu, columns_map, nb_lignes_apercu)
+    if not colonnes:
+        return pd.DataFrame()
+    if hasattr(fichier, 'seek'):
+        fichier.seek(0)
+    positions = sorted(colonnes)
+    corps = pd.read_excel(fichier, header=None, skiprows=0 if ligne_entete is None else ligne_entete + 1,
+                          usecols=positions, dtype=object)
+    noms = [colonnes[position] for position in positions]
+    if corps.empty:
+        return pd.DataFrame(columns=noms)
+    corps.columns = noms
+    return corps
+
+def lire_pointages(fichier):
+    if _nom_fichier(fichier).lower().endswith('.xls'):
+        df = lire_excel_colonnes(fichier, POINTAGE_COLS_MAP)
+        if not {'Matricule', 'Pointage'}.issubset(df.columns):
+            return pd.DataFrame({'Matricule': pd.Categorical([]), 'Pointage': pd.to_datetime([])})
+        df = df[['Matricule', 'Pointage']].dropna()
+        mesure = {'dates_invalides': 0}
+        df['Pointage'] = convertir_dates(df['Pointage'], mesure=mesure)
+        df = df.dropna(subset=['Pointage'])
+        df['Matricule'] = normaliser_matricules(df['Matricule']).astype('category')
+        df.attrs['dates_invalides'] = mesure['dates_invalides']
+        return df.reset_index(drop=True)
+    # Lecture en flux (xlsx/csv) : seules les colonnes Matricule et Pointage sont conservées.
+    return lire_pointages_flux(fichier)
+
+def lire_conges(fichier):
+    mesure = {'dates_invalides': 0}
+    df = prepare_conges_df(lire_excel_colonnes(fichier, CONGES_COLS_MAP), mesure=mesure)
+    df = df[['Matricule', 'Type_Congé', 'Date_Debut', 'Date_Fin', 'Type_Congé_Standard']]
+    df['Matricule'] = normaliser_matricules(df['Matricule'])
+    df.attrs['dates_invalides'] = mesure['dates_invalides']
+    return _colonnes_texte(df).reset_index(drop=True)
+
+def lire_affectations(fichier):
+    df = lire_excel_colonnes(fichier, AFFECTATIONS_COLS_MAP)
+    if not {'Matricule', 'Date', 'Affectation'}.issubset(df.columns):
+        return pd.DataFrame()
+    df = df[[c for c in AFFECTATIONS_COLS_MAP if c in df.columns]]
+    mesure = {'dates_invalides': 0}
+    df['Date'] = convertir_dates(df['Date'], dayfirst=True, memoriser=True, mesure=mesure)
+    df['Matricule'] = normaliser_matricules(df['Matricule']).where(df['Matricule'].notna())
+    df.attrs['dates_invalides'] = mesure['dates_invalides']
+    return _colonnes_texte(df).reset_index(drop=True)
+
+LECTEURS = {'pointages': lire_pointages, 'conges': lire_conges, 'affectations': lire_affectations}
+
+def charger_fichier(fichier, nature):
+    """Lit un fichier importé via le cache Parquet partagé (voir cache_logic).
+
+    Deux sessions qui importent le même fichier ne le relisent qu'une fois : la clé est
+    l'empreinte SHA-256 de son contenu, pas son nom.
+    """
+    if hasattr(fichier, 'getvalue'):
+        octets = fichier.getvalue()
+    else:
+        with open(fichier, 'rb') as f:
+            octets = f.read()
+    def preparer():
+        source = BytesIO(octets)
+        source.name = _nom_fichier(fichier)
+        return LECTEURS[nature](source)
+    return charger_ou_preparer(octets, nature, preparer)
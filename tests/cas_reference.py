@@ -0,0 +1,30 @@
+# Fichier : tests/cas_reference.py
+# Jeux de données des tests de parité : les résumés attendus (tests/donnees/resume_<cas>.parquet)
+# ont été produits par le moteur d'origine, avant sa vectorisation, sur ces mêmes entrées.
+from datetime import date
+import pandas as pd
+from benchmark_logic import generer_donnees
+
+
+def _affectations_manuelles(annee, mois):
+    df = pd.DataFrame([
+        {'Matricule': '1000', 'Date': date(annee, mois, 5), 'Affectation': 'Domicile', 'Lieu_Chantier': '', 'Projet_Domicile': 'X'},
+        {'Matricule': '1001', 'Date': date(annee, mois, 6), 'Affectation': 'Chantier', 'Lieu_Chantier': 'Rabat', 'Projet_Domicile': ''},
+        {'Matricule': '77777', 'Date': date(annee, mois, 7), 'Affectation': 'Chantier et Bureau', 'Lieu_Chantier': 'Fes', 'Projet_Domicile': ''},
+    ])
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+
+def cas_mars_2024():
+    pointages, conges, affectations = generer_donnees(nb_employes=25, nb_jours=31, debut='2024-03-01', bruit_min=60,
+                                                      taux_doublons=0.2, taux_conges=0.4, taux_affectations=0.05, graine=11)
+    return pointages, conges, affectations, _affectations_manuelles(2024, 3), 3, 2024, [date(2024, 3, 11), date(2024, 3, 20)]
+
+
+def cas_fevrier_2024_sans_affectations():
+    pointages, conges, _ = generer_donnees(nb_employes=10, nb_jours=29, debut='2024-02-01', bruit_min=30, graine=12)
+    return pointages, conges, pd.DataFrame(), pd.DataFrame(), 2, 2024, []
+
+
+CAS = {'mars_2024': cas_mars_2024, 'fevrier_2024_sans_affectations': cas_fevrier_2024_sans_affectations}
@@ -0,0 +1,18 @@
+# Fichier : tests/conftest.py
+# Les modules de l'application sont à la racine du dépôt, sans paquet : on la met dans le chemin d'import.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_logic as db  # Après l'ajout de la racine au chemin.
+
+
+@pytest.fixture
+def base_temporaire(tmp_path, monkeypatch):
+    """Base SQLite neuve dans le dossier temporaire du test : data.db n'est jamais touché."""
+    monkeypatch.setattr(db, 'CHEMIN_DB', str(tmp_path / 'test.db'))
+    db.init_db()
+    return tmp_path / 'test.db'
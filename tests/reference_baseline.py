@@ -0,0 +1,63 @@
+# Fichier : tests/reference_baseline.py
+# Copie du code d'origine (avant vectorisation) servant de référence aux tests de parité.
+from datetime import timedelta
+import pandas as pd
+from analyse_logic import CONFIG
+
+
+def calculer_heures_supplementaires(debut, fin, jour_semaine, est_jour_ferie, heures_normales_deja_comptees):
+    heures_normales, h_sup25, h_sup50, h_sup100 = 0.0, 0.0, 0.0, 0.0
+    if est_jour_ferie or jour_semaine == CONFIG['JOUR_DIMANCHE']:
+        duree_totale = (fin - debut).total_seconds() / 3600
+        nuit_debut_soir = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_DEBUT_NUIT']}")
+        nuit_fin_matin = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_FIN_NUIT']}")
+        heures_nuit = 0
+        if max(debut, nuit_debut_soir) < fin: heures_nuit += (fin - max(debut, nuit_debut_soir)).total_seconds() / 3600
+        if min(fin, nuit_fin_matin) > debut: heures_nuit += (min(fin, nuit_fin_matin) - debut).total_seconds() / 3600
+        heures_jour = duree_totale - heures_nuit
+        h_sup100 += heures_nuit
+        h_sup50 += heures_jour
+    elif jour_semaine == CONFIG['JOUR_SAMEDI']:
+        limite_samedi = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_FIN_TRAVAIL_SAMEDI_MATIN']}")
+        if fin <= limite_samedi: heures_normales = (fin - debut).total_seconds() / 3600
+        elif debut < limite_samedi:
+            heures_normales = (limite_samedi - debut).total_seconds() / 3600
+            h_sup50 = (fin - limite_samedi).total_seconds() / 3600
+        else: h_sup50 = (fin - debut).total_seconds() / 3600
+    else:
+        pause_debut = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_DEBUT_PAUSE_DEJ']}")
+        pause_fin_heure = CONFIG['HEURE_FIN_PAUSE_DEJ_VENDREDI'] if jour_semaine == CONFIG['JOUR_VENDREDI'] else CONFIG['HEURE_FIN_PAUSE_DEJ_LUN_JEU']
+        pause_fin = pd.to_datetime(f"{debut.date()} {pause_fin_heure}")
+        duree_avant_pause = max(0, (min(fin, pause_debut) - debut).total_seconds() / 3600)
+        duree_apres_pause = max(0, (fin - max(debut, pause_fin)).total_seconds() / 3600)
+        heures_travaillees_reelles = duree_avant_pause + duree_apres_pause
+        heures_normales_a_ajouter = min(heures_travaillees_reelles, CONFIG['DUREE_JOURNEE_NORMALE_HEURES'] - heures_normales_deja_comptees)
+        heures_normales += heures_normales_a_ajouter
+        heures_sup_jour = heures_travaillees_reelles - heures_normales_a_ajouter
+        nuit_debut_soir = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_DEBUT_NUIT']}")
+        nuit_fin_matin = pd.to_datetime(f"{debut.date()} {CONFIG['HEURE_FIN_NUIT']}")
+        heures_nuit = 0
+        if max(debut, nuit_debut_soir) < fin: heures_nuit += (fin - max(debut, nuit_debut_soir)).total_seconds() / 3600
+        if min(fin, nuit_fin_matin) > debut: heures_nuit += (min(fin, nuit_fin_matin) - debut).total_seconds() / 3600
+        heures_nuit_valide = min(heures_sup_jour, heures_nuit)
+        h_sup50 += heures_nuit_valide
+        h_sup25 += max(0, heures_sup_jour - heures_nuit_valide)
+    return heures_normales, h_sup25, h_sup50, h_sup100
+
+
+def dedoublonner_pointages(df_pointage, intervalle_securite=timedelta(minutes=10)):
+    """Boucle d'origine de analyser_pointages ; `df_pointage` trié par Matricule puis Pointage."""
+    indices_a_garder = []
+    last_matricule = None
+    last_time_kept = pd.NaT
+
+    for index, row in df_pointage.iterrows():
+        if row['Matricule'] != last_matricule:
+            last_matricule = row['Matricule']
+            last_time_kept = pd.NaT
+
+        if pd.isna(last_time_kept) or (row['Pointage'] - last_time_kept > intervalle_securite):
+            indices_a_garder.append(index)
+            last_time_kept = row['Pointage']
+
+    return df_pointage.loc[indices_a_garder].reset_index(drop=True)
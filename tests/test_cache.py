@@ -0,0 +1,23 @@
+# Fichier : tests/test_cache.py
+import os
+import pandas as pd
+import cache_logic
+from cache_logic import charger_ou_preparer
+
+
+def test_cache_des_imports_relu_puis_invalide_par_la_version(tmp_path, monkeypatch):
+    appels = []
+    def preparer():
+        appels.append(1)
+        return pd.DataFrame({'Matricule': ['1', '2'], 'Pointage': pd.to_datetime(['2024-03-01 08:00', '2024-03-01 18:00'])})
+
+    premier = charger_ou_preparer(b'contenu', 'pointages', preparer, repertoire=str(tmp_path))
+    second = charger_ou_preparer(b'contenu', 'pointages', preparer, repertoire=str(tmp_path))
+    assert len(appels) == 1
+    pd.testing.assert_frame_equal(premier, second)
+
+    # Nouvelle version du format : l'ancienne table n'est plus servie, et son fichier est supprimé.
+    monkeypatch.setattr(cache_logic, 'VERSION_FORMAT', cache_logic.VERSION_FORMAT + 1)
+    charger_ou_preparer(b'contenu', 'pointages', preparer, repertoire=str(tmp_path))
+    assert len(appels) == 2
+    assert [nom for nom in os.listdir(tmp_path)] == [f'pointages-v{cache_logic.VERSION_FORMAT}-{cache_logic.empreinte_octets(b"contenu")}.parquet']
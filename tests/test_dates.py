@@ -0,0 +1,54 @@
+# Fichier : tests/test_dates.py
+import numpy as np
+import pandas as pd
+import analyse_logic
+from analyse_logic import convertir_dates, format_dominant
+
+
+def test_colonne_jj_mm_avec_jours_avant_et_apres_le_12():
+    # Régression : les jours <= 12 étaient lus mois/jour et les autres jour/mois dans la même colonne.
+    textes = pd.Series(['05/01/2025 08:00', '13/01/2025 08:00', '01/02/2025 17:30', '28/02/2025 12:00'])
+    mesure = {}
+    dates = convertir_dates(textes, mesure=mesure)
+    attendues = pd.to_datetime(['2025-01-05 08:00', '2025-01-13 08:00', '2025-02-01 17:30', '2025-02-28 12:00'])
+    assert list(dates) == list(attendues)
+    assert mesure['dates_invalides'] == 0
+
+
+def test_format_ambigu_lu_jour_avant_mois():
+    textes = np.array(['05/01/2025 08:00', '06/01/2025 08:00'], dtype=object)
+    assert format_dominant(textes) == '%d/%m/%Y %H:%M'
+    assert list(convertir_dates(pd.Series(textes))) == list(pd.to_datetime(['2025-01-05 08:00', '2025-01-06 08:00']))
+
+
+def test_colonne_mm_jj_et_reliquat_inverse_compte_comme_invalide():
+    textes = pd.Series(['01/13/2025 08:00', '01/20/2025 08:00', '02/05/2025 08:00', '25/01/2025 08:00'])
+    mesure = {}
+    dates = convertir_dates(textes, mesure=mesure)
+    assert list(dates[:3]) == list(pd.to_datetime(['2025-01-13 08:00', '2025-01-20 08:00', '2025-02-05 08:00']))
+    assert pd.isna(dates[3])
+    assert mesure['dates_invalides'] == 1
+
+
+def test_iso_et_series_excel():
+    assert list(convertir_dates(pd.Series(['2025-01-05 08:00:00', '2025-01-13 09:30:00']), dayfirst=True)) == \
+        list(pd.to_datetime(['2025-01-05 08:00', '2025-01-13 09:30']))
+    assert convertir_dates(pd.Series([45672.5], dtype=object))[0] == pd.Timestamp('2025-01-15 12:00')
+
+
+def test_memoisation_ne_melange_pas_deux_ordres():
+    jj_mm = convertir_dates(pd.Series(['05/01/2025', '13/01/2025']), dayfirst=True, memoriser=True)
+    mm_jj = convertir_dates(pd.Series(['05/01/2025', '01/13/2025']), dayfirst=True, memoriser=True)
+    assert jj_mm[0] == pd.Timestamp('2025-01-05')
+    assert mm_jj[0] == pd.Timestamp('2025-05-01')
+
+
+def test_memoisation_evince_les_dates_les_moins_recentes(monkeypatch):
+    monkeypatch.setattr(analyse_logic, '_CACHE_DATES', analyse_logic.OrderedDict())
+    monkeypatch.setattr(analyse_logic, 'TAILLE_MAX_CACHE_DATES', 3)
+    convertir_dates(pd.Series(['01/01/2025', '02/01/2025']), dayfirst=True, memoriser=True)
+    convertir_dates(pd.Series(['01/01/2025']), dayfirst=True, memoriser=True)  # '01/01' redevient récent
+    dates = convertir_dates(pd.Series(['03/01/2025', '04/01/2025']), dayfirst=True, memoriser=True)
+    assert list(dates) == list(pd.to_datetime(['2025-01-03', '2025-01-04']))
+    # Limite atteinte : seul le moins récemment utilisé ('02/01') sort, pas tout le mémo.
+    assert [t for _, t in analyse_logic._CACHE_DATES] == ['01/01/2025', '03/01/2025', '04/01/2025']
@@ -0,0 +1,37 @@
+# Fichier : tests/test_db_faits.py
+from datetime import date
+import pandas as pd
+import db_logic as db
+from analyse_logic import analyser_pointages, agreger_resume_mensuel
+from benchmark_logic import generer_donnees
+
+
+def _faits(matricule, jours, statut):
+    return pd.DataFrame({'Matricule': matricule, 'Date': pd.to_datetime(jours), 'Jour_Semaine': pd.to_datetime(jours).day_name(),
+                         'Est_JourFerie': False, 'Est_Jour_Ouvrable': True, 'Est_En_Retard': False, 'Statut_Jour': statut})
+
+
+def test_aller_retour_resume_depuis_faits(base_temporaire):
+    pointages, conges, affectations = generer_donnees(nb_employes=6, nb_jours=31, debut='2024-03-01', graine=3)
+    resume, details = analyser_pointages(pointages, conges, affectations, pd.DataFrame(), 3, 2024, [date(2024, 3, 11)],
+                                         retourner_details=True)
+    assert db.enregistrer_faits_journaliers(details) == len(details)
+
+    relu = db.lire_faits_journaliers('2024-03-01', '2024-03-31')
+    assert len(relu) == len(details)
+    assert set(relu['Jour_Semaine']) <= {'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'}
+    attendu = agreger_resume_mensuel(details)
+    obtenu = db.resume_depuis_faits(3, 2024)
+    pd.testing.assert_frame_equal(obtenu.reset_index(drop=True), attendu.reset_index(drop=True), check_exact=True)
+
+
+def test_nouvelle_analyse_remplace_toute_la_periode_du_matricule(base_temporaire):
+    db.enregistrer_faits_journaliers(pd.concat([_faits('1', ['2024-03-01', '2024-03-02', '2024-03-03'], 'Bureau'),
+                                                _faits('2', ['2024-03-01', '2024-03-02', '2024-03-03'], 'Bureau')]))
+    # Relance pour le seul matricule 1, sans le 02/03 : l'ancien fait du 02/03 ne doit pas subsister.
+    db.enregistrer_faits_journaliers(_faits('1', ['2024-03-01', '2024-03-03'], 'Chantier'))
+
+    relu = db.lire_faits_journaliers(matricules=['1'])
+    assert [str(d) for d in relu['Date']] == ['2024-03-01', '2024-03-03']
+    assert set(relu['Statut_Jour']) == {'Chantier'}
+    assert len(db.lire_faits_journaliers(matricules=['2'])) == 3
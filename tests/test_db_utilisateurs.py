@@ -0,0 +1,12 @@
+# Fichier : tests/test_db_utilisateurs.py
+import db_logic as db
+
+
+def test_connexion_et_changement_de_mot_de_passe(base_temporaire):
+    assert db.add_user('alice', 'secret')[0]
+    assert db.check_user('alice', 'secret')
+    assert db.check_user('alice', 'secret')  # Deuxième fois : vérification récente, sans bcrypt.
+    assert not db.check_user('alice', 'autre')
+    assert db.update_password('alice', 'secret', 'nouveau')[0]
+    assert not db.check_user('alice', 'secret')  # Le hash a changé : l'ancienne vérification ne vaut plus.
+    assert db.check_user('alice', 'nouveau')
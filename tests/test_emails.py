@@ -0,0 +1,32 @@
+# Fichier : tests/test_emails.py
+import smtplib
+import db_logic as db
+from email_logic import EnvoyeurEmails
+
+
+def _lignes():
+    with db._connexion() as conn:
+        return conn.execute("SELECT statut, corps, tentatives FROM emails_en_attente ORDER BY id").fetchall()
+
+
+def test_un_email_reserve_n_est_pas_repris_par_un_autre_envoyeur(base_temporaire):
+    db.ajouter_email('a@example.com', 'Sujet', 'Lien : https://exemple/?reset_token=abc')
+    assert len(db.emails_a_envoyer()) == 1
+    assert db.emails_a_envoyer() == []  # Deuxième processus : la ligne est déjà réservée.
+    assert _lignes()[0][0] == 'envoi'
+
+
+def test_envoi_efface_le_corps_et_echec_reporte(base_temporaire, monkeypatch):
+    envoyes = []
+    def envoyer(self, destinataire, sujet, corps):
+        if destinataire.startswith('refuse'):
+            raise smtplib.SMTPServerDisconnected('coupure')
+        envoyes.append((destinataire, corps))
+    monkeypatch.setattr(EnvoyeurEmails, '_envoyer', envoyer)
+    db.ajouter_email('a@example.com', 'Sujet', 'Lien : https://exemple/?reset_token=abc')
+    db.ajouter_email('refuse@example.com', 'Sujet', 'corps')
+
+    assert EnvoyeurEmails(hote='localhost', port=1, ssl=False, mot_de_passe='').traiter_file() == 1
+    assert envoyes == [('a@example.com', 'Lien : https://exemple/?reset_token=abc')]
+    assert _lignes() == [('envoye', '', 1), ('en_attente', 'corps', 1)]
+    assert db.emails_a_envoyer() == []  # Nouvel essai différé.
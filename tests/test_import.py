@@ -0,0 +1,65 @@
+# Fichier : tests/test_import.py
+from io import BytesIO
+import pandas as pd
+import cache_logic
+from import_logic import (charger_fichier, detecter_separateur, lire_affectations, lire_conges, lire_pointages_flux,
+                          normaliser_matricules)
+
+
+def _csv(texte, nom='pointages.csv'):
+    source = BytesIO(texte.encode('utf-8'))
+    source.name = nom
+    return source
+
+
+def test_csv_point_virgule_avec_titre_et_virgules_decimales():
+    texte = ('﻿Export badge\nMatricule;Nom;Date pointage;Heures\n'
+             + ''.join(f'{1000 + i % 3};Nom, Prénom;0{1 + i % 9}/03/2024 08:{i % 60:02d};7,5\n' for i in range(30)))
+    df = lire_pointages_flux(_csv(texte), taille_bloc=7)
+    assert len(df) == 30
+    assert set(df['Matricule']) == {'1000', '1001', '1002'}
+    assert df['Pointage'].iloc[0] == pd.Timestamp('2024-03-01 08:00')
+
+
+def test_detecter_separateur():
+    assert detecter_separateur(['Matricule,Date', '1001,2024-03-01 08:00']) == ','
+    assert detecter_separateur(['Matricule\tDate', '1001\t2024-03-01 08:00']) == '\t'
+    assert detecter_separateur(['Matricule;Heures', '1001;7,5', '1002;8,25']) == ';'
+
+
+def test_matricules_avec_zeros_en_tete_conserves():
+    matricules = pd.Series(['001004', ' 001005 ', 1042, 1042.0, 'A-7'], dtype=object)
+    assert normaliser_matricules(matricules).tolist() == ['001004', '001005', '1042', '1042', 'A-7']
+    df = lire_pointages_flux(_csv('Matricule;Date pointage\n001004;2024-03-01 08:00:00\n1004;2024-03-01 09:00:00\n'))
+    assert df['Matricule'].astype(str).tolist() == ['001004', '1004']
+
+
+def test_csv_vide():
+    assert lire_pointages_flux(_csv('\n')).empty
+
+
+def test_charger_fichier_depuis_un_chemin(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_logic, 'REPERTOIRE_CACHE', str(tmp_path / 'cache'))
+    chemin = tmp_path / 'pointages.csv'
+    chemin.write_text('Matricule;Date pointage\n1001;2024-03-01 08:00:00\n1001;2024-03-01 18:00:00\n', encoding='utf-8')
+    df = charger_fichier(str(chemin), 'pointages')
+    assert len(df) == 2 and list(df['Matricule'].astype(str).unique()) == ['1001']
+
+
+def test_conges_et_affectations_gardent_les_matricules_texte():
+    from openpyxl import Workbook
+    def classeur(lignes):
+        wb = Workbook()
+        for ligne in lignes:
+            wb.active.append(ligne)
+        source = BytesIO()
+        wb.save(source)
+        source.seek(0)
+        source.name = 'fichier.xlsx'
+        return source
+
+    conges = lire_conges(classeur([['Matricule', 'Type', 'Date début', 'Date fin'],
+                                   ['001004', 'Congé annuel', '04/03/2024', '05/03/2024'], [1042, 'Maladie', '06/03/2024', None]]))
+    assert conges['Matricule'].tolist() == ['001004', '1042']
+    affectations = lire_affectations(classeur([['Matricule', 'Date', 'Affectation'], ['001004', '04/03/2024', 'Chantier']]))
+    assert affectations['Matricule'].tolist() == ['001004']
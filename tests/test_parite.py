@@ -0,0 +1,53 @@
+# Fichier : tests/test_parite.py
+# Parité avec le moteur d'origine : résumés de référence (tests/donnees) et copies du code d'origine
+# (tests/reference_baseline.py), comparés à l'identique.
+import os
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from analyse_logic import CONFIG, analyser_pointages, calculer_heures_supplementaires_lot, dedoublonner_pointages
+import reference_baseline
+from cas_reference import CAS
+
+DOSSIER_DONNEES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'donnees')
+JOURS_SEMAINE = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+@pytest.mark.parametrize('nb_processus', [1, 2])
+@pytest.mark.parametrize('nom_cas', sorted(CAS))
+def test_analyser_pointages_identique_au_moteur_d_origine(nom_cas, nb_processus):
+    attendu = pd.read_parquet(os.path.join(DOSSIER_DONNEES, f'resume_{nom_cas}.parquet'))
+    resume = analyser_pointages(*CAS[nom_cas](), nb_processus=nb_processus)
+    pd.testing.assert_frame_equal(resume, attendu, check_exact=True)
+
+
+@pytest.mark.parametrize('graine', range(5))
+def test_dedoublonner_pointages_identique_a_la_boucle_d_origine(graine):
+    rng = np.random.default_rng(graine)
+    n = 3000
+    # Écarts de 0 à 25 min : beaucoup de chaînes de re-badgeages autour du seuil de 10 min.
+    df = pd.DataFrame({'Matricule': np.sort(rng.choice(['1001', '1002', '1003', 'A-7'], n)),
+                       'ecart': pd.to_timedelta(rng.integers(0, 25 * 60, n), unit='s')})
+    df['Pointage'] = pd.Timestamp('2024-03-01') + df.groupby('Matricule')['ecart'].cumsum()
+    df = df[['Matricule', 'Pointage']]
+    attendu = reference_baseline.dedoublonner_pointages(df, timedelta(minutes=10))
+    pd.testing.assert_frame_equal(dedoublonner_pointages(df, timedelta(minutes=10)), attendu, check_exact=True)
+
+
+def test_heures_supplementaires_lot_identiques_au_calcul_d_origine():
+    rng = np.random.default_rng(0)
+    n = 4000
+    jours = pd.Timestamp('2024-03-01') + pd.to_timedelta(rng.integers(0, 31, n), unit='D')
+    # Intervalles de nuit, du matin, à cheval sur la pause, sur la limite du samedi, etc.
+    debuts = jours + pd.to_timedelta(rng.integers(0, 24 * 60, n), unit='min')
+    fins = np.minimum(debuts + pd.to_timedelta(rng.integers(1, 14 * 60, n), unit='min'), jours + pd.Timedelta(hours=23, minutes=59))
+    jours_semaine = np.array([JOURS_SEMAINE[d.weekday()] for d in jours], dtype=object)
+    est_feries = rng.random(n) < 0.1
+    deja_comptees = rng.choice([0.0, 2.5, 4.0, CONFIG['DUREE_JOURNEE_NORMALE_HEURES']], n)
+
+    lot = calculer_heures_supplementaires_lot(debuts, fins, jours_semaine, est_feries, deja_comptees)
+    attendu = np.array([reference_baseline.calculer_heures_supplementaires(d, f, j, bool(e), c)
+                        for d, f, j, e, c in zip(debuts, fins, jours_semaine, est_feries, deja_comptees)]).T
+    for obtenu, reference in zip(lot, attendu):
+        np.testing.assert_array_equal(obtenu, reference)
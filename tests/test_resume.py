@@ -0,0 +1,33 @@
+# Fichier : tests/test_resume.py
+import pandas as pd
+from analyse_logic import analyser_periode, analyser_pointages, convertir_dates
+from benchmark_logic import generer_donnees
+from cache_logic import CacheResultats
+from export_logic import exporter_csv
+
+
+def test_heures_des_lieux_sans_aucun_jour_restent_entieres():
+    pointages, conges, _ = generer_donnees(nb_employes=4, nb_jours=31, debut='2024-03-01', graine=1)
+    resume = analyser_pointages(pointages, conges, pd.DataFrame(), pd.DataFrame(), 3, 2024, [])
+    for lieu in ('Chantier', 'Domicile'):
+        for colonne in (f'Heures_{lieu}', f'HS_{lieu}_25', f'HS_{lieu}_50', f'HS_{lieu}_100'):
+            assert resume[colonne].dtype == 'int64', colonne
+    assert resume['Heures_Bureau'].dtype == 'float64'
+    lignes = exporter_csv(resume, ['Matricule', 'Heures_Chantier']).decode('utf-8-sig').splitlines()
+    assert all(ligne.endswith(';0') for ligne in lignes[1:])
+
+
+def test_periode_ne_recalcule_que_les_mois_modifies():
+    pointages, conges, _ = generer_donnees(nb_employes=4, nb_jours=91, debut='2024-01-01', graine=2)
+    cache = CacheResultats(taille_max=12)
+    premier = analyser_periode(pointages, conges, pd.DataFrame(), pd.DataFrame(), 1, 2024, 3, 2024, [], cache=cache)
+    assert premier[2] == [(2024, 1), (2024, 2), (2024, 3)]
+    resume, _, mois_recalcules = analyser_periode(pointages, conges, pd.DataFrame(), pd.DataFrame(), 1, 2024, 3, 2024, [], cache=cache)
+    assert mois_recalcules == []
+    pd.testing.assert_frame_equal(resume, premier[0])
+    # Un badgeage de février en moins : seul février est recalculé.
+    dates = convertir_dates(pointages.iloc[2:, 2], dayfirst=True)
+    ligne_fevrier = pointages.index[2:][dates.dt.month.to_numpy() == 2][0]
+    _, _, mois_recalcules = analyser_periode(pointages.drop(index=ligne_fevrier), conges, pd.DataFrame(), pd.DataFrame(),
+                                             1, 2024, 3, 2024, [], cache=cache)
+    assert mois_recalcules == [(2024, 2)]